@@ -6,9 +6,8 @@ from datetime import datetime
 import time
 import io
 import os
-import json
 from dotenv import load_dotenv
-from modules import news_collector, gemini_analyzer, github_storage
+from modules import news_collector, gemini_analyzer, storage, peak_detector, keyword_index, prompt_cache, llm_provider, response_cache, report_translator, report_schema
 
 # Load environment variables
 load_dotenv(override=True)
@@ -137,9 +136,30 @@ def parse_date(date_val):
     try: return pd.to_datetime(date_val).strftime('%Y-%m-%d')
     except: return None
 
+# Keywords opened during this rerun (the script re-executes, so this starts empty each time)
+_loaded = {}
+
 def load_data(keyword):
-    """Load report data from storage."""
-    return github_storage.load_report(keyword)
+    """
+    Lazy handle on a stored keyword: metadata, report and articles load on first use,
+    and the sidebar and the main view share it, so each part is parsed at most once per rerun.
+    """
+    if keyword not in _loaded:
+        _loaded[keyword] = storage.open_keyword(keyword)
+    return _loaded[keyword]
+
+def report_progress(placeholder, total_days):
+    """Returns an on_progress callback that shows streamed report progress in `placeholder`."""
+    done = []
+    def on_progress(kind, key, value):
+        if kind == "item" and key == "daily_trends":
+            done.append(value.get('date', ''))
+            placeholder.caption(f"Report: {len(done)}/{total_days} days written (latest {done[-1]})")
+        elif kind == "section" and key != "daily_trends":
+            placeholder.caption(f"Report: section '{key}' done ({len(done)}/{total_days} days)")
+        elif kind == "retry":
+            placeholder.caption(f"Report: regenerating missing parts ({key})")
+    return on_progress
 
 def run_new_analysis(keyword, start_date, end_date):
     """Run the analysis pipeline."""
@@ -153,11 +173,16 @@ def run_new_analysis(keyword, start_date, end_date):
         return False, "No articles found."
 
     # 2. Sentiment (Fallback to Neutral if fails to save time/cost or on error)
-    # in this simplified flow, we'll run it but handle errors gracefully
+    # Articles already scored under another keyword keep their stored label
+    known = storage.lookup_sentiments(articles)
+    unscored = [art for art, label in zip(articles, known) if label is None]
     try:
-        sentiments = gemini_analyzer.analyze_sentiment_batch(articles)
-    except:
-        sentiments = ["Neutral"] * len(articles)
+        scored = gemini_analyzer.analyze_sentiment_batch(unscored) if unscored else []
+    except Exception as e:
+        print(f"[WARNING] Sentiment analysis failed, labelling {len(unscored)} articles Neutral: {e}")
+        scored = ["Neutral"] * len(unscored)
+    scored = iter(scored)
+    sentiments = [label if label is not None else next(scored, "Neutral") for label in known]
         
     for i, art in enumerate(articles):
         art['sentiment'] = sentiments[i] if i < len(sentiments) else "Neutral"
@@ -168,19 +193,24 @@ def run_new_analysis(keyword, start_date, end_date):
     neu = sentiments.count('Neutral')
     sentiment_summary = f"Positive: {pos}, Negative: {neg}, Neutral: {neu}"
     
-    report_json = gemini_analyzer.generate_issue_report(keyword, articles, sentiment_summary)
+    total_days = len({art.get('date') for art in articles})
+    report_json = gemini_analyzer.generate_issue_report(keyword, articles, sentiment_summary,
+                                                        on_progress=report_progress(st.empty(), total_days))
+    print(f"[INFO] Prompt cache usage: {prompt_cache.get_cache_stats()}")
     
     # 4. Save
     data = {
         "keyword": keyword,
         "period": f"{start_date} ~ {end_date}",
         "summary_stats": { "positive": pos, "negative": neg, "neutral": neu },
-        "report": report_json,
+        "report": report_schema.decode_report(report_json),
         "articles": articles,
         "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    if github_storage.save_report(keyword, data):
+    if storage.save_report(keyword, data):
+        # English version is translated in the background and stored next to the report
+        report_translator.start_background(keyword, data)
         return True, "Success"
     else:
         return False, "Failed to save"
@@ -193,7 +223,7 @@ with st.sidebar:
     
     # Keyword Loader
     try:
-        keywords = github_storage.get_keyword_list()
+        keywords = storage.get_keyword_list()
     except:
         keywords = []
     
@@ -223,6 +253,16 @@ with st.sidebar:
         s_date = c1.date_input("Start", datetime.now())
         e_date = c2.date_input("End", datetime.now())
         
+        # LLM provider used for sentiment, reports and translation (others are failover).
+        # Kept in this session's state and applied to this script run only.
+        providers = llm_provider.available_providers()
+        if providers:
+            primary = st.selectbox("LLM Provider", providers, key="llm_primary", help="Other configured providers are used as failover")
+            hedge = st.checkbox("Hedged requests", value=False, key="llm_hedge", help="Send a duplicate request to the next provider when the first one is unusually slow")
+            llm_provider.configure(primary=primary, hedge=hedge)
+        else:
+            st.warning("No LLM API key configured.")
+        
         if st.button("Run Analysis", type="primary"):
             with st.spinner("Analyzing..."):
                 success, msg = run_new_analysis(new_kw, s_date, e_date)
@@ -236,6 +276,13 @@ with st.sidebar:
         st.divider()
         st.caption("Maintenance")
         
+        # Identical LLM requests (e.g. Format Update on unchanged articles) are served from disk
+        bypass_cache = st.checkbox("Bypass LLM cache", value=False, help="Force fresh LLM calls (results are still cached)")
+        response_cache.set_bypass(bypass_cache)
+        cache_stats = response_cache.get_cache_stats()
+        st.caption(f"LLM cache: {cache_stats['entries']} entries, {cache_stats['size_mb']} MB, "
+                   f"{cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        
         # Format Update Button (Regenerate Report with existing data)
         # Only available if a keyword is selected and data exists
         sidebar_data = None
@@ -244,7 +291,7 @@ with st.sidebar:
              
         if selected_keyword and selected_keyword != "Select..." and sidebar_data:
             if st.button("Format Update", help="Regenerate report text with latest format using existing data"):
-                data = sidebar_data # Use loaded data
+                data = sidebar_data.to_dict() # Full data including articles
                 with st.spinner("Updating report format..."):
                     try:
                         # Re-run Gemini analysis with existing articles
@@ -257,19 +304,22 @@ with st.sidebar:
                         neu = stats.get('neutral', 0)
                         sentiment_summary = f"Positive: {pos}, Negative: {neg}, Neutral: {neu}"
                         
-                        new_report_json = gemini_analyzer.generate_issue_report(selected_keyword, articles, sentiment_summary)
+                        total_days = len({art.get('date') for art in articles})
+                        new_report_json = gemini_analyzer.generate_issue_report(selected_keyword, articles, sentiment_summary,
+                                                                                on_progress=report_progress(st.empty(), total_days))
                         
                         # Update data object
-                        data['report'] = new_report_json
+                        data['report'] = report_schema.decode_report(new_report_json)
                         data['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                         
                         # Save
-                        if github_storage.save_report(selected_keyword, data):
+                        if storage.save_report(selected_keyword, data):
+                            report_translator.start_background(selected_keyword, data)
                             st.success("Report updated!")
                             time.sleep(1)
                             st.rerun()
                         else:
-                            st.error("Failed to save updated report.")
+                            st.error("Failed to save updated report (it may have been updated by another session; reload and try again).")
                     except Exception as e:
                         st.error(f"Update failed: {e}")
         
@@ -286,7 +336,7 @@ with st.sidebar:
                     st.warning(f"⚠️ Delete '{delete_keyword}'?")
                 with col2:
                     if st.button("🗑️ Delete", type="secondary", use_container_width=True):
-                        if github_storage.delete_report(delete_keyword):
+                        if storage.delete_report(delete_keyword):
                             st.success(f"Deleted '{delete_keyword}'")
                             time.sleep(1)
                             st.rerun()
@@ -311,13 +361,8 @@ if selected_keyword and selected_keyword != "Select...":
 
     if data:
         # Parse JSON Report
-        report = data.get('report', {})
-        if isinstance(report, str):
-            try:
-                report = json.loads(report)
-            except Exception as e:
-                st.error(f"Failed to parse report data: {e}")
-                report = {}
+        # Stored as an object (older JSON-string reports are parsed by storage)
+        report = data.get('report') or {}
         
         if 'error' in report:
             error_msg = report.get('error', '')
@@ -356,11 +401,11 @@ if selected_keyword and selected_keyword != "Select...":
             st.session_state.selected_date = q_date
 
         # 1. Custom Header
-        article_count = len(data.get('articles', []))
+        article_count = data.get('article_count', 0)
         period_str = data.get('period', '-')
         
         # 1. Custom Header (MOVED TO CONDITIONAL VIEWS)
-        article_count = len(data.get('articles', []))
+        article_count = data.get('article_count', 0)
         period_str = data.get('period', '-')
          
         # Make space for normal content (margin removed by header negative margin)
@@ -368,12 +413,13 @@ if selected_keyword and selected_keyword != "Select...":
         st.write("")
 
         # 2. Hero Chart (Volume with Peaks) - The "Gold" Chart
-        if 'articles' in data:
-            df = pd.DataFrame(data['articles'])
-            df['date'] = df['date'].apply(parse_date)
-            df = df.dropna(subset=['date'])
+        # Only the date column is read for the volume chart
+        date_df = data.articles_frame(columns=['date'])
+        if date_df is not None:
+            # assign() leaves the cached frame untouched
+            date_df = date_df.assign(date=date_df['date'].apply(parse_date)).dropna(subset=['date'])
             
-            daily_vol = df.groupby('date').size().reset_index(name='count')
+            daily_vol = date_df.groupby('date', observed=True).size().reset_index(name='count')
             
             # Ensure full date range (Continuous Timeline)
             if not daily_vol.empty:
@@ -404,9 +450,13 @@ if selected_keyword and selected_keyword != "Select...":
                 name='Volume'
             ))
             
-            # Annotations from Report Peaks
-            if 'peak_analysis' in report:
-                for peak in report['peak_analysis']:
+            # Annotations from Report Peaks (fallback: locally detected spikes, labelled with volume)
+            peak_annotations = report.get('peak_analysis') or [
+                {"date": p['date'], "reason": f"{p['volume']}건"}
+                for p in peak_detector.select_peak_days(daily_vol)
+            ]
+            if peak_annotations:
+                for peak in peak_annotations:
                     p_date = peak.get('date')
                     # Find y value for this date
                     row = daily_vol[daily_vol['date'] == p_date]
@@ -456,6 +506,10 @@ if selected_keyword and selected_keyword != "Select...":
 
                 sel_date = st.session_state.selected_date
                 
+                # Full article columns are only needed on the daily page
+                df = data.articles_frame().copy()
+                df['date'] = df['date'].apply(parse_date)
+                
                 # Header Date String
                 try:
                     dt_obj = datetime.strptime(sel_date, "%Y-%m-%d")
@@ -535,8 +589,13 @@ if selected_keyword and selected_keyword != "Select...":
                 # --- Content Translation Logic ---
                 if day_summary and st.session_state.daily_lang == 'EN':
                     # Check Cache
+                    stored = report_translator.load_translation(selected_keyword, report)
                     if sel_date in st.session_state.daily_translations:
                         day_summary = st.session_state.daily_translations[sel_date]
+                    elif stored and sel_date in stored['days']:
+                        # Pre-translated at save time: no LLM call
+                        day_summary = stored['days'][sel_date]
+                        st.session_state.daily_translations[sel_date] = day_summary
                     else:
                         # Perform Translation
                         with st.spinner("Translating report to English..."):
@@ -688,41 +747,30 @@ if selected_keyword and selected_keyword != "Select...":
                 # 4. 키워드 분석 (Keyword Analysis)
                 st.header("4. 키워드 분석 (Keyword Analysis)")
                 
-                # Use Global Keyword Analysis as Daily Specific isn't granularly available yet
-                # ideally we would filter this, but for now we show the context
+                # Exact per-day counts from the local term index
+                # (people/brands dictionaries = global keyword_analysis + this day's key people)
                 k_analysis = report.get('keyword_analysis', {})
+                kp_raw = day_summary.get('key_people', '-') if day_summary else '-'
+                day_people = [p.strip() for p in str(kp_raw).replace(',', ' ').split() if p.strip() and p.strip() != '-']
+                people_terms = [k.get('keyword') for k in k_analysis.get('people', []) if k.get('keyword')] + day_people
+                brand_terms = [k.get('keyword') for k in k_analysis.get('brands_companies', []) if k.get('keyword')]
+                term_index = keyword_index.build_term_index(
+                    df[df['date'] == sel_date].to_dict('records'),
+                    people=people_terms, brands=brand_terms, exclude=[data.get('keyword', '')]
+                )
                 
                 col_t, col_p, col_b = st.columns(3)
                 
-                with col_t:
-                    st.subheader("Topics")
-                    top = k_analysis.get('topics', [])
-                    if top:
-                        t_df = pd.DataFrame(top)[['rank', 'keyword', 'count']]
-                        t_df = t_df.sort_values('count', ascending=False)
-                        st.dataframe(t_df, hide_index=True, use_container_width=True)
-                    else:
-                        st.write("-")
-
-                with col_p:
-                    st.subheader("People")
-                    ppl = k_analysis.get('people', [])
-                    if ppl:
-                        p_df = pd.DataFrame(ppl)[['rank', 'keyword', 'count']]
-                        p_df = p_df.sort_values('count', ascending=False)
-                        st.dataframe(p_df, hide_index=True, use_container_width=True)
-                    else:
-                        st.write("-")
-
-                with col_b:
-                    st.subheader("Brands")
-                    brand = k_analysis.get('brands_companies', [])
-                    if brand:
-                        b_df = pd.DataFrame(brand)[['rank', 'keyword', 'count']]
-                        b_df = b_df.sort_values('count', ascending=False)
-                        st.dataframe(b_df, hide_index=True, use_container_width=True)
-                    else:
-                        st.write("-")
+                for col, title, category in [(col_t, "Topics", 'topics'), (col_p, "People", 'people'), (col_b, "Brands", 'brands')]:
+                    with col:
+                        st.subheader(title)
+                        ranked = keyword_index.top_terms(term_index, category, 10, sel_date)
+                        if ranked:
+                            k_df = pd.DataFrame(ranked, columns=['keyword', 'count'])
+                            k_df.insert(0, 'rank', range(1, len(k_df) + 1))
+                            st.dataframe(k_df, hide_index=True, use_container_width=True)
+                        else:
+                            st.write("-")
 
                 st.divider()
 
@@ -737,17 +785,11 @@ if selected_keyword and selected_keyword != "Select...":
                     # Add No. Column (1-based index)
                     display_df.insert(0, 'No.', range(1, len(display_df) + 1))
                     
-                    # Add Key People Column (Matched from title against daily people)
-                    kp_raw = day_summary.get('key_people', '-') if day_summary else '-'
-                    if kp_raw and kp_raw != '-':
-                        # Split by comma to get individual names
-                        all_kp_list = [p.strip() for p in kp_raw.replace(',', ' ').split() if p.strip()]
-                        
-                        def get_article_kp(row_title):
-                            found = [p for p in all_kp_list if p in row_title]
-                            return ", ".join(found) if found else "-"
-                            
-                        display_df['key_people'] = display_df['title'].apply(get_article_kp)
+                    # Add Key People Column (Matched from title against the people dictionary used above)
+                    if people_terms:
+                        display_df['key_people'] = display_df['title'].apply(
+                            lambda row_title: ", ".join(keyword_index.match_terms(row_title, people_terms)) or "-"
+                        )
                     else:
                         display_df['key_people'] = '-'
                     
@@ -829,8 +871,13 @@ if selected_keyword and selected_keyword != "Select...":
                      # Check Cache for this specific report (using keyword as key proxy, or a hash)
                      cache_key = f"{data['keyword']}_{len(data.get('daily_trends', []))}" 
                      
+                     stored = report_translator.load_translation(selected_keyword, report)
                      if cache_key in st.session_state.global_translations_cache:
                          report = st.session_state.global_translations_cache[cache_key]
+                     elif stored and not any(key in report for key in stored['missing']):
+                         # Pre-translated at save time: no LLM call
+                         report = report_translator.translated_report(report, stored)
+                         st.session_state.global_translations_cache[cache_key] = report
                      else:
                          with st.spinner("Translating Global Report to English..."):
                              trans_report = gemini_analyzer.translate_global_report(report)
@@ -1130,3 +1177,21 @@ else:
     
     **Login as Admin** in the sidebar to create new analysis reports.
     """)
+    
+    # Stored keywords at a glance (read from the keyword index, no report files are opened)
+    overview = storage.get_keyword_overview()
+    if overview:
+        st.subheader("Stored Reports")
+        st.dataframe(
+            pd.DataFrame([{
+                "keyword": entry.get('keyword'),
+                "period": entry.get('period') or '-',
+                "articles": entry.get('article_count') or 0,
+                "positive": (entry.get('summary_stats') or {}).get('positive', 0),
+                "negative": (entry.get('summary_stats') or {}).get('negative', 0),
+                "neutral": (entry.get('summary_stats') or {}).get('neutral', 0),
+                "updated_at": entry.get('updated_at') or '-'
+            } for entry in overview]),
+            hide_index=True,
+            use_container_width=True
+        )
@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import shutil
+import threading
+import pandas as pd
+from modules import columnar_storage, storage_codec, storage_lock
+
+# Append-only article log per keyword:
+#   data/articles/{keyword}.arrow (or .json.*)   base: the compacted article list
+#   data/articles/{keyword}.log/000001.json.zst  segments, one per save
+# A save only writes the difference to the current list as a new segment:
+# its new rows plus "ops" that rebuild the list in order from slices of the
+# previous list and of the new rows. Readers replay the segments newer than the
+# base; compaction folds them into a new base (rows nothing refers to any more
+# and repeated identical rows are dropped).
+# The base records the last segment it contains ("log_seq"), so a crash between
+# writing the base and deleting the segments never applies a segment twice.
+LOG_SUFFIX = ".log"
+# Segments before a background compaction starts (ARTICLE_LOG_MAX_SEGMENTS)
+DEFAULT_MAX_SEGMENTS = 8
+# A save with more new rows than this share of the list rewrites the base instead
+DELTA_MAX_RATIO = 0.5
+
+_compacting_guard = threading.Lock()
+_compacting = set()
+
+def max_segments():
+    try:
+        return int(os.getenv("ARTICLE_LOG_MAX_SEGMENTS") or DEFAULT_MAX_SEGMENTS)
+    except ValueError:
+        return DEFAULT_MAX_SEGMENTS
+
+def _base_path(keyword):
+    return os.path.join("data", "articles", f"{keyword}.json")
+
+def log_dir(keyword):
+    return os.path.join("data", "articles", f"{keyword}{LOG_SUFFIX}")
+
+def _segment_path(keyword, seq):
+    return os.path.join(log_dir(keyword), f"{seq:06d}.json")
+
+def segments(keyword):
+    """Sequence numbers of the stored segments, oldest first."""
+    directory = log_dir(keyword)
+    if not os.path.isdir(directory):
+        return []
+    seqs = set()
+    for file in os.listdir(directory):
+        name = file.split(".")[0]
+        if name.isdigit() and ".json" in file and not file.endswith(".tmp"):
+            seqs.add(int(name))
+    return sorted(seqs)
+
+def _row_key(article):
+    return json.dumps(article, sort_keys=True, ensure_ascii=False, default=str)
+
+def diff(old, new):
+    """
+    (ops, rows) that turn `old` into `new`: rows are the articles of `new` that
+    are not in `old`; ops are ["old"|"new", start, end] slices, in list order.
+    """
+    index = {}
+    for i, article in enumerate(old):
+        index.setdefault(_row_key(article), i)
+    ops, rows = [], []
+    for article in new:
+        i = index.get(_row_key(article))
+        if i is None:
+            if ops and ops[-1][0] == "new":
+                ops[-1][2] += 1
+            else:
+                ops.append(["new", len(rows), len(rows) + 1])
+            rows.append(article)
+        elif ops and ops[-1][0] == "old" and ops[-1][2] == i:
+            ops[-1][2] += 1
+        else:
+            ops.append(["old", i, i + 1])
+    return ops, rows
+
+def apply(old, ops, rows):
+    """The list a segment describes, from the previous list."""
+    result = []
+    for kind, start, end in ops:
+        result.extend((old if kind == "old" else rows)[start:end])
+    return result
+
+def _load_base_seq(keyword):
+    """Last segment contained in the base (0 if none), without reading the articles."""
+    if columnar_storage.has_articles(keyword):
+        return int(columnar_storage.read_metadata(keyword).get("log_seq", 0))
+    path = _base_path(keyword)
+    if storage_codec.find(path) is None:
+        return 0
+    document = storage_codec.read(path)
+    return document.get("log_seq", 0) if isinstance(document, dict) else 0
+
+def _load_base(keyword):
+    """(log_seq, articles) of the base, or (0, None) if there is none."""
+    if columnar_storage.has_articles(keyword):
+        seq = int(columnar_storage.read_metadata(keyword).get("log_seq", 0))
+        return seq, columnar_storage.load_articles(keyword)
+    path = _base_path(keyword)
+    if storage_codec.find(path) is None:
+        return 0, None
+    document = storage_codec.read(path)
+    if isinstance(document, dict):
+        return document.get("log_seq", 0), document.get("articles", [])
+    return 0, document
+
+def _replay(keyword):
+    """(last seq, articles) with every segment newer than the base applied."""
+    for attempt in range(3):
+        try:
+            seq, articles = _load_base(keyword)
+            for segment in segments(keyword):
+                if segment <= seq:
+                    continue
+                document = storage_codec.read(_segment_path(keyword, segment))
+                articles = apply(articles or [], document["ops"], document["rows"])
+                seq = segment
+            return seq, articles
+        except FileNotFoundError:
+            # A compaction replaced the base and removed segments while we read
+            if attempt == 2:
+                raise
+    return 0, None
+
+def has_pending(keyword):
+    """True if segments newer than the base exist (readers must replay them)."""
+    seqs = segments(keyword)
+    return bool(seqs) and seqs[-1] > _load_base_seq(keyword)
+
+def exists(keyword):
+    return columnar_storage.has_articles(keyword) or storage_codec.find(_base_path(keyword)) is not None or bool(segments(keyword))
+
+def load(keyword):
+    """The merged article list of a keyword, or None if none is stored."""
+    return _replay(keyword)[1]
+
+def load_frame(keyword, columns=None):
+    """
+    Articles as a DataFrame. Without pending segments the columnar base is
+    memory-mapped (only `columns` are read); otherwise the merged list is used.
+    """
+    if not has_pending(keyword):
+        frame = columnar_storage.load_articles_frame(keyword, columns)
+        if frame is not None:
+            return frame
+    articles = load(keyword)
+    if articles is None:
+        return None
+    frame = pd.DataFrame(articles)
+    return frame[[col for col in columns if col in frame.columns]] if columns else frame
+
+def _write_segment(keyword, seq, ops, rows):
+    """A segment is either complete or not there (storage_codec writes temp file + rename)."""
+    storage_codec.write(_segment_path(keyword, seq), {"ops": ops, "rows": rows})
+
+def _write_base(keyword, articles, seq):
+    """Writes the full list as the base covering segments up to `seq`, then removes those segments."""
+    if columnar_storage.is_available():
+        if not columnar_storage.save_articles(keyword, articles, metadata={"log_seq": seq}):
+            raise IOError(f"Failed to write the article file of '{keyword}'")
+        storage_codec.remove(_base_path(keyword))
+    else:
+        storage_codec.write(_base_path(keyword), {"log_seq": seq, "articles": articles} if seq else articles)
+    for segment in segments(keyword):
+        if segment <= seq:
+            storage_codec.remove(_segment_path(keyword, segment))
+
+def save(keyword, articles):
+    """
+    Stores the article list of a keyword. When most articles are already
+    stored, only the new ones (and their positions) are appended as a segment.
+    Returns the number of rows written.
+    """
+    articles = articles or []
+    with storage_lock.file_lock(keyword):
+        seq, current = _replay(keyword) if exists(keyword) else (0, None)
+        if current is not None and articles:
+            ops, rows = diff(current, articles)
+            if ops == [["old", 0, len(current)]] and len(current) == len(articles):
+                return 0
+            if len(rows) <= len(articles) * DELTA_MAX_RATIO:
+                _write_segment(keyword, seq + 1, ops, rows)
+                base_seq = _load_base_seq(keyword)
+                if len([s for s in segments(keyword) if s > base_seq]) >= max_segments():
+                    start_compaction(keyword)
+                return len(rows)
+        _write_base(keyword, articles, seq)
+        return len(articles)
+
+def dedupe(articles):
+    """The articles without repeated identical rows (first occurrence kept, order unchanged)."""
+    seen = set()
+    unique = []
+    for article in articles:
+        key = _row_key(article)
+        if key not in seen:
+            seen.add(key)
+            unique.append(article)
+    return unique
+
+def compact(keyword):
+    """
+    Folds the pending segments into a new base, dropping duplicate rows.
+    Returns True if there was anything to fold.
+    """
+    with storage_lock.file_lock(keyword):
+        if not has_pending(keyword):
+            return False
+        seq, articles = _replay(keyword)
+        _write_base(keyword, dedupe(articles or []), seq)
+    print(f"[INFO] Compacted article log of '{keyword}' up to segment {seq}")
+    return True
+
+def start_compaction(keyword):
+    """Compacts a keyword in a daemon thread (at most one per keyword)."""
+    with _compacting_guard:
+        if keyword in _compacting:
+            return False
+        _compacting.add(keyword)
+
+    def run():
+        try:
+            compact(keyword)
+        except Exception as e:
+            print(f"[ERROR] Compaction of '{keyword}' failed: {e}")
+        finally:
+            with _compacting_guard:
+                _compacting.discard(keyword)
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+def delete(keyword):
+    """Removes the base and every segment of a keyword."""
+    columnar_storage.delete_articles(keyword)
+    storage_codec.remove(_base_path(keyword))
+    if os.path.isdir(log_dir(keyword)):
+        shutil.rmtree(log_dir(keyword), ignore_errors=True)
+
+def keywords():
+    """Every keyword with stored articles (a base or segments), sorted."""
+    directory = os.path.join("data", "articles")
+    if not os.path.isdir(directory):
+        return []
+    found = set()
+    for name in os.listdir(directory):
+        if name.endswith(".tmp"):
+            continue
+        if name.endswith(LOG_SUFFIX):
+            found.add(name[:-len(LOG_SUFFIX)])
+        elif name.endswith(".arrow"):
+            found.add(name[:-len(".arrow")])
+        elif ".json" in name:
+            found.add(name[:name.rindex(".json")])
+    return sorted(found)
+
+def compact_all():
+    """Compacts every keyword with pending segments. Returns the number compacted."""
+    directory = os.path.join("data", "articles")
+    if not os.path.isdir(directory):
+        return 0
+    keywords = [name[:-len(LOG_SUFFIX)] for name in os.listdir(directory) if name.endswith(LOG_SUFFIX)]
+    return sum(1 for keyword in sorted(keywords) if compact(keyword))
+
+if __name__ == "__main__":
+    # Off-peak compaction: python -m modules.article_log compact [keyword ...]
+    if len(sys.argv) < 2 or sys.argv[1] != "compact":
+        print("Usage: python -m modules.article_log compact [keyword ...]")
+        sys.exit(1)
+    if len(sys.argv) > 2:
+        count = sum(1 for keyword in sys.argv[2:] if compact(keyword))
+    else:
+        count = compact_all()
+    print(f"[SUCCESS] Compacted {count} keyword(s)")
@@ -0,0 +1,208 @@
+import os
+import hashlib
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from modules import columnar_storage, storage_lock
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Optional: without pyarrow, keywords keep full article rows
+    pa = pc = None
+
+# Shared article store: every unique article is kept once, whichever keywords
+# found it. Keyword article lists hold references instead ({"_id": ..., plus
+# the fields that belong to that keyword only}), so overlapping keywords share
+# titles, links, press names and one sentiment label per article.
+# The store is one Arrow file like the keyword files, but zstd-compressed
+# (press, date and sentiment are dictionary-encoded as there), so it is
+# smaller than a single keyword's uncompressed article file.
+DEFAULT_STORE_PATH = os.path.join("data", "article_store.arrow")
+# Fields stored once per article; anything else stays in the keyword's reference
+SHARED_FIELDS = ["title", "link", "press", "date", "sentiment"]
+REF_KEY = "_id"
+ID_COLUMN = "id"
+# Query parameters that only say where a click came from
+TRACKING_PARAMS = {"influxdiv", "from", "ref", "fbclid", "gclid", "cmpid"}
+ID_LENGTH = 20
+# storage_lock name held while the store is rewritten (and by callers that
+# must not interleave with a prune, see github_storage)
+LOCK_NAME = ".article_store"
+COMPRESSION = "zstd"
+
+# Last store read by this process, kept while the file is unchanged
+_cache = {"signature": None, "table": None, "index": None}
+
+def store_path():
+    return os.getenv("ARTICLE_STORE_PATH") or DEFAULT_STORE_PATH
+
+def is_enabled():
+    """ARTICLE_STORE in .env (default on, needs pyarrow); 0 keeps full article rows per keyword."""
+    enabled = (os.getenv("ARTICLE_STORE") or "1").strip().lower() not in ("0", "false", "no", "off")
+    return enabled and pa is not None
+
+def exists():
+    return os.path.exists(store_path())
+
+def _read():
+    """(table, {id: row index}) of the store, or (None, {}) if there is none."""
+    path = store_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None, {}
+    signature = (path, st.st_mtime_ns, st.st_size)
+    if _cache["signature"] != signature:
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        index = {ref_id: i for i, ref_id in enumerate(table.column(ID_COLUMN).to_pylist())}
+        _cache.update(signature=signature, table=table, index=index)
+    return _cache["table"], _cache["index"]
+
+def _write(rows):
+    """Replaces the store with `rows` (dicts with "id"); temp file + rename."""
+    path = store_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = columnar_storage.build_table(rows)
+    compression = COMPRESSION if pa.Codec.is_available(COMPRESSION) else None
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _rows(table):
+    """The stored articles as {id: shared fields} (null fields left out)."""
+    if table is None:
+        return {}
+    return {row[ID_COLUMN]: {k: v for k, v in row.items() if k != ID_COLUMN and v is not None}
+            for row in table.to_pylist()}
+
+def canonical_url(link):
+    """
+    The article URL without scheme, "www.", fragment, trailing slash and
+    tracking parameters (utm_*, influxDiv, ...); remaining parameters sorted.
+    """
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_"))
+    path = parts.path.rstrip("/")
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else "")
+
+def article_id(article):
+    """Content address of an article: hash of its canonical URL, else of title, press and date."""
+    link = article.get("link")
+    if link:
+        key = canonical_url(str(link))
+    else:
+        key = "\x1f".join(str(article.get(field) or "") for field in ("title", "press", "date"))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+def is_ref(row):
+    return isinstance(row, dict) and REF_KEY in row
+
+def put(articles):
+    """
+    Adds or updates the articles in the store and returns their references
+    (same order). The latest save of an article sets its shared fields, so an
+    article has one label across keywords; a field the save does not have
+    (e.g. unscored) keeps what another keyword stored. The file is only
+    rewritten when something changed.
+    """
+    refs, updates = [], {}
+    for article in articles:
+        ref_id = article_id(article)
+        ref = {REF_KEY: ref_id}
+        ref.update({k: v for k, v in article.items() if k not in SHARED_FIELDS})
+        refs.append(ref)
+        shared = updates.setdefault(ref_id, {})
+        shared.update({field: article[field] for field in SHARED_FIELDS if article.get(field) is not None})
+    if updates:
+        with storage_lock.file_lock(LOCK_NAME):
+            stored = _rows(_read()[0])
+            changed = False
+            for ref_id, shared in updates.items():
+                merged = {**stored.get(ref_id, {}), **shared}
+                if stored.get(ref_id) != merged:
+                    stored[ref_id] = merged
+                    changed = True
+            if changed:
+                _write([{ID_COLUMN: ref_id, **fields} for ref_id, fields in stored.items()])
+    return refs
+
+def get(ids, columns=None):
+    """{id: shared fields} of the stored articles among `ids` (null fields left out)."""
+    table, index = _read()
+    found = [ref_id for ref_id in dict.fromkeys(ids) if ref_id in index]
+    if not found:
+        return {}
+    fields = [field for field in (columns or SHARED_FIELDS) if field in SHARED_FIELDS and field in table.column_names]
+    picked = table.select(fields).take([index[ref_id] for ref_id in found]).to_pylist()
+    return {ref_id: {k: v for k, v in row.items() if v is not None} for ref_id, row in zip(found, picked)}
+
+def take(ids, columns=None):
+    """
+    (table, found): the shared `columns` for `ids` in the same order, as an
+    Arrow table (a row of nulls where an id is None or not stored), and for
+    each id whether it was stored.
+    """
+    table, index = _read()
+    positions = [index.get(ref_id) if ref_id else None for ref_id in ids]
+    found = [position is not None for position in positions]
+    fields = [field for field in (columns or SHARED_FIELDS) if field in SHARED_FIELDS]
+    if table is None:
+        return pa.table({field: pa.nulls(len(ids), pa.string()) for field in fields}), found
+    picked = table.select([field for field in fields if field in table.column_names]).take(pa.array(positions, type=pa.int64()))
+    for field in fields:
+        if field not in picked.column_names:
+            picked = picked.append_column(field, pa.nulls(len(ids), pa.string()))
+    return picked.select(fields), found
+
+def resolve(rows, columns=None):
+    """
+    Article dicts for a keyword's rows: references are filled from the store,
+    full rows (saved before the store was used) are returned as they are.
+    """
+    shared = get([row[REF_KEY] for row in rows if is_ref(row)], columns)
+    articles = []
+    missing = 0
+    for row in rows:
+        if not is_ref(row):
+            articles.append(row)
+            continue
+        article = dict(shared.get(row[REF_KEY], {}))
+        if row[REF_KEY] not in shared:
+            missing += 1
+        article.update({k: v for k, v in row.items() if k != REF_KEY})
+        articles.append(article)
+    if missing:
+        print(f"[WARNING] {missing} articles are missing from the article store ({store_path()})")
+    return articles
+
+def lookup_sentiments(articles):
+    """Stored sentiment of each article (None if the article is new or unscored)."""
+    try:
+        stored = get([article_id(article) for article in articles], ["sentiment"])
+    except Exception as e:
+        print(f"[WARNING] Article store lookup failed: {e}")
+        return [None] * len(articles)
+    return [stored.get(article_id(article), {}).get("sentiment") for article in articles]
+
+def prune(keep_ids):
+    """Removes articles no keyword refers to any more. Returns the number removed."""
+    keep = set(keep_ids)
+    with storage_lock.file_lock(LOCK_NAME):
+        table, index = _read()
+        stale = [ref_id for ref_id in index if ref_id not in keep]
+        if stale:
+            _write([{ID_COLUMN: ref_id, **fields} for ref_id, fields in _rows(table).items() if ref_id in keep])
+    return len(stale)
+
+def count():
+    return _read()[0].num_rows if exists() else 0
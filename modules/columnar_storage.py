@@ -0,0 +1,126 @@
+import os
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional: without pyarrow, articles stay inside the report JSON
+    pa = None
+
+# Arrow IPC files next to the report JSON: data/articles/{keyword}.arrow
+ARTICLES_DIR = os.path.join("data", "articles")
+# Low-cardinality columns stored once per distinct value
+DICTIONARY_COLUMNS = ["press", "date", "sentiment"]
+COLUMN_ORDER = ["title", "link", "press", "date", "sentiment"]
+
+def is_available():
+    return pa is not None
+
+def articles_path(keyword):
+    return os.path.join(ARTICLES_DIR, f"{keyword}.arrow")
+
+def has_articles(keyword):
+    return is_available() and os.path.exists(articles_path(keyword))
+
+def _column(values, dictionary):
+    if dictionary:
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string()).dictionary_encode()
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types in an extra field are kept as text
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+def build_table(articles):
+    """
+    Arrow table of the article dicts; press, date and sentiment are dictionary-encoded.
+    Columns no article has are left out (an empty list keeps the standard columns).
+    """
+    names = [name for name in COLUMN_ORDER if not articles or any(name in a for a in articles)]
+    for article in articles:
+        for key in article:
+            if key not in names:
+                names.append(key)
+    columns = [_column([a.get(name) for a in articles], name in DICTIONARY_COLUMNS) for name in names]
+    return pa.table(columns, names=names)
+
+def save_articles(keyword, articles, metadata=None):
+    """
+    Writes the articles of a keyword as an uncompressed Arrow IPC file
+    (temp file + rename, so readers never see a partial file).
+    `metadata` ({str: str}) is kept in the file schema, see read_metadata().
+    """
+    if not is_available():
+        return False
+    path = articles_path(keyword)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(ARTICLES_DIR, exist_ok=True)
+        table = build_table(articles or [])
+        if metadata:
+            table = table.replace_schema_metadata({str(k): str(v) for k, v in metadata.items()})
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save articles of '{keyword}': {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+def load_table(keyword, columns=None):
+    """
+    Memory-maps the article file and returns the Arrow table (or None).
+    Only the pages of the projected `columns` are actually read from disk.
+    """
+    if not has_articles(keyword):
+        return None
+    try:
+        source = pa.memory_map(articles_path(keyword), 'r')
+        table = pa.ipc.open_file(source).read_all()
+    except Exception as e:
+        print(f"[ERROR] Failed to load articles of '{keyword}': {e}")
+        return None
+    if columns:
+        table = table.select([col for col in columns if col in table.column_names])
+    return table
+
+def read_metadata(keyword):
+    """Schema metadata of the article file ({} if none), without reading any column."""
+    if not has_articles(keyword):
+        return {}
+    try:
+        schema = pa.ipc.open_file(pa.memory_map(articles_path(keyword), 'r')).schema
+    except Exception:
+        return {}
+    return {k.decode('utf-8'): v.decode('utf-8') for k, v in (schema.metadata or {}).items()}
+
+def load_articles_frame(keyword, columns=None):
+    """Articles as a DataFrame (dictionary columns become categoricals), or None."""
+    table = load_table(keyword, columns)
+    return table.to_pandas() if table is not None else None
+
+def load_articles(keyword, columns=None):
+    """Articles as a list of dicts (the JSON shape; null fields are left out), or None."""
+    table = load_table(keyword, columns)
+    if table is None:
+        return None
+    return [{k: v for k, v in row.items() if v is not None} for row in table.to_pylist()]
+
+def count_articles(keyword):
+    """Number of stored articles, from the memory-mapped file (no column data is copied)."""
+    if not has_articles(keyword):
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(articles_path(keyword), 'r'))
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    except Exception:
+        return None
+
+def delete_articles(keyword):
+    path = articles_path(keyword)
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception as e:
+            print(f"[ERROR] Failed to delete {path}: {e}")
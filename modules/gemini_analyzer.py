@@ -1,43 +1,16 @@
-import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 import json
-import time
+from modules import sentiment_engine, prompt_encoder, sampler, report_stats, keyword_index, topic_clustering, llm_provider, json_stream, json_repair, translation_memory
 
 # CRITICAL: override=True to force reload environment variables
 load_dotenv(override=True)
 
 def get_model():
-    """Gemini 모델 초기화"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
-    
-    genai.configure(api_key=api_key)
-    # Using gemini-2.5-flash (latest stable version)
-    return genai.GenerativeModel('gemini-2.5-flash')
-
-def analyze_sentiment_batch(articles, batch_size=25):
-    """
-    Analyzes sentiment for a batch of articles using Gemini.
-    Returns a list of sentiments corresponding to the articles.
-    Batch size reduced to 25 for better accuracy with large article counts (500+).
-    """
-    if not articles:
-        return []
+    """Gemini 모델 (공유 클라이언트, 프로세스당 1회 설정)"""
+    provider = llm_provider.get_provider("gemini")
+    return provider.client.GenerativeModel(provider.model_name)
 
-    model = get_model()
-    all_sentiments = []
-    
-    # Process in smaller batches for better accuracy
-    for i in range(0, len(articles), batch_size):
-        batch = articles[i:i+batch_size]
-        
-        # Prepare prompt
-        titles = [f"{j+1}. {article['title']}" for j, article in enumerate(batch)]
-        titles_text = "\n".join(titles)
-        
-        prompt = f"""다음 뉴스 제목들의 감정을 정확하게 분석해주세요.
+SENTIMENT_INSTRUCTIONS = """다음 뉴스 제목들의 감정을 정확하게 분석해주세요.
 각 제목을 '긍정', '부정', 또는 '중립'으로 분류하세요.
 
 분류 기준:
@@ -62,231 +35,219 @@ def analyze_sentiment_batch(articles, batch_size=25):
 2. 애매한 경우, 제목의 전반적인 톤을 고려하여 긍정 또는 부정 중 더 가까운 쪽으로 분류하세요
 3. "논란", "우려", "불안", "위기" 등의 단어는 부정으로 분류
 4. "성과", "성공", "호조", "증가" 등의 단어는 긍정으로 분류
-5. 중립은 전체의 10-20% 정도만 되도록 신중하게 판단하세요
-
-반드시 JSON 배열 형태로만 답변하세요. 예: ["Positive", "Negative", "Neutral", ...]
-다른 설명 없이 JSON만 출력하세요.
-
-제목들:
-{titles_text}
-"""
-        
-        try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            
-            # Clean up code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            elif text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            
-            sentiments = json.loads(text.strip())
-            
-            # Ensure length matches
-            if len(sentiments) != len(batch):
-                print(f"Warning: Batch count ({len(batch)}) and Sentiment count ({len(sentiments)}) mismatch.")
-                while len(sentiments) < len(batch):
-                    sentiments.append("Neutral")
-                sentiments = sentiments[:len(batch)]
-            
-            all_sentiments.extend(sentiments)
-            
-            # Small delay to avoid rate limiting
-            if i + batch_size < len(articles):
-                time.sleep(1)
-                
-        except json.JSONDecodeError as e:
-            print(f"Error parsing sentiment JSON response for batch {i//batch_size + 1}: {e}")
-            print(f"Raw response: {text if 'text' in locals() else 'N/A'}")
-            all_sentiments.extend(["Neutral"] * len(batch))
-        except Exception as e:
-            print(f"Error in sentiment analysis: {e}")
-            all_sentiments.extend(["Neutral"] * len(batch))
-    
-    return all_sentiments
-
-
-
-
-
-
-    
-
-
+5. 중립은 전체의 10-20% 정도만 되도록 신중하게 판단하세요"""
 
+def analyze_sentiment_batch(articles, batch_size=25, return_stats=False):
+    """
+    Analyzes sentiment for a batch of articles using Gemini
+    (or the primary provider configured in llm_provider).
+    Returns a list of sentiments corresponding to the articles
+    (and the retry/bisect stats if return_stats=True).
+    Batch size reduced to 25 for better accuracy with large article counts (500+).
+    """
+    if not articles:
+        return ([], {}) if return_stats else []
 
-    
+    def request(prefix, suffix):
+        # Configured primary (Gemini by default) first, the others on failure
+        return llm_provider.generate(prefix, suffix, task="sentiment", json_mode=True, return_provider=True)
 
+    titles = [article['title'] for article in articles]
+    order = llm_provider.provider_order()
+    sentiments, stats = sentiment_engine.classify_titles(titles, request, SENTIMENT_INSTRUCTIONS, batch_size, max_batch_size=100,
+                                                         provider=order[0] if order else None)
+    return (sentiments, stats) if return_stats else sentiments
 
 def clean_json_text(text):
     """
     Cleans the AI response text to extract valid JSON.
     Removes markdown code blocks and whitespace.
     """
-    text = text.strip()
-    # Remove markdown code blocks if present
-    if text.startswith("```"):
-        # Remove first line (```json or just ```)
-        parts = text.split("\n", 1)
-        if len(parts) > 1:
-            text = parts[1]
-    
-    if text.strip().endswith("```"):
-        text = text.strip()[:-3]
-        
-    return text.strip()
+    return json_repair.strip_code_fences(text)
 
-def generate_issue_report(keyword, articles, context_summary, total_count=None):
+def _keyword_instructions(term_index, n=10):
     """
-    Generates a structured JSON report using Gemini.
+    Tells the model which keywords to describe for keyword_analysis.
+    Topics (and dictionary-backed people/brands) come from the local index;
+    without a dictionary the model proposes the names and they are counted locally.
     """
-    model = get_model()
-    
-    # Check prompt length (safety mechanism)
-    # Check prompt length (safety mechanism) - Increased for full coverage
-    articles_text = json.dumps(articles[:3000], ensure_ascii=False)
-    
-    prompt = f"""
-    You are an expert news analyst. Your task is to analyze {len(articles)} news articles about '{keyword}' and generate a structured JSON report.
-    
-    CONTEXT SUMMARY:
-    {context_summary}
+    lines = []
+    topics = [term for term, _ in keyword_index.top_terms(term_index, 'topics', n)]
+    lines.append(f"- topics: one entry for each of these words: {', '.join(topics) or '-'}")
+
+    for category, key, hint in [('people', 'people', 'key figures'), ('brands', 'brands_companies', 'brands or companies (clean names only, no general terms)')]:
+        known = [term for term, _ in keyword_index.top_terms(term_index, category, n)]
+        if known:
+            lines.append(f"- {key}: one entry for each of these names: {', '.join(known)}")
+        else:
+            lines.append(f"- {key}: up to 15 {hint}, spelled exactly as in the headlines")
+    return "\n    ".join(lines)
+
+REPORT_INSTRUCTIONS = """
+    You are an expert news analyst. Your task is to analyze the news articles about the keyword given in ARTICLE DATA and generate a structured JSON report.
     
     INSTRUCTIONS:
-    1. Analyze the articles provided below.
+    1. Analyze the articles provided in ARTICLE DATA. They are a compact table grouped by date:
+       each "## YYYY-MM-DD (total=N)" header gives the exact article count for that day,
+       followed by rows of "press_id|sentiment|title" (press ids are listed in the PRESS line).
     2. **CRITICAL**: You MUST generate a 'daily_trends' entry for **EVERY SINGLE DATE** present in the articles. Do NOT summarize multiple days into one. Do NOT skip any dates. Processing time is not an issue.
     3. Output ONLY valid JSON matching the structure below.
     3. Do NOT use markdown code blocks (e.g. ```json). Just raw JSON.
     4. ESCAPE all double quotes within string values (e.g. \\"quote\\"). This is CRITICAL.
     5. Ensure all JSON keys and string values are properly quoted.
     6. **LANGUAGE**: All content values MUST be in **KOREAN** (한국어).
+    7. Total counts, daily volumes, sentiment percentages and peak days are computed separately. Do NOT output them; write only the fields shown below.
+    8. 'keyword_analysis': keyword counts are computed separately, write only 'keyword' and 'context', following KEYWORD TARGETS.
+    9. 'sub_topics': the articles of each day are already clustered (see TOPIC CLUSTERS). Write exactly one entry per cluster of that day, with its cluster id, a name and a description.
     
     JSON STRUCTURE:
-    {{
-        "executive_summary": {{
-            "total_articles": {len(articles)},
+    {
+        "executive_summary": {
             "tone_analysis": "Overall tone narrative (2-3 sentences). Focus on HOT TOPICS first.",
             "key_takeaways": ["Point 1", "Point 2", "Point 3"]
-        }},
+        },
         "daily_trends": [
-            {{
+            {
                 "date": "YYYY-MM-DD",
-                "volume": 0,
                 "one_line_summary": "One sentence daily summary",
                 "narrative_summary": "Detailed narrative of the day's events",
                 "sub_topics": [
-                    {{
+                    {
+                        "cluster": 1,
                         "name": "Topic Name",
-                        "count": 0,
-                        "percent": 0.0,
                         "description": "One line explanation of the topic content",
                         "examples": "Example entities"
-                    }}
+                    }
                 ],
-                "key_findings": {{
+                "key_findings": {
                     "article_analysis": ["Key Point 1", "Key Point 2"],
                     "media_focus": ["Media Focus 1", "Media Focus 2"],
                     "dynamics": ["Brand/Person Dynamics"]
-                }},
+                },
                 "daily_themes": [
-                    {{
+                    {
                         "name": "Theme Name",
                         "stats": "Article count info",
                         "core_message": "Core Message",
                         "details": [ "Detail 1", "Detail 2" ],
                         "reporter_traits": "Reporter characteristics",
                         "social_impact": "Social impact description"
-                    }}
+                    }
                 ],
                 "issue_short": "Main issue in max 4 Korean words",
-                "sentiment_stat": "긍정 00%, 중립 00%, 부정 00%" ,
                 "key_people": "Important people mentioned"
-            }}
-        ],
-        "peak_analysis": [
-            {{ "order": 1, "date": "YYYY-MM-DD", "volume": 0, "reason": "초단문 키워드 (2-3단어, 예: 논란 점화, 티저 공개)" }}
+            }
         ],
-        "keyword_analysis": {{
+        "keyword_analysis": {
             "people": [
-                {{ "rank": 1, "keyword": "Name", "count": 0, "context": "Role/Issue" }}
-                // ... Top 10 (Strictly identify top 10 key figures)
+                { "keyword": "Name", "context": "Role/Issue" }
             ],
             "topics": [
-                 {{ "rank": 1, "keyword": "Word", "count": 0, "context": "Context" }}
-                 // ... Top 10 (Strictly use single "Words" centering on the topic, NOT phrases)
+                 { "keyword": "Word", "context": "Context" }
             ],
             "brands_companies": [
-                 {{ "rank": 1, "keyword": "Brand/Company", "count": 0, "context": "Context" }}
-                 // ... Top 10 (Strictly identify top 10 brands or companies. Clean names only. Exclude general terms.)
+                 { "keyword": "Brand/Company", "context": "Context" }
             ]
-        }},
-        "detailed_topic_analysis": {{
-            "hot_topics": [ {{ "title": "T", "content": "C" }} ],
-            "controversy_analysis": [ {{ "title": "T", "content": "C" }} ],
-            "brand_collabs": {{
+        },
+        "detailed_topic_analysis": {
+            "hot_topics": [ { "title": "T", "content": "C" } ],
+            "controversy_analysis": [ { "title": "T", "content": "C" } ],
+            "brand_collabs": {
                 "overview": "Overview of industry trends",
                 "cases": [
-                    {{
+                    {
                         "brand_name": "Brand Name",
                         "collaborator": "Partner (Person/Company)",
                         "campaign_detail": "Specific Campaign/Product",
                         "marketing_action": "Marketing Strategy/Action"
-                    }}
+                    }
                 ]
-            }}
-        }},
-        "time_series_flow": {{
-            "early": {{ "period": "", "major_reports": "", "public_reaction": "" }},
-            "middle": {{ "period": "", "major_reports": "", "public_reaction": "" }},
-            "late": {{ "period": "", "major_reports": "", "public_reaction": "" }}
-        }},
+            }
+        },
+        "time_series_flow": {
+            "early": { "period": "", "major_reports": "", "public_reaction": "" },
+            "middle": { "period": "", "major_reports": "", "public_reaction": "" },
+            "late": { "period": "", "major_reports": "", "public_reaction": "" }
+        },
         "conclusion": "Conclusion text"
-    }}
+    }
+
+"""
+
+def generate_issue_report(keyword, articles, context_summary, total_count=None, token_budget=prompt_encoder.DEFAULT_TOKEN_BUDGET, sample_size=None,
+                          stream=False, on_progress=None):
+    """
+    Generates a structured JSON report using Gemini (or the configured primary provider).
+    Quantitative fields (volumes, sentiment stats, peaks, totals, keyword and
+    sub_topic counts) are computed locally; the model only writes the narrative text.
+    Articles are sent as a compact date-grouped table fitted to `token_budget`.
+    If `sample_size` is set, a stratified sample of that size is sent instead of
+    every article (exact per-day counts are still passed as metadata).
+    With `stream` (or an `on_progress` callback) the response is streamed and
+    on_progress(kind, key, value) is called for every completed daily_trends
+    entry ("item"), every completed section ("section") and before missing
+    parts are regenerated ("retry").
+    """
+    # Exact numbers (and peak days) are computed locally, not generated
+    stats = report_stats.compute_report_stats(articles)
+    
+    # Exact keyword counts from a local term index; the model only writes 'context'
+    dictionaries = keyword_index.default_dictionaries()
+    term_index = keyword_index.build_term_index(articles, people=dictionaries['people'], brands=dictionaries['brands'], exclude=[keyword])
+    keyword_text = _keyword_instructions(term_index)
+    
+    # Per-day headline clusters give exact sub_topic counts; the model only names them
+    day_clusters = topic_clustering.cluster_articles_by_day(articles, exclude=[keyword])
+    clusters_text = topic_clustering.format_clusters_for_prompt(day_clusters)
+    
+    # Stratified sample over dates/sentiment/press so the whole period stays covered
+    prompt_articles = sampler.stratified_sample(articles, sample_size)
+    day_counts = sampler.daily_counts(articles)
+    counts_text = sampler.format_daily_counts(day_counts)
+    
+    # Compact encoding (no links, dictionary-encoded press) fitted to the token budget
+    daily_totals = {date: day['total'] for date, day in day_counts.items()}
+    articles_text, used_articles, article_tokens = prompt_encoder.fit_articles_to_budget(prompt_articles, token_budget, daily_totals)
+    
+    # Everything above ARTICLE DATA is identical for every keyword (cacheable prefix)
+    suffix = f"""
+    ARTICLE DATA
+    
+    KEYWORD: {keyword}
+    TOTAL ARTICLES: {len(articles)}
+    
+    CONTEXT SUMMARY:
+    {context_summary}
+    
+    EXACT DAILY COUNTS (all {len(articles)} articles, for reference):
+    {counts_text}
+    
+    KEYWORD TARGETS (for 'keyword_analysis'):
+    {keyword_text}
+
+    TOPIC CLUSTERS (per day: cluster id, size, top terms, representative headlines):
+    {clusters_text}
 
     ARTICLES:
     {articles_text}
     """
     
     try:
-        if len(prompt) > 1000000:
-             # Simple truncation if too long
-             prompt = prompt[:1000000] + "... (truncated)"
-
-        # Configure for valid JSON output
-        generation_config = {
-            "temperature": 0.5,
-            "response_mime_type": "application/json"
-        }
-        
-        response = model.generate_content(prompt, generation_config=generation_config)
-        text = response.text
-        
-        # Clean JSON text
-        cleaned_text = clean_json_text(text)
-        
-        try:
-             json_data = json.loads(cleaned_text)
-             # Validate math
-             json_data = validate_and_fix_math(json_data)
-             return json.dumps(json_data, ensure_ascii=False)
-        except json.JSONDecodeError as e:
-             # Fallback: Try to find the first '{' and last '}'
-             try:
-                 start_idx = text.find('{')
-                 end_idx = text.rfind('}')
-                 if start_idx != -1 and end_idx != -1:
-                     potential_json = text[start_idx:end_idx+1]
-                     json_data = json.loads(potential_json)
-                     json_data = validate_and_fix_math(json_data)
-                     return json.dumps(json_data, ensure_ascii=False)
-             except:
-                 pass
-             
-             print(f"Error parsing JSON response: {e}")
-             return json.dumps({"error": f"JSON parsing failed: {e}", "raw_response": text[:100]}, ensure_ascii=False)
+        print(f"[INFO] Report prompt for '{keyword}': ~{prompt_encoder.estimate_tokens(REPORT_INSTRUCTIONS + suffix)} tokens ({len(used_articles)}/{len(articles)} articles)")
+
+        # Valid JSON output; fails over to the other configured providers.
+        # Complete sections are kept even if the response is cut off or malformed.
+        json_data, text = _generate_report_sections(suffix, [day['date'] for day in stats['daily']], stream, on_progress)
+        if not json_data:
+            print("Error parsing JSON response: no complete section")
+            return json.dumps({"error": "JSON parsing failed: no complete section", "raw_response": text[:100]}, ensure_ascii=False)
+
+        # Fill in peak reasons, exact numbers, keyword counts and sub_topic clusters
+        json_data['peak_analysis'] = annotate_peaks(keyword, articles, stats['peaks'])
+        json_data = report_stats.apply_report_stats(json_data, stats)
+        json_data = keyword_index.apply_keyword_analysis(json_data, term_index)
+        json_data = topic_clustering.apply_topic_clusters(json_data, day_clusters)
+        return json.dumps(json_data, ensure_ascii=False)
 
     except Exception as e:
         import traceback
@@ -301,128 +262,145 @@ def generate_issue_report(keyword, articles, context_summary, total_count=None):
 
 
 
-def validate_and_fix_math(json_data, total_count_for_day=None):
+REPORT_SECTIONS = ["executive_summary", "daily_trends", "keyword_analysis", "detailed_topic_analysis", "time_series_flow", "conclusion"]
+
+def _missing_report_parts(sections, dates):
+    """Top-level sections not yet present and dates without a daily_trends entry."""
+    missing = [key for key in REPORT_SECTIONS if key not in sections]
+    done = {day.get('date') for day in sections.get('daily_trends', []) or [] if isinstance(day, dict)}
+    missing_dates = [date for date in dates if date not in done]
+    if missing_dates and 'daily_trends' not in missing:
+        missing.append('daily_trends')
+    return missing, missing_dates
+
+def _request_report(suffix, parser, stream):
+    """Sends one report request, feeding the response to `parser`. Returns the raw text."""
+    options = {"task": "report", "json_mode": True, "temperature": 0.5}
+    if stream:
+        text, _ = llm_provider.generate_stream(REPORT_INSTRUCTIONS, suffix, on_text=parser.feed, **options)
+    else:
+        text = llm_provider.generate(REPORT_INSTRUCTIONS, suffix, **options)
+        parser.feed(text)
+    return text
+
+def _merge_repaired(sections, text):
+    """
+    Adds what a lenient re-parse of the whole response recovers (e.g. after an
+    unescaped quote confused the incremental parser): missing sections and
+    daily_trends entries for dates not yet covered.
+    """
+    try:
+        repaired = json_repair.loads(text)
+    except ValueError:
+        return sections
+    if not isinstance(repaired, dict):
+        return sections
+
+    for key, value in repaired.items():
+        if key == 'daily_trends' and isinstance(value, list) and key in sections:
+            done = {day.get('date') for day in sections[key] if isinstance(day, dict)}
+            sections[key] = list(sections[key]) + [day for day in value if isinstance(day, dict) and day.get('date') not in done]
+        else:
+            sections.setdefault(key, value)
+    return sections
+
+def _generate_report_sections(suffix, dates, stream=False, on_progress=None):
+    """
+    Generates the report JSON through an incremental parser and returns (sections, text).
+    Sections missing from a cut-off or malformed response, and dates the model
+    skipped, are requested once more on their own (same cached prefix).
+    """
+    def on_item(key, index, value):
+        if on_progress:
+            on_progress("item", key, value)
+
+    def on_section(key, value):
+        if on_progress:
+            on_progress("section", key, value)
+
+    stream = stream or on_progress is not None
+    parser = json_stream.IncrementalJSONParser(on_section=on_section, on_item=on_item)
+    text = _request_report(suffix, parser, stream)
+    sections = parser.sections()
+    if not parser.is_complete():
+        sections = _merge_repaired(sections, text)
+
+    missing, missing_dates = _missing_report_parts(sections, dates)
+    if not missing or not sections:
+        return sections, text
+
+    print(f"[INFO] Report incomplete, regenerating only: {', '.join(missing)}" + (f" ({len(missing_dates)} dates)" if missing_dates else ""))
+    if on_progress:
+        on_progress("retry", ", ".join(missing), missing_dates)
+
+    continuation = f"""
+    CONTINUATION:
+    Part of the report is already written. Output ONLY a JSON object with these keys: {', '.join(missing)}.
+    """
+    if 'daily_trends' in missing:
+        continuation += f"'daily_trends' must contain entries only for these dates: {', '.join(missing_dates)}.\n"
+
+    retry_parser = json_stream.IncrementalJSONParser(on_section=on_section, on_item=on_item)
+    try:
+        retry_text = _request_report(suffix + continuation, retry_parser, stream)
+    except Exception as e:
+        print(f"Warning: Could not regenerate missing report sections: {e}")
+        return sections, text
+
+    retry_sections = retry_parser.sections()
+    if not retry_parser.is_complete():
+        retry_sections = _merge_repaired(retry_sections, retry_text)
+    for key, value in retry_sections.items():
+        if key == 'daily_trends' and isinstance(value, list):
+            added = [day for day in value if isinstance(day, dict) and day.get('date') in missing_dates]
+            sections['daily_trends'] = list(sections.get('daily_trends', [])) + added
+        elif key in missing:
+            sections[key] = value
+    return sections, text
+
+def annotate_peaks(keyword, articles, peak_days, max_titles_per_day=40):
     """
-    Enforces that 'sub_topics' counts sum up to the day's total volume.
-    Uses 'Others' (기타) category for under-counts.
+    Asks Gemini for a short 'reason' label for each locally detected peak day.
+    Only the headlines of those days are sent (stratified sample per day).
+    Returns [{'date', 'reason'}]; reasons are empty strings on failure.
     """
+    if not peak_days:
+        return []
+
+    peak_dates = [p['date'] for p in peak_days]
+    sections = []
+    for date in peak_dates:
+        day_articles = [a for a in articles if str(a.get('date')) == date]
+        sample = sampler.stratified_sample(day_articles, max_titles_per_day)
+        titles = "\n".join(f"- {a.get('title', '')}" for a in sample)
+        sections.append(f"## {date} ({len(day_articles)} articles)\n{titles}")
+
+    instructions = """다음은 아래 키워드 관련 기사량이 급증한 날짜들의 뉴스 제목입니다.
+각 날짜별로 기사량 급증의 원인을 2-3단어의 초단문 키워드로 작성하세요 (예: 논란 점화, 티저 공개).
+
+반드시 JSON 객체로만 답변하세요. 예: {"YYYY-MM-DD": "논란 점화"}
+
+"""
+    data = f"키워드: {keyword}\n\n" + "\n".join(sections) + "\n"
+
     try:
-        daily_trends = json_data.get('daily_trends', [])
-        for day in daily_trends:
-            # Use total_count_for_day if provided, otherwise try to get from 'volume' field
-            total_vol = total_count_for_day if total_count_for_day is not None else day.get('volume')
-            
-            if isinstance(total_vol, str):
-                if total_vol.isdigit(): total_vol = int(total_vol)
-                else: 
-                    print(f"Warning: 'volume' is not a valid integer: {total_vol}. Skipping math validation for this day.")
-                    continue
-            
-            if not isinstance(total_vol, int) or total_vol < 0:
-                print(f"Warning: Invalid 'volume' ({total_vol}) for math validation. Skipping for this day.")
-                continue
-            
-            sub_topics = day.get('sub_topics', [])
-            if not sub_topics:
-                # If no sub_topics, and total_vol > 0, add an 'Others' category
-                if total_vol > 0:
-                    day['sub_topics'] = [{
-                        "name": "기타",
-                        "count": total_vol,
-                        "percent": 100.0,
-                        "examples": "-"
-                    }]
-                continue
-                
-            # Calculate current sum
-            current_sum = sum(int(t.get('count', 0)) for t in sub_topics if str(t.get('count', 0)).isdigit())
-            
-            diff = total_vol - current_sum
-            
-            if diff > 0:
-                # Under-counted: Add 'Others' category
-                others_topic = next((t for t in sub_topics if '기타' in t.get('name', '') or 'Others' in t.get('name', '')), None)
-                
-                if others_topic:
-                    others_topic['count'] = int(others_topic.get('count', 0)) + diff
-                else:
-                    # Create new 'Others' topic
-                    sub_topics.append({
-                        "name": "기타",
-                        "count": diff,
-                        "percent": 0, # Will be recalc
-                        "examples": "-"
-                    })
-            elif diff < 0:
-                # Over-counted: Subtract from largest topic (that isn't others preferably, or just largest)
-                sorted_indices = sorted(range(len(sub_topics)), key=lambda k: int(sub_topics[k].get('count', 0)), reverse=True)
-                
-                remaining_diff = abs(diff)
-                for idx in sorted_indices:
-                    current_count = int(sub_topics[idx].get('count', 0))
-                    if current_count >= remaining_diff:
-                        sub_topics[idx]['count'] = current_count - remaining_diff
-                        remaining_diff = 0
-                        break
-                    else:
-                        # If the current topic's count is less than the remaining_diff,
-                        # set it to 0 and reduce remaining_diff by current_count.
-                        remaining_diff -= current_count
-                        sub_topics[idx]['count'] = 0
-                
-                if remaining_diff > 0:
-                    print(f"Warning: Could not fully correct over-counted sub_topics. Remaining diff: {remaining_diff}")
-            
-            # Recalculate Percentages
-            for t in sub_topics:
-                cnt = int(t.get('count', 0))
-                if total_vol > 0:
-                    pct = round((cnt / total_vol) * 100, 1) # 1 decimal place
-                else:
-                    pct = 0
-                t['percent'] = pct
-            
-            # Ensure the 'volume' field in the JSON matches the actual total_vol used for calculation
-            day['volume'] = total_vol
-                
+        text = llm_provider.generate(instructions, data, task="peaks", json_mode=True, temperature=0.3)
+        reasons = json_repair.loads(text)
+        if not isinstance(reasons, dict):
+            reasons = {}
     except Exception as e:
-        print(f"Math validation error: {e}")
-        
-    return json_data
+        print(f"Error annotating peaks: {e}")
+        reasons = {}
+
+    return [{"date": date, "reason": str(reasons.get(date, ""))} for date in peak_dates]
 
 def translate_daily_report(daily_data, target_lang='English'):
     """
-    Translates the relevant fields of a daily summary (key_issue, sub_topics) into the target language.
+    Translates the string fields of a daily summary (summaries, sub_topics, ...) into the target language.
+    Strings already in the translation memory are not sent again.
     """
-    prompt = f"""
-    You are a professional translator. 
-    Translate the following JSON content into {target_lang}.
-    Maintain the original JSON structure strictly.
-    Only translate the "value" strings. Do not translate keys.
-    
-    Data to translate:
-    {json.dumps(daily_data, ensure_ascii=False)}
-    
-    Output Format: JSON
-    """
-    
     try:
-        # Configure for valid JSON output
-        generation_config = {
-            "temperature": 0.5,
-            "response_mime_type": "application/json"
-        }
-        response = model.generate_content(prompt, generation_config=generation_config)
-        text = response.text.strip()
-        # Clean up Markdown
-        if text.startswith("```json"):
-            text = text[7:]
-        elif text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-            
-        return json.loads(text)
+        return translation_memory.translate_structure(daily_data, target_lang)
     except Exception as e:
         print(f"Translation error: {e}")
         return daily_data  # Fallback to original
@@ -430,50 +408,12 @@ def translate_daily_report(daily_data, target_lang='English'):
 def translate_global_report(report_data, target_lang='English'):
     """
     Translates the entire global report into the target language.
-    Translates structurally by section to minimize context window issues.
-    """
-    model = get_model() # Fix: Initialize model
-    
-    prompt = f"""
-    You are a professional translator. 
-    Translate the following Global Analysis Report content into {target_lang}.
-    
-    INSTRUCTIONS:
-    1. Maintain the original JSON structure strictly.
-    2. Only translate string values (values of keys). Do not translate keys.
-    3. Translate:
-       - executive_summary (tone_analysis, key_takeaways)
-       - daily_trends (issue_short, sentiment_stat usually stays similar but check, one_line_summary, narrative_summary, sub_topics.name/description, key_findings, daily_themes)
-       - peak_analysis (reason)
-       - keyword_analysis (context)
-       - detailed_topic_analysis (content, overview, cases)
-       - time_series_flow (period, major_reports, public_reaction)
-       - conclusion
-    4. Return ONLY valid JSON.
-
-    Data to translate:
-    {json.dumps(report_data, ensure_ascii=False)}
+    The report is split into string segments; only segments missing from the
+    translation memory go to the LLM, in packed batches, so prompt size no
+    longer grows with the report.
     """
-    
     try:
-        # Configure for valid JSON output
-        generation_config = {
-            "temperature": 0.5,
-            "response_mime_type": "application/json"
-        }
-        
-        # Check token limit roughly - if too huge we might need to split, but for report dict it should be fine logic-wise
-        # If deeply large, we rely on Gemini 2.0's large context window.
-        
-        response = model.generate_content(prompt, generation_config=generation_config)
-        text = response.text.strip()
-        
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.endswith("```"):
-            text = text[:-3]
-            
-        return json.loads(text)
+        return translation_memory.translate_structure(report_data, target_lang)
     except Exception as e:
         print(f"Global translation error: {e}")
         return report_data
@@ -492,32 +432,23 @@ def translate_report(report_content, target_language="English"):
     if not report_content or report_content == "No report content.":
         return report_content
     
-    model = get_model()
-    
     if target_language == "English":
-        prompt = f"""
+        instructions = """
         Translate the following Korean report to English.
         Maintain all markdown formatting, including headers, lists, bold text, and HTML tags like <mark>.
         Preserve the structure and professional tone.
         Output ONLY the translated markdown content without any additional comments.
-        
-        Report:
-        {report_content}
         """
     else:  # Korean
-        prompt = f"""
+        instructions = """
         Translate the following English report to Korean.
         Maintain all markdown formatting, including headers, lists, bold text, and HTML tags like <mark>.
         Preserve the structure and professional tone.
         Output ONLY the translated markdown content without any additional comments.
-        
-        Report:
-        {report_content}
         """
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return llm_provider.generate(instructions, f"\nReport:\n{report_content}\n", task="translation")
     except Exception as e:
         print(f"Error translating report: {e}")
         return report_content  # Return original if translation fails
@@ -1,75 +1,474 @@
 import os
 import json
+import hashlib
+import threading
+import pandas as pd
+from modules import article_log, article_store, report_schema, storage_codec, storage_lock
 
-def save_report(keyword, data):
+# Split layout: every keyword is stored as three independently loadable parts
+#   data/{keyword}.json              small metadata record (plain JSON)
+#   data/reports/{keyword}.json.zst  the report document
+#   data/articles/{keyword}.*        the article set (.arrow with pyarrow, else .json.zst),
+#                                    plus an append-only log of later changes (see article_log);
+#                                    rows reference the shared article store (see article_store)
+# The report is stored as an object (schema_version 2, see report_schema).
+# Documents are written by storage_codec (orjson + zstd/gzip, STORAGE_CODEC) and
+# read in any codec. Older single-file and plain .json reports are still read
+# and are split / recompressed on their next save.
+LAYOUT = "split"
+# Fields that live in their own part, not in the metadata record
+PART_FIELDS = ["report", "articles"]
+
+# Keyword index: one small file with every keyword's metadata and content
+# hashes, updated on save/delete (a leading dot keeps it out of the keyword list)
+MANIFEST_PATH = "data/.manifest.json"
+MANIFEST_VERSION = 1
+# Metadata fields copied into the manifest
+MANIFEST_FIELDS = ["period", "updated_at", "article_count", "summary_stats", "version"]
+MANIFEST_LOCK = ".manifest"
+# Held while article store rows are written and referenced, and while pruning,
+# so a prune never removes rows a save is about to reference
+ARTICLE_STORE_LOCK = article_store.LOCK_NAME
+
+_legacy_record = {}
+
+def _meta_path(keyword):
+    return f"data/{keyword}.json"
+
+def _report_path(keyword):
+    return f"data/reports/{keyword}.json"
+
+def _read_json(path):
+    """Reads a document in any storage codec (legacy plain .json included)."""
+    return storage_codec.read(path)
+
+def _write_json(path, data, codec=None):
+    """Writes a document in the configured codec (older copies in other codecs are removed)."""
+    return storage_codec.write(path, data, codec)
+
+def _exists(path):
+    return storage_codec.find(path) is not None
+
+def _remove(path):
+    storage_codec.remove(path)
+
+def content_hash(value):
+    """sha256 of a JSON value (key order independent); same value, same hash, in every backend."""
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def save_report(keyword, data, shared_articles=None):
     """
-    Saves the report data to local file.
-    Path: data/{keyword}.json
+    Saves the report data to local files (split layout, see above).
+    The metadata record keeps the article count instead of the articles.
+
+    Saves of one keyword are serialized by a file lock (other keywords are not
+    blocked). Every save increments the record's "version"; if `data` carries
+    a version (it was loaded from storage) and the stored one has moved on,
+    another save came first and nothing is written (returns False).
+    On success data["version"] is set to the new version.
+
+    With the article store (ARTICLE_STORE, default on; shared_articles overrides
+    it) each article is stored once for all keywords and the keyword keeps
+    references to it.
+
+    A report given as a JSON string is stored as an object; data["report"] and
+    data["schema_version"] are updated to what is stored.
     """
-    filename = f"data/{keyword}.json"
-    content = json.dumps(data, indent=2, ensure_ascii=False)
+    filename = _meta_path(keyword)
+    if "report" in data:
+        data["report"] = report_schema.decode_report(data["report"])
+    data["schema_version"] = report_schema.SCHEMA_VERSION
+    meta = {}
+    for key, value in data.items():
+        if key == "articles":
+            meta["article_count"] = len(value or [])
+        elif key not in PART_FIELDS:
+            meta[key] = value
+    meta["layout"] = LAYOUT
     
     try:
-        os.makedirs("data", exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
+        with storage_lock.file_lock(keyword):
+            stored = load_meta(keyword) if os.path.exists(filename) else None
+            current = (stored or {}).get("version", 0)
+            if stored is not None and data.get("version") is not None and data["version"] != current:
+                print(f"[ERROR] '{keyword}' was saved by someone else in the meantime "
+                      f"(version {current}, expected {data['version']}); reload and try again.")
+                return False
+            meta["version"] = current + 1
+
+            if "articles" in data:
+                rows = data["articles"] or []
+                # Only rows that are not stored yet are written (as a log segment)
+                if shared_articles if shared_articles is not None else article_store.is_enabled():
+                    with storage_lock.file_lock(ARTICLE_STORE_LOCK):
+                        article_log.save(keyword, article_store.put(rows))
+                else:
+                    article_log.save(keyword, rows)
+            if "report" in data:
+                _write_json(_report_path(keyword), data["report"])
+            # Metadata last: a reader never sees a record whose parts are missing
+            _write_json(filename, meta, codec="json")
+            hashes = {}
+            if "report" in data:
+                hashes["report_hash"] = content_hash(data["report"])
+            if "articles" in data:
+                hashes["articles_hash"] = content_hash(data["articles"] or [])
+            _update_manifest(keyword, _manifest_entry(keyword, meta, hashes))
+        data["version"] = meta["version"]
         print(f"[SUCCESS] Saved {filename} locally.")
         return True
     except Exception as e:
         print(f"[ERROR] Failed to save locally: {e}")
         return False
 
-def load_report(keyword):
+def _load_record(keyword):
     """
-    Loads report data from local file.
+    The raw record of data/{keyword}.json (split metadata or a legacy single-file report).
+    The last legacy record is kept while the file is unchanged, so loading its
+    parts one by one parses the big file once.
     """
-    filename = f"data/{keyword}.json"
-    
-    if os.path.exists(filename):
+    filename = _meta_path(keyword)
+    if not os.path.exists(filename):
+        print(f"[INFO] File not found: {filename}")
+        return None
+    try:
+        st = os.stat(filename)
+        signature = (st.st_mtime_ns, st.st_size)
+        cached = _legacy_record.get(keyword)
+        if cached and cached[0] == signature:
+            return cached[1]
+        record = _read_json(filename)
+    except Exception as e:
+        print(f"[ERROR] Failed to load {filename}: {e}")
+        return None
+    if any(key in record for key in PART_FIELDS):
+        _legacy_record.clear()
+        _legacy_record[keyword] = (signature, record)
+    return record
+
+def load_meta(keyword, record=None):
+    """
+    Metadata of a keyword (keyword, period, summary_stats, updated_at,
+    article_count, ...) without reading the report or the articles.
+    Older records are returned upgraded (their report is parsed on load).
+    """
+    record = record if record is not None else _load_record(keyword)
+    if record is None:
+        return None
+    meta = {}
+    for key, value in record.items():
+        if key == "articles":
+            meta["article_count"] = len(value or [])
+        elif key not in PART_FIELDS and key != "layout":
+            meta[key] = value
+    meta["schema_version"] = report_schema.SCHEMA_VERSION
+    return meta
+
+def stored_schema_version(keyword):
+    """Schema version of the record on disk (1 if it predates versioning), or None."""
+    record = _load_record(keyword)
+    if record is None:
+        return None
+    return record.get("schema_version", 1)
+
+def load_report_document(keyword, record=None):
+    """The report object (version 1 JSON-string reports are parsed), or None."""
+    if record is not None and "report" in record:
+        return report_schema.decode_report(record["report"])
+    path = _report_path(keyword)
+    if _exists(path):
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return report_schema.decode_report(_read_json(path))
         except Exception as e:
-            print(f"[ERROR] Failed to load {filename}: {e}")
+            print(f"[ERROR] Failed to load {path}: {e}")
             return None
-    else:
-        print(f"[INFO] File not found: {filename}")
+    if record is None:
+        # Legacy single-file layout keeps the report inline
+        record = _load_record(keyword) or {}
+        return report_schema.decode_report(record.get("report"))
+    return None
+
+def load_articles(keyword, record=None):
+    """The article list of a keyword, or None."""
+    if record is not None and "articles" in record:
+        return record["articles"]
+    if article_log.exists(keyword):
+        try:
+            rows = article_log.load(keyword)
+            if rows and any(article_store.is_ref(row) for row in rows):
+                return article_store.resolve(rows)
+            return rows
+        except Exception as e:
+            print(f"[ERROR] Failed to load articles of '{keyword}': {e}")
+            return None
+    if record is None:
+        # Legacy single-file layout keeps the articles inline
+        record = _load_record(keyword) or {}
+        return record.get("articles")
+    return None
+
+def _fill_shared(frame, columns=None):
+    """
+    Fills the shared columns of referencing rows from the article store,
+    looking up only the shared fields among `columns` (all if None).
+    """
+    # Rows saved before the store was used have no reference and keep their own values
+    ids = [ref_id if isinstance(ref_id, str) else None for ref_id in frame[article_store.REF_KEY].tolist()]
+    fields = [field for field in (columns or article_store.SHARED_FIELDS) if field in article_store.SHARED_FIELDS]
+    if fields:
+        stored, found = article_store.take(ids, fields)
+        missing = sum(1 for ref_id, ok in zip(ids, found) if ref_id and not ok)
+        if missing:
+            print(f"[WARNING] {missing} articles are missing from the article store ({article_store.store_path()})")
+        stored = stored.to_pandas().set_axis(frame.index)
+        own_rows = [ref_id is None for ref_id in ids]
+        if any(own_rows):
+            for field in fields:
+                if field in frame.columns:
+                    stored[field] = [value if own else shared for own, value, shared
+                                     in zip(own_rows, frame[field].tolist(), stored[field].tolist())]
+        frame = pd.concat([stored, frame.drop(columns=[field for field in fields if field in frame.columns])], axis=1)
+    if columns:
+        return frame[[col for col in columns if col in frame.columns]]
+    order = [col for col in article_store.SHARED_FIELDS if col in frame.columns]
+    return frame[order + [col for col in frame.columns if col not in order and col != article_store.REF_KEY]]
+
+def load_articles_frame(keyword, columns=None):
+    """
+    Articles as a DataFrame: memory-mapped from the columnar file when there is
+    one and no pending log segments (only the requested `columns` are read).
+    Rows that reference the article store get their shared columns from it
+    (again only the requested ones).
+    """
+    if article_log.exists(keyword):
+        frame = article_log.load_frame(keyword, list(columns) + [article_store.REF_KEY] if columns else None)
+        if frame is None or article_store.REF_KEY not in frame.columns:
+            return frame
+        return _fill_shared(frame, columns)
+    articles = load_articles(keyword)
+    if articles is None:
+        return None
+    frame = pd.DataFrame(articles)
+    return frame[[col for col in columns if col in frame.columns]] if columns else frame
+
+def load_report(keyword, include_articles=True):
+    """
+    Loads report data from local files, assembled into the single-document shape
+    (keyword, period, summary_stats, report, articles, updated_at).
+    With include_articles=False only "article_count" is set.
+    """
+    record = _load_record(keyword)
+    if record is None:
+        return None
+    meta = load_meta(keyword, record)
+    report = load_report_document(keyword, record)
+    articles = load_articles(keyword, record) if include_articles else None
+
+    data = {}
+    for key, value in meta.items():
+        if key == "article_count":
+            data["report"] = report if report is not None else {}
+            if include_articles:
+                data["articles"] = articles or []
+                continue
+        data[key] = value
+    if "report" not in data:
+        data["report"] = report if report is not None else {}
+    if include_articles and "articles" not in data:
+        data["articles"] = articles or []
+    return data
+
+def _manifest_entry(keyword, meta, hashes):
+    entry = {"keyword": keyword}
+    entry.update({field: meta.get(field) for field in MANIFEST_FIELDS})
+    entry.update(hashes)
+    return entry
+
+def _write_manifest(manifest):
+    """Atomic replace: readers see the old or the new manifest, never a partial one."""
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def _read_manifest():
+    try:
+        manifest = _read_json(MANIFEST_PATH)
+    except (OSError, ValueError):
         return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def _update_manifest(keyword, entry):
+    """Sets (or with entry=None removes) one keyword in the manifest."""
+    try:
+        with storage_lock.file_lock(MANIFEST_LOCK):
+            manifest = _read_manifest()
+            if manifest is None:
+                manifest = _scan_manifest()
+            previous = manifest["keywords"].get(keyword, {})
+            if entry is None:
+                manifest["keywords"].pop(keyword, None)
+            else:
+                # Hashes of parts that were not rewritten stay as they were
+                manifest["keywords"][keyword] = {**previous, **entry}
+            _write_manifest(manifest)
+    except Exception as e:
+        print(f"[ERROR] Failed to update manifest: {e}")
+
+def _scan_manifest():
+    """Builds the manifest from the files in data/ (reads every keyword)."""
+    manifest = {"version": MANIFEST_VERSION, "keywords": {}}
+    if not os.path.exists("data"):
+        return manifest
+    for file in os.listdir("data"):
+        if not file.endswith(".json") or file.startswith("."):
+            continue
+        keyword = file[:-len(".json")]
+        record = _load_record(keyword)
+        if record is None:
+            continue
+        meta = load_meta(keyword, record)
+        hashes = {}
+        report = load_report_document(keyword, record)
+        if report is not None:
+            hashes["report_hash"] = content_hash(report)
+        articles = load_articles(keyword, record)
+        if articles is not None:
+            hashes["articles_hash"] = content_hash(articles)
+        manifest["keywords"][keyword] = _manifest_entry(keyword, meta, hashes)
+    return manifest
+
+def rebuild_manifest():
+    """Rescans data/ and rewrites the manifest. Returns the number of keywords."""
+    with storage_lock.file_lock(MANIFEST_LOCK):
+        manifest = _scan_manifest()
+        _write_manifest(manifest)
+    print(f"[INFO] Rebuilt manifest with {len(manifest['keywords'])} keywords")
+    return len(manifest["keywords"])
+
+def load_manifest():
+    """The keyword manifest; built once from data/ if it does not exist yet."""
+    manifest = _read_manifest()
+    if manifest is None:
+        rebuild_manifest()
+        manifest = _read_manifest() or {"version": MANIFEST_VERSION, "keywords": {}}
+    return manifest
+
+def get_keyword_overview():
+    """Manifest entries of every keyword (metadata and content hashes), sorted by keyword."""
+    keywords = load_manifest()["keywords"]
+    return [keywords[k] for k in sorted(keywords)]
 
 def get_keyword_list():
     """
-    Returns a sorted list of keywords (files) available in local storage.
+    Returns a sorted list of keywords available in local storage (from the manifest).
     """
-    keywords = []
-    
-    if os.path.exists("data"):
-        try:
-            for file in os.listdir("data"):
-                if file.endswith(".json"):
-                    keyword = file.replace(".json", "")
-                    keywords.append(keyword)
-            print(f"[INFO] Found {len(keywords)} keywords in local storage")
-        except Exception as e:
-            print(f"[ERROR] Failed to list files: {e}")
-    else:
-        print("[INFO] Data directory does not exist")
-    
-    return sorted(keywords)
+    keywords = sorted(load_manifest()["keywords"])
+    print(f"[INFO] Found {len(keywords)} keywords in local storage")
+    return keywords
+
+def lookup_sentiments(articles):
+    """Sentiment already stored for each article by any keyword (None if unknown)."""
+    if not article_store.is_enabled():
+        return [None] * len(articles)
+    return article_store.lookup_sentiments(articles)
+
+def prune_article_store():
+    """
+    Removes store articles that no stored keyword refers to (run by delete_report).
+    Saves that write to the store wait until it is done. Returns the number removed.
+    """
+    with storage_lock.file_lock(ARTICLE_STORE_LOCK):
+        referenced = set()
+        for keyword in article_log.keywords():
+            referenced.update(row[article_store.REF_KEY] for row in article_log.load(keyword) or [] if article_store.is_ref(row))
+        removed = article_store.prune(referenced)
+    print(f"[INFO] Removed {removed} unreferenced articles from the article store")
+    return removed
 
 def delete_report(keyword):
     """
-    Deletes report data from local storage.
+    Deletes report data (all parts and stored translations) from local storage.
+    Articles only this keyword referred to are removed from the article store.
     """
-    filename = f"data/{keyword}.json"
+    filename = _meta_path(keyword)
     
     if os.path.exists(filename):
         try:
-            os.remove(filename)
+            with storage_lock.file_lock(keyword):
+                os.remove(filename)
+                _remove(_report_path(keyword))
+                article_log.delete(keyword)
+                delete_translations(keyword)
+                _update_manifest(keyword, None)
             print(f"[SUCCESS] Deleted {filename}")
-            return True
         except Exception as e:
             print(f"[ERROR] Failed to delete {filename}: {e}")
             return False
+        if article_store.exists():
+            try:
+                prune_article_store()
+            except Exception as e:
+                print(f"[ERROR] Failed to prune the article store: {e}")
+        return True
     else:
         print(f"[WARNING] File not found: {filename}")
+        _update_manifest(keyword, None)
         return False
+
+def save_translation(keyword, lang, data):
+    """
+    Saves a pre-translated report next to the report.
+    Path: data/translations/{keyword}.{lang}.json (+ codec suffix)
+    """
+    filename = f"data/translations/{keyword}.{lang}.json"
+    
+    try:
+        path = _write_json(filename, data)
+        print(f"[SUCCESS] Saved {path} locally.")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save translation: {e}")
+        return False
+
+def load_translation(keyword, lang):
+    """
+    Loads a pre-translated report. Returns None if there is none.
+    """
+    filename = f"data/translations/{keyword}.{lang}.json"
+    
+    if not _exists(filename):
+        return None
+    try:
+        return _read_json(filename)
+    except Exception as e:
+        print(f"[ERROR] Failed to load {filename}: {e}")
+        return None
+
+def _translation_files(keyword):
+    """(file, lang) of every stored translation of a keyword."""
+    if not os.path.exists("data/translations"):
+        return []
+    files = []
+    for file in sorted(os.listdir("data/translations")):
+        # {keyword}.{lang}.json with an optional codec suffix
+        name = file.split(".json")[0] if ".json" in file else file
+        if name.startswith(f"{keyword}.") and name.count(".") == keyword.count(".") + 1 and not file.endswith(".tmp"):
+            files.append((file, name[len(keyword) + 1:]))
+    return files
+
+def list_translations(keyword):
+    """Languages (codes) a keyword has stored translations for."""
+    return sorted({lang for _, lang in _translation_files(keyword)})
+
+def delete_translations(keyword):
+    """
+    Deletes every stored translation of a keyword.
+    """
+    for file, _ in _translation_files(keyword):
+        try:
+            os.remove(os.path.join("data/translations", file))
+        except Exception as e:
+            print(f"[ERROR] Failed to delete translation {file}: {e}")
@@ -1,131 +1,44 @@
-import os
-from openai import OpenAI
 from dotenv import load_dotenv
-import json
-import time
+from modules import sampler, sentiment_engine, llm_provider
 
 # CRITICAL: override=True to force reload environment variables
 load_dotenv(override=True)
 
 def get_client():
     """
-    Returns the configured xAI (Grok) client using OpenAI SDK compatibility.
+    Returns the shared xAI (Grok) client (OpenAI SDK compatibility, created once per process).
     """
-    api_key = os.getenv("GROK_API_KEY")
-    if not api_key:
-        raise ValueError("GROK_API_KEY not found in environment variables.")
-    
-    # xAI API base URL
-    return OpenAI(
-        api_key=api_key,
-        base_url="https://api.x.ai/v1"
-    )
-
-def analyze_sentiment_batch(articles, batch_size=50):
-    """
-    Analyzes sentiment for a batch of articles using Grok.
-    Returns a list of sentiments corresponding to the articles.
-    """
-    if not articles:
-        return []
+    return llm_provider.get_provider("grok").client
 
-    client = get_client()
-    all_sentiments = []
-    
-    # Process in smaller batches for better accuracy
-    # Grok is fast but we still want to be careful with context limits if any
-    for i in range(0, len(articles), batch_size):
-        batch = articles[i:i+batch_size]
-        
-        # Prepare prompt
-        titles = [f"{j+1}. {article['title']}" for j, article in enumerate(batch)]
-        titles_text = "\n".join(titles)
-        
-        prompt = f"""You are a helpful assistant. Analyze the sentiment of the following news titles.
+SENTIMENT_INSTRUCTIONS = """You are a helpful assistant. Analyze the sentiment of the following news titles.
 Classify each title as 'Positive', 'Negative', or 'Neutral'.
 
 Classification Criteria:
 - Positive: Good news, growth, development, success, etc.
-- Negative: Bad news, problems, accidents, controversies, criticism, etc.  
-- Neutral: Simple information delivery, general news
-
-Respond ONLY in a JSON array format. Example: ["Positive", "Negative", "Neutral", ...]
-Output only the JSON, no other explanations.
-
-Titles:
-{titles_text}
-"""
-        
-        try:
-            response = client.chat.completions.create(
-                model="grok-beta",  # Using grok-beta as standard available model
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that outputs only JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
-            
-            text = response.choices[0].message.content.strip()
-            
-            # Clean up code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            elif text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            
-            sentiments = json.loads(text.strip())
-            
-            # Ensure length matches
-            if len(sentiments) != len(batch):
-                print(f"Warning: Batch count ({len(batch)}) and Sentiment count ({len(sentiments)}) mismatch.")
-                while len(sentiments) < len(batch):
-                    sentiments.append("Neutral")
-                sentiments = sentiments[:len(batch)]
-            
-            all_sentiments.extend(sentiments)
-            
-            # Small delay
-            if i + batch_size < len(articles):
-                time.sleep(1)
-                
-        except json.JSONDecodeError as e:
-            print(f"Error parsing sentiment JSON response for batch {i//batch_size + 1}: {e}")
-            print(f"Raw response: {text if 'text' in locals() else 'N/A'}")
-            all_sentiments.extend(["Neutral"] * len(batch))
-        except Exception as e:
-            print(f"Error in sentiment analysis: {e}")
-            all_sentiments.extend(["Neutral"] * len(batch))
-    
-    return all_sentiments
+- Negative: Bad news, problems, accidents, controversies, criticism, etc.
+- Neutral: Simple information delivery, general news"""
 
-def generate_issue_report(keyword, articles, sentiment_summary):
+def analyze_sentiment_batch(articles, batch_size=50, return_stats=False):
     """
-    Generates a comprehensive issue report using Grok.
+    Analyzes sentiment for a batch of articles using Grok.
+    Returns a list of sentiments corresponding to the articles
+    (and the retry/bisect stats if return_stats=True).
     """
     if not articles:
-        return "No articles found to analyze."
+        return ([], {}) if return_stats else []
 
-    client = get_client()
-    
-    # Limit articles for context window
-    articles_text = ""
-    for art in articles[:50]:  # Context limit safety (top 50)
-        articles_text += f"- [{art.get('date', 'Unknown Date')}] {art['title']} ({art.get('press', 'Unknown Press')})\n"
+    def request(prefix, suffix):
+        # Grok first, other configured providers on failure
+        return llm_provider.generate(prefix, suffix, primary="grok", task="sentiment", json_mode=True,
+                                     system="You are a helpful assistant that outputs only JSON.", temperature=0.1, return_provider=True)
 
-    stats_text = f"Total: {len(articles)}, Sentiment: {sentiment_summary}"
+    titles = [article['title'] for article in articles]
+    sentiments, stats = sentiment_engine.classify_titles(titles, request, SENTIMENT_INSTRUCTIONS, batch_size, max_batch_size=200, provider="grok")
+    return (sentiments, stats) if return_stats else sentiments
 
-    prompt = f"""
-    You are an expert news analyst. Create a high-quality 'Issue Report' for the keyword: '{keyword}'.
-    Use the following news data (Title, Date, Press) to generate a professional, structured report.
-    
-    ## Data Summary
-    {stats_text}
-    
-    ## News Headlines (Sample)
-    {articles_text}
+REPORT_INSTRUCTIONS = """
+    You are an expert news analyst. Create a high-quality 'Issue Report' for the keyword given below.
+    Use the news data (Title, Date, Press) that follows these requirements to generate a professional, structured report.
     
     ## Report Structure & Requirements
     
@@ -166,18 +79,43 @@ def generate_issue_report(keyword, articles, sentiment_summary):
     Write in Korean. Professional and analytical tone.
     Output ONLY the Markdown content. Use proper headers and bullet points.
     Ensure HTML tags like <mark> are used strictly following the format in section 3.4.
+"""
+
+def generate_issue_report(keyword, articles, sentiment_summary, sample_size=50):
+    """
+    Generates a comprehensive issue report using Grok.
+    Sends a stratified sample of `sample_size` headlines (covering every date)
+    plus the exact per-day counts of the full article list.
+    """
+    if not articles:
+        return "No articles found to analyze."
+
+    # Representative sample for context window (stratified by date/sentiment/press)
+    articles_text = ""
+    for art in sampler.stratified_sample(articles, sample_size):
+        articles_text += f"- [{art.get('date', 'Unknown Date')}] {art['title']} ({art.get('press', 'Unknown Press')})\n"
+
+    stats_text = f"Total: {len(articles)}, Sentiment: {sentiment_summary}"
+    daily_counts_text = sampler.format_daily_counts(sampler.daily_counts(articles))
+
+    # The report requirements go first and never change (cacheable prefix)
+    suffix = f"""
+    ## Keyword
+    {keyword}
+    
+    ## Data Summary
+    {stats_text}
+    
+    ## Daily Article Counts (exact, all articles)
+    {daily_counts_text}
+    
+    ## News Headlines (Representative Sample)
+    {articles_text}
     """
     
     try:
-        response = client.chat.completions.create(
-            model="grok-beta",
-            messages=[
-                {"role": "system", "content": "You are a professional news analyst. Output highly structured markdown."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        return response.choices[0].message.content
+        return llm_provider.generate(REPORT_INSTRUCTIONS, suffix, primary="grok", task="report",
+                                     system="You are a professional news analyst. Output highly structured markdown.", temperature=0.3)
     except Exception as e:
         print(f"Error generating report: {e}")
         raise  # Re-raise to let caller handle the error
@@ -189,30 +127,19 @@ def translate_report(report_content, target_language="English"):
     if not report_content or report_content == "No report content.":
         return report_content
     
-    client = get_client()
-    
     if target_language == "English":
-        prompt = f"""
+        instructions = """
         Translate the following Korean report to English.
         Maintain all markdown formatting, including headers, lists, bold text, and HTML tags like <mark>.
         Preserve the structure and professional tone.
         Output ONLY the translated markdown content without any additional comments.
-        
-        Report:
-        {report_content}
         """
     else:  # Korean
-        prompt = "Translate the following to Korean." # Fallback simple prompt
+        instructions = "Translate the following to Korean." # Fallback simple prompt
     
     try:
-        response = client.chat.completions.create(
-            model="grok-beta",
-            messages=[
-                {"role": "system", "content": "You are a professional translator."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return llm_provider.generate(instructions, f"\nReport:\n{report_content}\n", primary="grok", task="translation",
+                                     system="You are a professional translator.")
     except Exception as e:
         print(f"Error translating report: {e}")
         return report_content
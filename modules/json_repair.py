@@ -0,0 +1,270 @@
+import re
+import json
+
+# Next quote or backslash inside a string
+_DOUBLE_STRING_STOP = re.compile(r'["\\]')
+_SINGLE_STRING_STOP = re.compile(r"['\\]")
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+# Unquoted keys / values run until a structural character
+_BARE_WORD = re.compile(r'[^,:{}\[\]"\'\n]+')
+_WHITESPACE = " \t\r\n"
+# An unquoted key ("key:") after a comma also means the string has ended
+_UNQUOTED_KEY = re.compile(r'[A-Za-z_]\w*\s*:')
+
+LITERALS = {
+    "true": True, "false": False, "null": None,
+    "True": True, "False": False, "None": None
+}
+
+ESCAPES = {'"': '"', "'": "'", '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class _Incomplete(Exception):
+    """The input ended inside a value."""
+
+def strip_code_fences(text):
+    """Removes a surrounding markdown code block (```json ... ```) from a response."""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    return text.strip()
+
+class _RepairParser:
+    """
+    Single-pass recursive descent parser that accepts almost-JSON.
+    Every character is consumed once; the only lookahead is over whitespace
+    after a quote, to decide whether it closes the string.
+    """
+
+    def __init__(self, text, keep_partial=False):
+        self.text = text
+        self.n = len(text)
+        self.i = 0
+        self.keep_partial = keep_partial
+
+    def parse(self):
+        # Skip any prose or code fence before the first container
+        starts = [pos for pos in (self.text.find('{'), self.text.find('[')) if pos != -1]
+        if not starts:
+            raise ValueError("No JSON object or array found")
+        self.i = min(starts)
+        try:
+            return self._value(depth=0)
+        except _Incomplete:
+            raise ValueError("JSON value is truncated before any complete member")
+
+    def _skip(self):
+        """Skips whitespace and // or /* */ comments."""
+        text, n = self.text, self.n
+        while self.i < n:
+            ch = text[self.i]
+            if ch in _WHITESPACE:
+                self.i += 1
+            elif ch == '/' and self.i + 1 < n and text[self.i + 1] == '/':
+                end = text.find('\n', self.i)
+                self.i = n if end == -1 else end + 1
+            elif ch == '/' and self.i + 1 < n and text[self.i + 1] == '*':
+                end = text.find('*/', self.i + 2)
+                self.i = n if end == -1 else end + 2
+            else:
+                break
+
+    def _value(self, depth):
+        self._skip()
+        if self.i >= self.n:
+            raise _Incomplete()
+        ch = self.text[self.i]
+        if ch == '{':
+            return self._object(depth)
+        if ch == '[':
+            return self._array(depth)
+        if ch in '"\'':
+            return self._string(ch, is_key=False)
+        return self._literal()
+
+    def _incomplete(self, depth, partial):
+        """At end of input: the outermost value (or any, with keep_partial) is closed, others dropped."""
+        if depth == 0 or self.keep_partial:
+            return partial
+        raise _Incomplete()
+
+    def _object(self, depth):
+        self.i += 1
+        result = {}
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return self._incomplete(depth, result)
+            ch = self.text[self.i]
+            if ch in '}]':
+                self.i += 1
+                return result
+            if ch == ',':
+                # Leading, doubled and trailing commas are ignored
+                self.i += 1
+                continue
+
+            if ch in '"\'':
+                try:
+                    key = self._string(ch, is_key=True)
+                except _Incomplete:
+                    return self._incomplete(depth, result)
+            else:
+                key = self._bare_word()
+                if key is None:
+                    # Stray character where a key should start
+                    self.i += 1
+                    continue
+
+            self._skip()
+            if self.i >= self.n:
+                return self._incomplete(depth, result)
+            if self.text[self.i] == ':':
+                self.i += 1
+            elif self.text[self.i] in ',}':
+                # Key without a value
+                continue
+
+            try:
+                value = self._value(depth + 1)
+            except _Incomplete:
+                return self._incomplete(depth, result)
+            result[key] = value
+
+    def _array(self, depth):
+        self.i += 1
+        result = []
+        while True:
+            self._skip()
+            if self.i >= self.n:
+                return self._incomplete(depth, result)
+            ch = self.text[self.i]
+            if ch in ']}':
+                self.i += 1
+                return result
+            if ch == ',':
+                self.i += 1
+                continue
+            try:
+                result.append(self._value(depth + 1))
+            except _Incomplete:
+                return self._incomplete(depth, result)
+
+    def _closes_string(self, pos, is_key):
+        """
+        Decides whether the quote at `pos` ends the string or is an unescaped
+        quote inside it, from the next non-space character.
+        """
+        text, n = self.text, self.n
+        j = pos + 1
+        while j < n and text[j] in _WHITESPACE:
+            j += 1
+        if j >= n:
+            return True
+        nxt = text[j]
+        if nxt in '}]':
+            return True
+        if nxt == ':':
+            return is_key
+        if nxt == ',':
+            if is_key:
+                return False
+            # A real separator is followed by the next key/value or a closing bracket
+            k = j + 1
+            while k < n and text[k] in _WHITESPACE:
+                k += 1
+            if k >= n:
+                return True
+            follower = text[k]
+            return (follower in '"\'{[]}-/' or follower.isdigit() or text.startswith(("true", "false", "null"), k)
+                    or _UNQUOTED_KEY.match(text, k) is not None)
+        if nxt == '/' and j + 1 < n and text[j + 1] in '/*':
+            return True
+        return False
+
+    def _string(self, quote, is_key):
+        text = self.text
+        stop = _DOUBLE_STRING_STOP if quote == '"' else _SINGLE_STRING_STOP
+        self.i += 1
+        parts = []
+        while True:
+            match = stop.search(text, self.i)
+            if match is None:
+                raise _Incomplete()
+            pos = match.start()
+            parts.append(text[self.i:pos])
+            if text[pos] == '\\':
+                if pos + 1 >= self.n:
+                    raise _Incomplete()
+                esc = text[pos + 1]
+                if esc == 'u':
+                    code = text[pos + 2:pos + 6]
+                    if len(code) < 4:
+                        raise _Incomplete()
+                    try:
+                        parts.append(chr(int(code, 16)))
+                        self.i = pos + 6
+                    except ValueError:
+                        parts.append('\\u')
+                        self.i = pos + 2
+                    continue
+                # Unknown escapes keep the character as is
+                parts.append(ESCAPES.get(esc, esc))
+                self.i = pos + 2
+                continue
+            if self._closes_string(pos, is_key):
+                self.i = pos + 1
+                return "".join(parts)
+            parts.append(quote)
+            self.i = pos + 1
+
+    def _bare_word(self):
+        match = _BARE_WORD.match(self.text, self.i)
+        if match is None or not match.group(0).strip():
+            return None
+        self.i = match.end()
+        return match.group(0).strip()
+
+    def _literal(self):
+        number = _NUMBER.match(self.text, self.i)
+        if number:
+            end = number.end()
+            # Only a number if nothing word-like follows (e.g. not '3rd place')
+            if end >= self.n or self.text[end] in _WHITESPACE + ',}]/':
+                self.i = end
+                raw = number.group(0)
+                return float(raw) if any(c in raw for c in '.eE') else int(raw)
+
+        word = self._bare_word()
+        if word is None:
+            # Structural character in value position (e.g. ':' or stray quote)
+            self.i += 1
+            return None
+        if self.i >= self.n and word not in LITERALS:
+            # A bare word cut off by the end of input
+            raise _Incomplete()
+        return LITERALS.get(word, word)
+
+def loads(text, keep_partial=False):
+    """
+    Parses an LLM's JSON response, repairing common defects:
+    code fences and surrounding prose, // and /* */ comments, trailing or
+    missing commas, single quotes, unquoted keys, unescaped quotes inside
+    strings and truncated tails.
+
+    On truncation the outermost container is closed and any unfinished nested
+    value is dropped (or kept as far as it goes with `keep_partial`).
+    Valid JSON takes the fast path through the standard parser.
+    Raises ValueError when no JSON object or array can be found.
+    """
+    cleaned = strip_code_fences(text)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        pass
+    return _RepairParser(cleaned, keep_partial).parse()
+
+def repair(text, keep_partial=False):
+    """Returns a valid JSON string for an LLM response (see loads)."""
+    return json.dumps(loads(text, keep_partial), ensure_ascii=False)
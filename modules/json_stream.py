@@ -0,0 +1,146 @@
+import json
+from modules import json_repair
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed top-level JSON object (the issue report).
+
+    Text is fed chunk by chunk with feed(); every character is scanned once.
+    - on_section(key, value) fires as soon as a top-level member is complete
+    - on_item(key, index, value) fires for every complete element of the
+      top-level arrays listed in `item_sections` (e.g. each daily_trends entry)
+
+    If the stream is cut off, sections() still returns every complete section
+    and, for an unfinished item section, the elements completed so far.
+    Leading text before the first '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self, on_section=None, on_item=None, item_sections=("daily_trends",)):
+        self.on_section = on_section
+        self.on_item = on_item
+        self.item_sections = set(item_sections)
+        self.text = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.expect_key = False
+        self.awaiting_value = False
+        self.key = None
+        self.value_start = None
+        self.item_start = None
+        self.closed = False
+        self.complete = {}
+        self.items = {}
+
+    def feed(self, chunk):
+        """Consumes the next piece of the stream."""
+        if not chunk or self.closed:
+            return
+        self.text += chunk
+        text = self.text
+        i = self.pos
+        n = len(text)
+        while i < n and not self.closed:
+            ch = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1 and self.expect_key:
+                        self.key = self._loads(text[self.string_start:i + 1])
+                        self.expect_key = False
+            elif not self.stack:
+                if ch == '{':
+                    self.stack.append(ch)
+                    self.expect_key = True
+            else:
+                depth = len(self.stack)
+                if depth == 1 and self.awaiting_value and not ch.isspace():
+                    self.value_start = i
+                    self.awaiting_value = False
+
+                if ch == '"':
+                    self.in_string = True
+                    self.string_start = i
+                elif ch in '{[':
+                    self.stack.append(ch)
+                    if len(self.stack) == 3 and self.stack[1] == '[' and self.key in self.item_sections:
+                        self.item_start = i
+                elif ch in '}]':
+                    if depth == 1 and self.value_start is not None:
+                        # Closing brace right after a scalar value
+                        self._finish_section(i)
+                    self.stack.pop()
+                    if len(self.stack) == 2 and self.item_start is not None:
+                        self._finish_item(i + 1)
+                    elif len(self.stack) == 1 and self.value_start is not None:
+                        self._finish_section(i + 1)
+                    elif not self.stack:
+                        self.closed = True
+                elif depth == 1:
+                    if ch == ':':
+                        self.awaiting_value = True
+                    elif ch == ',':
+                        if self.value_start is not None:
+                            self._finish_section(i)
+                        self.expect_key = True
+            i += 1
+        self.pos = i
+
+    def _loads(self, raw):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+        # Containers with defects inside (unescaped quotes, trailing commas, ...)
+        try:
+            return json_repair.loads(raw) if raw[:1] in '{[' else None
+        except ValueError:
+            return None
+
+    def _finish_item(self, end):
+        raw = self.text[self.item_start:end]
+        self.item_start = None
+        value = self._loads(raw)
+        if value is None:
+            return
+        items = self.items.setdefault(self.key, [])
+        items.append(value)
+        if self.on_item:
+            self.on_item(self.key, len(items) - 1, value)
+
+    def _finish_section(self, end):
+        raw = self.text[self.value_start:end].strip()
+        self.value_start = None
+        value = self._loads(raw)
+        if value is None:
+            if self.key not in self.items:
+                return
+            # The array as a whole is broken; keep the elements that parsed
+            value = self.items[self.key]
+        self.complete[self.key] = value
+        if self.on_section:
+            self.on_section(self.key, value)
+
+    def sections(self):
+        """Every complete section, plus completed elements of an unfinished item section."""
+        result = dict(self.complete)
+        for key, items in self.items.items():
+            if key not in result and items:
+                result[key] = list(items)
+        return result
+
+    def is_complete(self):
+        """True once the top-level object has been closed."""
+        return self.closed
+
+def parse_sections(text, item_sections=("daily_trends",)):
+    """Salvages the complete sections of a (possibly truncated) JSON object response."""
+    parser = IncrementalJSONParser(item_sections=item_sections)
+    parser.feed(text or "")
+    return parser.sections()
@@ -0,0 +1,222 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Hangul runs and latin words (brands like 'CJ', 'tvN')
+TOKEN_PATTERN = re.compile(r"[가-힣]+|[A-Za-z][A-Za-z0-9&+]*")
+
+# Postpositions (josa) and common endings, longest first
+JOSA_SUFFIXES = sorted([
+    "은", "는", "이", "가", "을", "를", "의", "에", "도", "와", "과", "로", "만", "서",
+    "에서", "에게", "한테", "으로", "부터", "까지", "보다", "처럼", "라고", "이라", "이란",
+    "이며", "에도", "에선", "으로서", "로서", "이다", "였다", "했다", "한다", "하다", "하는",
+    "에서의", "과의", "와의", "이라고", "께서", "마저", "조차", "이나", "나"
+], key=len, reverse=True)
+
+STOPWORDS = {
+    "기자", "뉴스", "사진", "영상", "종합", "단독", "속보", "포토", "오늘", "이번", "관련",
+    "위해", "대한", "통해", "있는", "없는", "그리고", "하지만", "지난", "가장", "다시", "모두",
+    "공개", "화제", "이유", "근황", "결국", "역시", "진짜", "무슨", "어떤", "이런", "그런",
+    "했다", "한다", "이다", "있다", "없다", "된다", "됐다", "같은", "것", "수", "등", "및"
+}
+
+def load_user_dictionary(path):
+    """
+    Loads a user dictionary (one term per line, '#' for comments).
+    Returns an empty list if the path is not set or missing.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    terms = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            term = line.strip()
+            if term and not term.startswith('#'):
+                terms.append(term)
+    return terms
+
+def default_dictionaries():
+    """User dictionaries configured via USER_DICT_PEOPLE / USER_DICT_BRANDS (.env)."""
+    return {
+        "people": load_user_dictionary(os.getenv("USER_DICT_PEOPLE")),
+        "brands": load_user_dictionary(os.getenv("USER_DICT_BRANDS"))
+    }
+
+def raw_tokens(title):
+    """Splits a headline into Hangul/latin word tokens (no normalization)."""
+    return TOKEN_PATTERN.findall(title or "")
+
+def char_ngrams(title, n=2):
+    """Character n-grams over the Hangul/latin tokens of a headline."""
+    grams = []
+    for tok in raw_tokens(title):
+        if len(tok) <= n:
+            grams.append(tok)
+        else:
+            grams.extend(tok[i:i + n] for i in range(len(tok) - n + 1))
+    return grams
+
+def _strip_josa(token, vocabulary):
+    """
+    Strips a trailing postposition when the remaining stem is itself seen as a
+    standalone token in the corpus (avoids cutting nouns like '전문가' -> '전문').
+    """
+    for suffix in JOSA_SUFFIXES:
+        if len(token) > len(suffix) + 1 and token.endswith(suffix):
+            stem = token[:-len(suffix)]
+            if stem in vocabulary:
+                return stem
+    return token
+
+def tokenize(title, vocabulary=None, min_len=2):
+    """
+    Korean-aware noun-like tokenization of one headline.
+    With a corpus `vocabulary` (set of raw tokens), postpositions are stripped.
+    """
+    tokens = []
+    for tok in raw_tokens(title):
+        if vocabulary is not None:
+            tok = _strip_josa(tok, vocabulary)
+        if len(tok) >= min_len and tok not in STOPWORDS:
+            tokens.append(tok)
+    return tokens
+
+@lru_cache(maxsize=64)
+def _compile_terms(terms):
+    """Compiles a longest-first alternation for dictionary matching."""
+    ordered = sorted(set(t for t in terms if t), key=len, reverse=True)
+    if not ordered:
+        return None
+    return re.compile("|".join(re.escape(t) for t in ordered))
+
+def match_terms(title, terms):
+    """Returns the dictionary terms found in a headline (each once, in order of appearance)."""
+    pattern = _compile_terms(tuple(terms))
+    if pattern is None or not title:
+        return []
+    found = []
+    for m in pattern.finditer(title):
+        if m.group(0) not in found:
+            found.append(m.group(0))
+    return found
+
+def _new_bucket():
+    return {"overall": Counter(), "daily": {}}
+
+def _count(bucket, date, terms):
+    bucket["overall"].update(terms)
+    bucket["daily"].setdefault(date, Counter()).update(terms)
+
+def build_term_index(articles, people=None, brands=None, exclude=None, tokenizer="noun"):
+    """
+    Builds a term-frequency index over all article titles.
+    Counts are document frequencies: the number of articles mentioning a term.
+
+    people / brands: optional user dictionaries (lists of terms)
+    exclude: terms to leave out of 'topics' (e.g. the search keyword); tokens
+             starting with an excluded term are dropped too
+    tokenizer: "noun" (josa-stripped word tokens) or "ngram" (character bigrams)
+
+    Returns:
+        {
+            "total_articles": n,
+            "titles": [(date, title), ...],
+            "topics": {"overall": Counter, "daily": {date: Counter}},
+            "people": {...}, "brands": {...}
+        }
+    """
+    titles = [(str(a.get('date') or 'Unknown'), a.get('title') or "") for a in articles]
+
+    # Single pass over titles: raw tokens per title plus corpus vocabulary
+    title_tokens = [raw_tokens(title) for _, title in titles]
+    vocabulary = set()
+    for toks in title_tokens:
+        vocabulary.update(toks)
+
+    excluded = set()
+    for term in exclude or []:
+        excluded.update(raw_tokens(term))
+    excluded = tuple(excluded)
+
+    index = {
+        "total_articles": len(titles),
+        "titles": titles,
+        "topics": _new_bucket(),
+        "people": _new_bucket(),
+        "brands": _new_bucket()
+    }
+    # Normalize each distinct raw token once instead of once per occurrence
+    normalized = {tok: _strip_josa(tok, vocabulary) for tok in vocabulary}
+
+    for (date, title), toks in zip(titles, title_tokens):
+        if tokenizer == "ngram":
+            terms = set(char_ngrams(title))
+        else:
+            terms = set(normalized[t] for t in toks)
+        terms = {t for t in terms if len(t) >= 2 and t not in STOPWORDS}
+        if excluded:
+            terms = {t for t in terms if not t.startswith(excluded)}
+        _count(index["topics"], date, terms)
+
+        if people:
+            _count(index["people"], date, set(match_terms(title, people)))
+        if brands:
+            _count(index["brands"], date, set(match_terms(title, brands)))
+
+    return index
+
+def top_terms(index, category="topics", n=10, date=None):
+    """Returns the top-N [(term, count)] overall or for one date."""
+    bucket = index[category]
+    counter = bucket["daily"].get(date, Counter()) if date else bucket["overall"]
+    return counter.most_common(n)
+
+def count_terms(index, terms, date=None):
+    """
+    Exact document counts for arbitrary terms (e.g. names proposed by the model),
+    overall or for one date. Returns {term: count}.
+    """
+    counts = Counter()
+    for day, title in index["titles"]:
+        if date and day != date:
+            continue
+        counts.update(set(match_terms(title, terms)))
+    return {t: counts.get(t, 0) for t in terms}
+
+def build_keyword_ranking(index, category, model_entries=None, n=10):
+    """
+    Builds a keyword_analysis list [{'rank', 'keyword', 'count', 'context'}] with exact counts.
+
+    - topics, or a category with a user dictionary: terms come from the index
+    - otherwise: terms proposed by the model are counted locally; terms that
+      never appear in a title are dropped
+    The model's 'context' is kept by keyword.
+    """
+    contexts = {}
+    for entry in model_entries or []:
+        if isinstance(entry, dict) and entry.get('keyword'):
+            contexts.setdefault(entry['keyword'], entry.get('context', ''))
+
+    ranked = top_terms(index, category, n)
+    if not ranked and contexts:
+        counts = count_terms(index, list(contexts))
+        ranked = sorted(((t, c) for t, c in counts.items() if c > 0), key=lambda x: x[1], reverse=True)[:n]
+
+    return [
+        {"rank": i + 1, "keyword": term, "count": int(count), "context": contexts.get(term, "")}
+        for i, (term, count) in enumerate(ranked)
+    ]
+
+def apply_keyword_analysis(report, index, n=10):
+    """
+    Replaces report['keyword_analysis'] (in place) with exactly counted rankings.
+    The model is only responsible for each keyword's 'context'.
+    """
+    model_section = report.get("keyword_analysis") or {}
+    report["keyword_analysis"] = {
+        "people": build_keyword_ranking(index, "people", model_section.get("people"), n),
+        "topics": build_keyword_ranking(index, "topics", model_section.get("topics"), n),
+        "brands_companies": build_keyword_ranking(index, "brands", model_section.get("brands_companies"), n)
+    }
+    return report
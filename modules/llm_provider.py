@@ -0,0 +1,421 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+from modules import prompt_cache, response_cache, json_repair
+
+# CRITICAL: override=True to force reload environment variables
+load_dotenv(override=True)
+
+DEFAULT_ORDER = ["gemini", "claude", "grok"]
+
+# Hedging: a duplicate request goes to the next provider once the primary is
+# slower than this percentile of its recent latencies for the same task
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 5
+HEDGE_DEFAULT_DELAY = 30.0
+LATENCY_WINDOW = 50
+
+_providers = {}
+_latencies = {}
+# Primary provider and hedging chosen in the app (None = use .env). A context
+# variable, so the choice stays with the session that made it: Streamlit runs
+# every session's script in its own thread within one process.
+_settings = contextvars.ContextVar("llm_settings", default={"primary": None, "hedge": None})
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+
+def _env(*names):
+    """First non-empty environment variable among `names`."""
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return value
+    return None
+
+class GeminiProvider:
+    """Google Gemini (google-generativeai). Configured once per process."""
+    name = "gemini"
+    model_name = "gemini-2.5-flash"
+
+    def __init__(self):
+        import google.generativeai as genai
+        api_key = _env("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+        genai.configure(api_key=api_key)
+        self.client = genai
+
+    def _config(self, prefix, json_mode, temperature, max_tokens, system):
+        config = {}
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens:
+            config["max_output_tokens"] = max_tokens
+        if system:
+            prefix = f"{system}\n\n{prefix}"
+        return prefix, config or None
+
+    def generate(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        prefix, config = self._config(prefix, json_mode, temperature, max_tokens, system)
+        return prompt_cache.gemini_generate(self.model_name, prefix, suffix, config)
+
+    def stream(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        prefix, config = self._config(prefix, json_mode, temperature, max_tokens, system)
+        return prompt_cache.gemini_stream(self.model_name, prefix, suffix, config)
+
+class ClaudeProvider:
+    """Anthropic Claude. The client keeps its HTTP connection pool between calls."""
+    name = "claude"
+    model_name = "claude-3-5-sonnet-20241022"
+
+    def __init__(self):
+        from anthropic import Anthropic
+        api_key = _env("CLAUDE_API_KEY", "ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("CLAUDE_API_KEY not found in environment variables.")
+        self.client = Anthropic(api_key=api_key)
+
+    def _options(self, temperature, system):
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if system:
+            options["system"] = system
+        return options
+
+    def generate(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        return prompt_cache.anthropic_generate(self.client, self.model_name, prefix, suffix, max_tokens=max_tokens or 8192, **self._options(temperature, system))
+
+    def stream(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        return prompt_cache.anthropic_stream(self.client, self.model_name, prefix, suffix, max_tokens=max_tokens or 8192, **self._options(temperature, system))
+
+class GrokProvider:
+    """xAI Grok through the OpenAI-compatible API."""
+    name = "grok"
+    # Using grok-beta as standard available model
+    model_name = "grok-beta"
+
+    def __init__(self):
+        from openai import OpenAI
+        api_key = _env("GROK_API_KEY", "XAI_API_KEY")
+        if not api_key:
+            raise ValueError("GROK_API_KEY not found in environment variables.")
+        self.client = OpenAI(api_key=api_key, base_url="https://api.x.ai/v1")
+
+    def _options(self, json_mode, temperature, max_tokens):
+        options = {}
+        if json_mode:
+            options["response_format"] = {"type": "json_object"}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens:
+            options["max_tokens"] = max_tokens
+        return options
+
+    def generate(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        options = self._options(json_mode, temperature, max_tokens)
+        return prompt_cache.openai_generate(self.client, self.model_name, prefix, suffix, system=system, provider=self.name, **options)
+
+    def stream(self, prefix, suffix, json_mode=False, temperature=None, max_tokens=None, system=None):
+        options = self._options(json_mode, temperature, max_tokens)
+        return prompt_cache.openai_stream(self.client, self.model_name, prefix, suffix, system=system, provider=self.name, **options)
+
+PROVIDER_CLASSES = {
+    "gemini": GeminiProvider,
+    "claude": ClaudeProvider,
+    "grok": GrokProvider
+}
+
+API_KEY_NAMES = {
+    "gemini": ("GOOGLE_API_KEY",),
+    "claude": ("CLAUDE_API_KEY", "ANTHROPIC_API_KEY"),
+    "grok": ("GROK_API_KEY", "XAI_API_KEY")
+}
+
+def register_provider(name, provider):
+    """
+    Registers a ready provider instance (anything with generate(prefix, suffix, **options)),
+    e.g. prompt_cache.FakeProvider for offline tests. Replaces an existing one.
+    """
+    with _lock:
+        _providers[name] = provider
+        _clear_latencies(name)
+
+def unregister_provider(name):
+    with _lock:
+        _providers.pop(name, None)
+        _clear_latencies(name)
+
+def _clear_latencies(name):
+    for key in [k for k in _latencies if k[0] == name]:
+        _latencies.pop(key)
+
+def get_provider(name):
+    """Returns the long-lived provider instance, creating its client on first use."""
+    with _lock:
+        provider = _providers.get(name)
+        if provider is None:
+            if name not in PROVIDER_CLASSES:
+                raise ValueError(f"Unknown LLM provider: {name}")
+            provider = PROVIDER_CLASSES[name]()
+            _providers[name] = provider
+        return provider
+
+def is_available(name):
+    """True if the provider is registered or its API key is configured."""
+    return name in _providers or (name in API_KEY_NAMES and _env(*API_KEY_NAMES[name]) is not None)
+
+def configure(primary=None, hedge=None):
+    """
+    Sets the primary provider and hedging default for the calling session
+    (thread / context) only (None = from .env). Threads it starts get the
+    settings through in_session().
+    """
+    _settings.set({"primary": primary, "hedge": hedge})
+
+def in_session(fn):
+    """`fn` wrapped to run with the caller's configure() settings, e.g. in a worker thread."""
+    settings = _settings.get()
+
+    def run(*args, **kwargs):
+        token = _settings.set(settings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _settings.reset(token)
+    return run
+
+def available_providers():
+    """Configured providers in the default order."""
+    return provider_order()
+
+def provider_order(primary=None):
+    """
+    Providers to try, in order: LLM_PROVIDERS (comma separated, .env) or the
+    default order, limited to providers with an API key. `primary` (or the
+    primary set with configure()) goes first.
+    """
+    primary = primary or _settings.get()["primary"]
+    configured = [p.strip() for p in (os.getenv("LLM_PROVIDERS") or "").split(",") if p.strip()]
+    order = configured or list(DEFAULT_ORDER)
+    if primary:
+        order = [primary] + [p for p in order if p != primary]
+    return [p for p in order if is_available(p)]
+
+def _record_latency(name, task, seconds):
+    with _lock:
+        _latencies.setdefault((name, task), deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+def hedge_delay(name, task="default"):
+    """Seconds to wait on `name` before hedging: the HEDGE_PERCENTILE of recent latencies."""
+    with _lock:
+        samples = sorted(_latencies.get((name, task), []))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))]
+
+def get_latency_stats():
+    """Returns {(provider, task): {'count', 'p50', 'p90', 'max'}} in seconds."""
+    with _lock:
+        snapshot = {key: sorted(values) for key, values in _latencies.items()}
+    stats = {}
+    for key, samples in snapshot.items():
+        if samples:
+            stats[key] = {
+                "count": len(samples),
+                "p50": round(samples[len(samples) // 2], 2),
+                "p90": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))], 2),
+                "max": round(samples[-1], 2)
+            }
+    return stats
+
+def _model_name(name):
+    """Model of a provider without creating its client."""
+    provider = _providers.get(name) or PROVIDER_CLASSES.get(name)
+    return getattr(provider, "model_name", name)
+
+def _call(name, task, prefix, suffix, options, cache=True):
+    started = time.time()
+    text = get_provider(name).generate(prefix, suffix, **options)
+    _record_latency(name, task, time.time() - started)
+    if not text:
+        raise ValueError(f"{name} returned an empty response")
+    if cache and _cacheable(text, options):
+        key = response_cache.make_key(name, _model_name(name), options, prefix, suffix)
+        response_cache.put(key, text, provider=name, model=_model_name(name))
+    return text
+
+def _cacheable(text, options):
+    """
+    JSON-mode answers are only cached when they parse as they are (strict, no
+    repair), so a retry can get a fresh answer for a truncated or broken reply.
+    """
+    if not options.get("json_mode"):
+        return True
+    try:
+        json.loads(json_repair.strip_code_fences(text))
+        return True
+    except ValueError:
+        return False
+
+def _hedged_call(primary, secondary, task, prefix, suffix, options, cache=True, errors=None):
+    """
+    Sends the request to `primary`; if it has not answered within hedge_delay(),
+    sends a duplicate to `secondary` and returns (text, provider) of whichever
+    succeeds first. The slower request is left to finish in the background.
+    Each provider that fails is added to `errors` as "name: error"; raises
+    RuntimeError when both failed.
+    """
+    errors = errors if errors is not None else []
+    first = _executor.submit(_call, primary, task, prefix, suffix, options, cache)
+    try:
+        return first.result(timeout=hedge_delay(primary, task)), primary
+    except Exception as e:
+        if first.done():
+            # The primary failed quickly: plain failover
+            print(f"Warning: {primary} request failed: {e}")
+            errors.append(f"{primary}: {e}")
+            try:
+                return _call(secondary, task, prefix, suffix, options, cache), secondary
+            except Exception as e:
+                print(f"Warning: {secondary} request failed: {e}")
+                errors.append(f"{secondary}: {e}")
+                raise RuntimeError(f"{primary} and {secondary} failed") from e
+
+    print(f"[INFO] {primary} slower than p{int(HEDGE_PERCENTILE * 100)} for '{task}', hedging with {secondary}")
+    second = _executor.submit(_call, secondary, task, prefix, suffix, options, cache)
+    names = {first: primary, second: secondary}
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result(), names[future]
+            except Exception as e:
+                print(f"Warning: {names[future]} request failed: {e}")
+                errors.append(f"{names[future]}: {e}")
+    raise RuntimeError(f"{primary} and {secondary} failed")
+
+def generate(prefix, suffix="", primary=None, providers=None, task="default", hedge=None,
+             json_mode=False, temperature=None, max_tokens=None, system=None, cache=True, return_provider=False):
+    """
+    Sends one request through the provider layer and returns the response text.
+
+    prefix/suffix: static (cacheable) and variable parts of the prompt
+    primary: provider to try first (default: this session's configure() / LLM_PROVIDERS);
+             providers: explicit order (overrides primary)
+    task: latency bucket for hedging ('sentiment', 'report', 'translation', ...)
+    hedge: send a duplicate to the next provider when the current one is slower
+           than its usual latency (default: LLM_HEDGE=1 in .env)
+    cache: use the on-disk response cache (see response_cache); identical
+           requests are answered from disk unless the cache is bypassed
+    return_provider: return (text, provider) with the provider that answered
+                     (or whose cached answer was used)
+
+    Providers are tried in order; on an error the next one is used.
+    Raises RuntimeError when every provider failed.
+    """
+    order = providers or provider_order(primary)
+    if not order:
+        raise RuntimeError("No LLM provider configured (set GOOGLE_API_KEY, CLAUDE_API_KEY or GROK_API_KEY).")
+    if hedge is None:
+        hedge = _settings.get()["hedge"]
+        if hedge is None:
+            hedge = os.getenv("LLM_HEDGE", "0") == "1"
+
+    options = {"json_mode": json_mode, "temperature": temperature, "max_tokens": max_tokens, "system": system}
+    if cache:
+        # A cached answer from any provider in the order is as good as a fresh one
+        for name in order:
+            text = response_cache.get(response_cache.make_key(name, _model_name(name), options, prefix, suffix))
+            if text is not None:
+                return (text, name) if return_provider else text
+
+    errors = []
+    i = 0
+    while i < len(order):
+        name = order[i]
+        if hedge and i + 1 < len(order):
+            i += 2
+            try:
+                text, answered = _hedged_call(name, order[i - 1], task, prefix, suffix, options, cache, errors)
+            except Exception:
+                # Both providers' errors are already in `errors`
+                continue
+        else:
+            i += 1
+            try:
+                text, answered = _call(name, task, prefix, suffix, options, cache), name
+            except Exception as e:
+                print(f"Warning: {name} request failed, trying next provider: {e}")
+                errors.append(f"{name}: {e}")
+                continue
+        return (text, answered) if return_provider else text
+
+    raise RuntimeError(f"All LLM providers failed ({'; '.join(errors)})")
+
+def generate_stream(prefix, suffix="", on_text=None, primary=None, providers=None, task="default",
+                    json_mode=False, temperature=None, max_tokens=None, system=None, cache=True):
+    """
+    Streaming variant of generate(): passes every text chunk to `on_text` as it
+    arrives and returns (text, complete).
+
+    Providers are tried in order until one starts streaming. If a stream breaks
+    after text has arrived, the partial text is returned with complete=False
+    instead of starting over, so the caller can keep what is usable.
+    Only complete responses are cached; a cache hit is delivered as one chunk.
+    """
+    order = providers or provider_order(primary)
+    if not order:
+        raise RuntimeError("No LLM provider configured (set GOOGLE_API_KEY, CLAUDE_API_KEY or GROK_API_KEY).")
+
+    options = {"json_mode": json_mode, "temperature": temperature, "max_tokens": max_tokens, "system": system}
+    if cache:
+        for name in order:
+            text = response_cache.get(response_cache.make_key(name, _model_name(name), options, prefix, suffix))
+            if text is not None:
+                if on_text:
+                    on_text(text)
+                return text, True
+
+    errors = []
+    for name in order:
+        chunks = []
+        started = time.time()
+        try:
+            provider = get_provider(name)
+            if not hasattr(provider, "stream"):
+                text = provider.generate(prefix, suffix, **options)
+                chunks.append(text)
+                if on_text:
+                    on_text(text)
+            else:
+                for chunk in provider.stream(prefix, suffix, **options):
+                    chunks.append(chunk)
+                    if on_text:
+                        on_text(chunk)
+        except Exception as e:
+            if chunks:
+                print(f"Warning: {name} stream interrupted after {sum(len(c) for c in chunks)} characters: {e}")
+                return "".join(chunks), False
+            print(f"Warning: {name} request failed, trying next provider: {e}")
+            errors.append(f"{name}: {e}")
+            continue
+
+        _record_latency(name, task, time.time() - started)
+        text = "".join(chunks)
+        if not text:
+            errors.append(f"{name}: empty response")
+            continue
+        if cache and _cacheable(text, options):
+            response_cache.put(response_cache.make_key(name, _model_name(name), options, prefix, suffix), text, provider=name, model=_model_name(name))
+        return text, True
+
+    raise RuntimeError(f"All LLM providers failed ({'; '.join(errors)})")
@@ -0,0 +1,90 @@
+import pandas as pd
+import numpy as np
+
+# Scale factor that makes the MAD comparable to a standard deviation
+MAD_SCALE = 1.4826
+
+def detect_spikes(daily_vol, window=7, z_threshold=2.5, min_count=5):
+    """
+    Flags spike and turning-point days in a daily volume series.
+
+    daily_vol: DataFrame ['date', 'count'] with one row per day
+               (e.g. report_stats.build_daily_volume or daily_vol in app.py)
+
+    A day is a peak when its robust z-score against the rolling median of the
+    surrounding window is above `z_threshold`, it is a local maximum and has at
+    least `min_count` articles. A turning point is a local maximum or minimum of
+    the smoothed series where the trend changes direction.
+
+    Returns a copy of daily_vol with columns
+    ['baseline', 'zscore', 'local_max', 'is_peak', 'is_turning_point'].
+    """
+    result = daily_vol[['date', 'count']].copy().sort_values('date').reset_index(drop=True)
+    if result.empty:
+        for col in ['baseline', 'zscore']:
+            result[col] = pd.Series(dtype=float)
+        for col in ['local_max', 'is_peak', 'is_turning_point']:
+            result[col] = pd.Series(dtype=bool)
+        return result
+
+    counts = result['count'].astype(float)
+
+    # Robust baseline: rolling median and median absolute deviation
+    baseline = counts.rolling(window, center=True, min_periods=1).median()
+    deviation = (counts - baseline).abs()
+    mad = deviation.rolling(window, center=True, min_periods=1).median() * MAD_SCALE
+    # Avoid division by zero on flat series; fall back to a Poisson-like scale
+    scale = np.maximum(mad.values, np.sqrt(np.maximum(baseline.values, 1.0)))
+    zscore = (counts.values - baseline.values) / scale
+
+    prev_counts = counts.shift(1, fill_value=-np.inf).values
+    next_counts = counts.shift(-1, fill_value=-np.inf).values
+    local_max = (counts.values >= prev_counts) & (counts.values >= next_counts)
+
+    result['baseline'] = baseline.values
+    result['zscore'] = np.round(zscore, 2)
+    result['local_max'] = local_max
+    result['is_peak'] = (zscore > z_threshold) & local_max & (counts.values >= min_count)
+
+    # Turning points: sign change of the slope of the smoothed series,
+    # kept only where the day deviates noticeably from its baseline
+    smooth = counts.rolling(min(window, 3), center=True, min_periods=1).mean()
+    slope = np.sign(smooth.diff().fillna(0).values)
+    # Carry the last non-zero slope forward so plateaus do not hide a reversal
+    slope = pd.Series(slope).replace(0, np.nan).ffill().fillna(0).values
+    reversal = np.zeros(len(slope), dtype=bool)
+    reversal[:-1] = (slope[:-1] != 0) & (slope[1:] != 0) & (slope[:-1] != slope[1:])
+    result['is_turning_point'] = reversal & (np.abs(zscore) >= 1.0)
+
+    return result
+
+def select_peak_days(daily_vol, max_peaks=3, **kwargs):
+    """
+    Returns the peak days to annotate as [{'order', 'date', 'volume'}].
+
+    Uses detect_spikes() first (strongest z-score first). When the series is
+    too short or flat to produce enough spikes, the remaining slots go to the
+    highest-volume local maxima.
+    """
+    flagged = detect_spikes(daily_vol, **kwargs)
+    spikes = flagged[flagged['is_peak']].sort_values(['zscore', 'count'], ascending=False)
+    fallback = flagged[flagged['local_max'] & ~flagged['is_peak'] & (flagged['count'] > 0)]
+    fallback = fallback.sort_values('count', ascending=False, kind='stable')
+
+    top = pd.concat([spikes, fallback]).head(max_peaks)
+    return [
+        {"order": i + 1, "date": row['date'], "volume": int(row['count'])}
+        for i, (_, row) in enumerate(top.iterrows())
+    ]
+
+def find_new_spikes(daily_vol, since_date, **kwargs):
+    """
+    Returns spike days on or after `since_date` ('YYYY-MM-DD').
+    Intended for alerting after a scheduled refresh appends new days.
+    """
+    flagged = detect_spikes(daily_vol, **kwargs)
+    recent = flagged[(flagged['date'] >= since_date) & flagged['is_peak']]
+    return [
+        {"date": row['date'], "volume": int(row['count']), "zscore": float(row['zscore'])}
+        for _, row in recent.iterrows()
+    ]
@@ -0,0 +1,233 @@
+import datetime
+import hashlib
+import threading
+from modules import prompt_encoder
+
+# Gemini explicit context caching needs a minimum prefix size (Flash models)
+GEMINI_MIN_CACHE_TOKENS = 1024
+GEMINI_CACHE_TTL = datetime.timedelta(hours=1)
+
+# Cached content handles per (model, prefix hash); False = prefix not cacheable
+_gemini_caches = {}
+
+# Token usage per provider: prompt tokens sent and how many were served from cache
+_usage = {}
+_lock = threading.Lock()
+
+def prefix_key(model_name, prefix):
+    """Stable key for a (model, static prefix) pair."""
+    return hashlib.sha256(f"{model_name}\n{prefix}".encode('utf-8')).hexdigest()
+
+def record_usage(provider, prompt_tokens, cached_tokens=0, cache_write_tokens=0):
+    """Adds one request's prompt token usage to the per-provider counters."""
+    with _lock:
+        entry = _usage.setdefault(provider, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0})
+        entry["requests"] += 1
+        entry["prompt_tokens"] += int(prompt_tokens or 0)
+        entry["cached_tokens"] += int(cached_tokens or 0)
+        entry["cache_write_tokens"] += int(cache_write_tokens or 0)
+
+def get_cache_stats():
+    """
+    Returns {provider: {requests, prompt_tokens, cached_tokens, cache_write_tokens, hit_ratio}}.
+    hit_ratio is the share of prompt tokens that were read from a provider-side cache.
+    """
+    with _lock:
+        stats = {}
+        for provider, entry in _usage.items():
+            stats[provider] = dict(entry)
+            total = entry["prompt_tokens"]
+            stats[provider]["hit_ratio"] = round(entry["cached_tokens"] / total, 3) if total else 0.0
+        return stats
+
+def reset_cache_stats():
+    with _lock:
+        _usage.clear()
+
+def _gemini_cached_model(genai, model_name, prefix, generation_config):
+    """
+    Returns a GenerativeModel bound to a cached copy of `prefix`, creating the
+    cache on first use. Returns None when the prefix is too small or caching fails.
+    """
+    if prompt_encoder.estimate_tokens(prefix) < GEMINI_MIN_CACHE_TOKENS:
+        return None
+
+    key = prefix_key(model_name, prefix)
+    with _lock:
+        entry = _gemini_caches.get(key)
+    if entry is False:
+        return None
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if entry is None or entry[1] <= now:
+        try:
+            from google.generativeai import caching
+            cached = caching.CachedContent.create(
+                model=f"models/{model_name}",
+                display_name=f"prefix-{key[:12]}",
+                contents=[prefix],
+                ttl=GEMINI_CACHE_TTL
+            )
+        except Exception as e:
+            print(f"Warning: Gemini context cache unavailable, sending full prompt: {e}")
+            with _lock:
+                _gemini_caches[key] = False
+            return None
+        # Refresh a little before the server-side expiry
+        entry = (cached, now + GEMINI_CACHE_TTL - datetime.timedelta(minutes=5))
+        with _lock:
+            _gemini_caches[key] = entry
+
+    return genai.GenerativeModel.from_cached_content(cached_content=entry[0], generation_config=generation_config)
+
+def gemini_generate(model_name, prefix, suffix, generation_config=None):
+    """
+    Gemini request with the static `prefix` served from context caching when it
+    is large enough. Otherwise prefix + suffix are sent as one prompt, prefix
+    first, so Gemini's implicit prefix caching can still apply.
+    Returns the response text.
+    """
+    import google.generativeai as genai
+
+    model = _gemini_cached_model(genai, model_name, prefix, generation_config)
+    if model is not None:
+        response = model.generate_content(suffix)
+    else:
+        model = genai.GenerativeModel(model_name)
+        response = model.generate_content(prefix + suffix, generation_config=generation_config)
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        record_usage("gemini", getattr(usage, "prompt_token_count", 0), getattr(usage, "cached_content_token_count", 0))
+    return response.text
+
+def gemini_stream(model_name, prefix, suffix, generation_config=None):
+    """Streaming variant of gemini_generate(); yields text chunks."""
+    import google.generativeai as genai
+
+    model = _gemini_cached_model(genai, model_name, prefix, generation_config)
+    if model is not None:
+        response = model.generate_content(suffix, stream=True)
+    else:
+        model = genai.GenerativeModel(model_name)
+        response = model.generate_content(prefix + suffix, generation_config=generation_config, stream=True)
+
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. only safety/finish metadata)
+            continue
+        if text:
+            yield text
+
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        record_usage("gemini", getattr(usage, "prompt_token_count", 0), getattr(usage, "cached_content_token_count", 0))
+
+def _anthropic_messages(prefix, suffix):
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": suffix}
+        ]
+    }]
+
+def _record_anthropic_usage(usage):
+    if usage is not None:
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        # input_tokens excludes the cached and cache-write parts
+        record_usage("claude", (usage.input_tokens or 0) + cache_read + cache_write, cache_read, cache_write)
+
+def anthropic_generate(client, model_name, prefix, suffix, max_tokens=2048, **kwargs):
+    """
+    Claude request with `prefix` marked as an ephemeral prompt-cache breakpoint.
+    Prefixes below the model's minimum cacheable size are simply not cached.
+    Returns the response text.
+    """
+    response = client.messages.create(
+        model=model_name,
+        max_tokens=max_tokens,
+        messages=_anthropic_messages(prefix, suffix),
+        **kwargs
+    )
+    _record_anthropic_usage(getattr(response, "usage", None))
+    return response.content[0].text
+
+def anthropic_stream(client, model_name, prefix, suffix, max_tokens=2048, **kwargs):
+    """Streaming variant of anthropic_generate(); yields text chunks."""
+    with client.messages.stream(model=model_name, max_tokens=max_tokens, messages=_anthropic_messages(prefix, suffix), **kwargs) as stream:
+        for text in stream.text_stream:
+            yield text
+        _record_anthropic_usage(getattr(stream.get_final_message(), "usage", None))
+
+def openai_generate(client, model_name, prefix, suffix, system=None, provider="grok", **kwargs):
+    """
+    OpenAI-compatible request (Grok). These APIs cache repeated prompt prefixes
+    automatically, so the prefix only has to come first and stay byte-identical.
+    Returns the response text.
+    """
+    response = client.chat.completions.create(model=model_name, messages=_openai_messages(prefix, suffix, system), **kwargs)
+    _record_openai_usage(provider, getattr(response, "usage", None))
+    return response.choices[0].message.content
+
+def openai_stream(client, model_name, prefix, suffix, system=None, provider="grok", **kwargs):
+    """Streaming variant of openai_generate(); yields text chunks."""
+    response = client.chat.completions.create(model=model_name, messages=_openai_messages(prefix, suffix, system),
+                                              stream=True, stream_options={"include_usage": True}, **kwargs)
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        if getattr(chunk, "usage", None) is not None:
+            _record_openai_usage(provider, chunk.usage)
+
+def _openai_messages(prefix, suffix, system):
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prefix + suffix})
+    return messages
+
+def _record_openai_usage(provider, usage):
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_usage(provider, usage.prompt_tokens, getattr(details, "cached_tokens", 0) if details else 0)
+
+class FakeProvider:
+    """
+    Offline stand-in for a provider with prefix caching, for tests.
+    `responder(prefix, suffix) -> text` produces the answers; a prefix counts as
+    cached from its second use on, like the real providers.
+    stream() yields the answer in `chunk_size` pieces; with `fail_after` set,
+    the stream raises after that many characters (a cut-off connection).
+    """
+
+    def __init__(self, responder, name="fake", min_cache_tokens=0, chunk_size=64, fail_after=None):
+        self.responder = responder
+        self.name = name
+        self.min_cache_tokens = min_cache_tokens
+        self.chunk_size = chunk_size
+        self.fail_after = fail_after
+        self.calls = []
+        self._cached_prefixes = set()
+
+    def generate(self, prefix, suffix, **options):
+        prefix_tokens = prompt_encoder.estimate_tokens(prefix)
+        key = prefix_key(self.name, prefix)
+        cached = prefix_tokens if key in self._cached_prefixes else 0
+        if prefix_tokens >= self.min_cache_tokens:
+            self._cached_prefixes.add(key)
+
+        record_usage(self.name, prefix_tokens + prompt_encoder.estimate_tokens(suffix), cached)
+        self.calls.append((prefix, suffix))
+        return self.responder(prefix, suffix)
+
+    def stream(self, prefix, suffix, **options):
+        text = self.generate(prefix, suffix, **options)
+        limit = len(text) if self.fail_after is None else min(self.fail_after, len(text))
+        for start in range(0, limit, self.chunk_size):
+            yield text[start:min(start + self.chunk_size, limit)]
+        if limit < len(text):
+            raise ConnectionError(f"{self.name} stream cut off after {limit} characters")
@@ -0,0 +1,117 @@
+import re
+import math
+from modules import sampler
+
+# Rough token heuristics for Gemini/Claude/Grok tokenizers.
+# Hangul and other CJK characters cost about one token each,
+# while ASCII text averages about four characters per token.
+ASCII_CHARS_PER_TOKEN = 4
+CJK_TOKENS_PER_CHAR = 1.0
+
+# Default input budget reserved for the article table in a report prompt
+DEFAULT_TOKEN_BUDGET = 200000
+
+SENTIMENT_CODES = {"Positive": "+", "Negative": "-", "Neutral": "0"}
+
+_CJK_PATTERN = re.compile(r"[\u1100-\u11ff\u3130-\u318f\uac00-\ud7a3\u4e00-\u9fff\u3040-\u30ff]")
+
+def estimate_tokens(text):
+    """
+    Estimates the token count of a prompt without calling the provider.
+    Errs on the high side so the budget is a safe upper bound.
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return int(math.ceil(cjk_count * CJK_TOKENS_PER_CHAR + other_count / ASCII_CHARS_PER_TOKEN))
+
+def _group_by_date(articles):
+    """Groups articles by date, keeping the original order inside each day."""
+    groups = {}
+    for art in articles:
+        date = str(art.get('date') or 'Unknown')
+        groups.setdefault(date, []).append(art)
+    return dict(sorted(groups.items()))
+
+def encode_articles_compact(articles, daily_counts=None):
+    """
+    Encodes articles as a compact date-grouped table for the LLM prompt.
+
+    - Links are dropped (they add tokens but nothing to the analysis)
+    - Press names are dictionary-encoded (P1, P2, ...)
+    - Sentiment is a single character (+, -, 0)
+
+    daily_counts: optional {date: count} with the real per-day totals,
+    used when `articles` is only a sample of the full set.
+    """
+    groups = _group_by_date(articles)
+
+    press_ids = {}
+    for art in articles:
+        press = art.get('press') or 'Unknown'
+        if press not in press_ids:
+            press_ids[press] = f"P{len(press_ids) + 1}"
+
+    lines = []
+    lines.append("PRESS: " + " | ".join(f"{pid}={name}" for name, pid in press_ids.items()))
+    lines.append("SENTIMENT: + = Positive, - = Negative, 0 = Neutral, ? = Unknown")
+    lines.append("ROW FORMAT: press_id|sentiment|title")
+
+    for date, day_articles in groups.items():
+        total = daily_counts.get(date, len(day_articles)) if daily_counts else len(day_articles)
+        if total != len(day_articles):
+            lines.append(f"## {date} (total={total}, shown={len(day_articles)})")
+        else:
+            lines.append(f"## {date} (total={total})")
+        for art in day_articles:
+            pid = press_ids[art.get('press') or 'Unknown']
+            code = SENTIMENT_CODES.get(art.get('sentiment'), "?")
+            title = str(art.get('title', '')).replace("\n", " ").replace("|", "/")
+            lines.append(f"{pid}|{code}|{title}")
+
+    return "\n".join(lines)
+
+def fit_articles_to_budget(articles, token_budget=DEFAULT_TOKEN_BUDGET, daily_totals=None):
+    """
+    Returns (encoded_text, used_articles, estimated_tokens) that fits `token_budget`.
+
+    Instead of cutting the text at a character offset, it takes a stratified
+    sample (date / sentiment / press, see sampler.stratified_sample) so every
+    date in the period stays represented, and passes the exact per-day totals
+    to the encoder.
+
+    daily_totals: optional {date: count} when `articles` is already a sample.
+    """
+    daily_counts = daily_totals or {date: len(items) for date, items in _group_by_date(articles).items()}
+
+    text = encode_articles_compact(articles, daily_counts)
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return text, list(articles), tokens
+
+    # Binary search on the sample size (encoding is linear, so this stays cheap).
+    # Samples start at one article per day, so no date is ever dropped.
+    days = len(_group_by_date(articles))
+    low, high = days, len(articles)
+    best = None
+    while low <= high:
+        mid = (low + high) // 2
+        sample = sampler.stratified_sample(articles, mid)
+        candidate = encode_articles_compact(sample, daily_counts)
+        candidate_tokens = estimate_tokens(candidate)
+        if candidate_tokens <= token_budget:
+            best = (candidate, sample, candidate_tokens)
+            low = mid + 1
+        else:
+            high = mid - 1
+
+    if best is None:
+        # Even one article per day does not fit; send one per day anyway so
+        # every date stays represented (the budget is exceeded)
+        sample = sampler.stratified_sample(articles, days)
+        candidate = encode_articles_compact(sample, daily_counts)
+        best = (candidate, sample, estimate_tokens(candidate))
+
+    print(f"[INFO] Prompt budget {token_budget} tokens: using {len(best[1])}/{len(articles)} articles (~{best[2]} tokens)")
+    return best
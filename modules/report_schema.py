@@ -0,0 +1,30 @@
+import json
+
+# Version of the stored keyword record (kept as "schema_version" in its metadata):
+#   1  the report is the JSON string the model returned (escaped again inside
+#      the stored document, parsed a second time on every load)
+#   2  the report is stored as a nested object
+# Records without the field are version 1; they are upgraded in memory when
+# read and rewritten on their next save (or by `python -m modules.storage upgrade`).
+SCHEMA_VERSION = 2
+
+def decode_report(report):
+    """The report as an object: JSON strings are parsed, objects are returned as they are."""
+    if isinstance(report, str):
+        try:
+            return json.loads(report)
+        except ValueError:
+            # Keep the whole unparsable text as an error report instead of losing it
+            # (saves and upgrades write this object back)
+            return {"error": "Stored report is not valid JSON", "raw_response": report}
+    return report
+
+def upgrade(data):
+    """A copy of keyword data in the current schema (report as an object, schema_version set)."""
+    if data is None:
+        return None
+    upgraded = dict(data)
+    if "report" in upgraded:
+        upgraded["report"] = decode_report(upgraded["report"])
+    upgraded["schema_version"] = SCHEMA_VERSION
+    return upgraded
@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+from modules import peak_detector
+
+SENTIMENT_LABELS = ["Positive", "Negative", "Neutral"]
+
+def articles_frame(articles):
+    """
+    Builds a DataFrame from the article list with normalized 'YYYY-MM-DD' dates.
+    Rows with unparseable dates are dropped.
+    """
+    df = pd.DataFrame(list(articles))
+    if df.empty:
+        return pd.DataFrame(columns=["date", "press", "sentiment", "title"])
+    for col in ["date", "press", "sentiment", "title"]:
+        if col not in df.columns:
+            df[col] = None
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    df = df.dropna(subset=["date"])
+    df["press"] = df["press"].fillna("Unknown")
+    df["sentiment"] = df["sentiment"].where(df["sentiment"].isin(SENTIMENT_LABELS), "Unknown")
+    return df
+
+def build_daily_volume(df):
+    """
+    Returns a continuous daily volume series as a DataFrame ['date', 'count'].
+    Dates without articles inside the period are filled with 0.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["date", "count"])
+    counts = df.groupby("date").size()
+    counts.index = pd.to_datetime(counts.index)
+    full_range = pd.date_range(start=counts.index.min(), end=counts.index.max())
+    counts = counts.reindex(full_range, fill_value=0)
+    return pd.DataFrame({"date": full_range.strftime("%Y-%m-%d"), "count": counts.values.astype(int)})
+
+def format_sentiment_stat(pos_pct, neu_pct, neg_pct):
+    """Formats percentages the way the report shows them: '긍정 00%, 중립 00%, 부정 00%'."""
+    return f"긍정 {pos_pct}%, 중립 {neu_pct}%, 부정 {neg_pct}%"
+
+def compute_report_stats(articles, top_n_peaks=3, top_n_press=10):
+    """
+    Computes every quantitative field of the report from the article list.
+
+    Returns:
+        {
+            "total_articles": int,
+            "sentiment_totals": {"Positive": n, "Negative": n, "Neutral": n},
+            "daily": [{"date", "volume", "sentiment_counts", "sentiment_stat"}],
+            "peaks": [{"order", "date", "volume"}],
+            "press_distribution": [{"press", "count", "percent"}]
+        }
+    """
+    df = articles_frame(articles)
+    total = int(len(df))
+
+    # Date x sentiment counts in one pass
+    table = pd.crosstab(df["date"], df["sentiment"]) if total else pd.DataFrame()
+    table = table.reindex(columns=SENTIMENT_LABELS + ["Unknown"], fill_value=0)
+    volume = table.sum(axis=1)
+
+    safe_volume = volume.replace(0, np.nan)
+    pct = table[SENTIMENT_LABELS].div(safe_volume, axis=0).mul(100).round().fillna(0).astype(int)
+
+    daily = []
+    for date in table.index:
+        row = table.loc[date]
+        daily.append({
+            "date": date,
+            "volume": int(volume[date]),
+            "sentiment_counts": {label: int(row[label]) for label in SENTIMENT_LABELS},
+            "sentiment_stat": format_sentiment_stat(pct.at[date, "Positive"], pct.at[date, "Neutral"], pct.at[date, "Negative"])
+        })
+
+    # Peak days from the spike detector over the continuous daily series
+    peaks = peak_detector.select_peak_days(build_daily_volume(df), max_peaks=top_n_peaks)
+
+    press_counts = df["press"].value_counts().head(top_n_press)
+    press_distribution = [
+        {"press": press, "count": int(cnt), "percent": round(cnt / total * 100, 1) if total else 0.0}
+        for press, cnt in press_counts.items()
+    ]
+
+    sentiment_totals = {label: int(table[label].sum()) for label in SENTIMENT_LABELS}
+
+    return {
+        "total_articles": total,
+        "sentiment_totals": sentiment_totals,
+        "daily": daily,
+        "peaks": peaks,
+        "press_distribution": press_distribution
+    }
+
+def apply_report_stats(report, stats):
+    """
+    Writes the locally computed numbers into an LLM report (in place) and returns it.
+
+    - executive_summary.total_articles
+    - daily_trends[].volume / sentiment_stat (one entry per date, hallucinated dates dropped)
+    - peak_analysis[].order / date / volume (the model's 'reason' is kept by date)
+    - press_distribution (new section)
+    """
+    exec_sum = report.setdefault("executive_summary", {})
+    exec_sum["total_articles"] = stats["total_articles"]
+
+    model_days = {}
+    for day in report.get("daily_trends", []) or []:
+        if isinstance(day, dict) and day.get("date"):
+            model_days.setdefault(day["date"], day)
+
+    daily_trends = []
+    for day_stat in stats["daily"]:
+        day = model_days.get(day_stat["date"], {"date": day_stat["date"]})
+        day["volume"] = day_stat["volume"]
+        day["sentiment_stat"] = day_stat["sentiment_stat"]
+        daily_trends.append(day)
+    report["daily_trends"] = daily_trends
+
+    reasons = {}
+    for peak in report.get("peak_analysis", []) or []:
+        if isinstance(peak, dict) and peak.get("date"):
+            reasons.setdefault(peak["date"], peak.get("reason", ""))
+    report["peak_analysis"] = [
+        {"order": p["order"], "date": p["date"], "volume": p["volume"], "reason": reasons.get(p["date"], "")}
+        for p in stats["peaks"]
+    ]
+
+    report["press_distribution"] = stats["press_distribution"]
+    return report
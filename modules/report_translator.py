@@ -0,0 +1,132 @@
+import json
+import hashlib
+import threading
+from datetime import datetime
+from modules import llm_provider, report_schema, storage, translation_memory
+
+# Languages the dashboard can switch to, and the code used in storage file names
+LANG_CODES = {"English": "en"}
+DEFAULT_LANGS = ("English",)
+
+_jobs = {}
+_lock = threading.Lock()
+
+def parse_report(data):
+    """The report of a stored keyword as a dict (see report_schema.decode_report)."""
+    report = report_schema.decode_report(data.get('report') if data else None)
+    return report if isinstance(report, dict) else {}
+
+def source_hash(report):
+    """Fingerprint of the source report; a stored translation is only valid for the same hash."""
+    payload = json.dumps(report, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _translate_part(value, translations):
+    """A day or section with every string translated, or None if some segment is still missing."""
+    if any(segment not in translations for segment in translation_memory.extract_segments(value)):
+        return None
+    return translation_memory.apply_translations(value, translations)
+
+def translate_report_bundle(report, target_lang='English', max_workers=translation_memory.MAX_WORKERS):
+    """
+    Translates every daily_trends entry and every global section of a report.
+    All string segments of the report go through the translation memory at once
+    (unseen ones in parallel batches), so a string repeated across days is translated once.
+    Returns the translation bundle:
+    {"lang", "source_hash", "translated_at", "days": {date: entry}, "sections": {key: value}, "missing": [...]}
+    Days or sections with untranslated segments are listed in "missing" (the dashboard translates those on demand).
+    """
+    translations = translation_memory.translate_segments(translation_memory.extract_segments(report), target_lang, max_workers)
+
+    bundle = {
+        "lang": target_lang,
+        "source_hash": source_hash(report),
+        "translated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "days": {},
+        "sections": {},
+        "missing": []
+    }
+    for day in report.get('daily_trends', []):
+        if not isinstance(day, dict) or not day.get('date'):
+            continue
+        result = _translate_part(day, translations)
+        if result is None:
+            bundle["missing"].append(day['date'])
+        else:
+            bundle["days"][day['date']] = result
+    for key, value in report.items():
+        if key == 'daily_trends':
+            continue
+        result = _translate_part(value, translations)
+        if result is None:
+            bundle["missing"].append(key)
+        else:
+            bundle["sections"][key] = result
+    return bundle
+
+def pretranslate(keyword, data, langs=DEFAULT_LANGS):
+    """Translates a saved report into each language and stores the bundles next to it. Returns the bundles."""
+    report = parse_report(data)
+    if not report or 'error' in report:
+        print(f"[INFO] No report to translate for '{keyword}'")
+        return {}
+
+    bundles = {}
+    for lang in langs:
+        bundle = translate_report_bundle(report, lang)
+        storage.save_translation(keyword, LANG_CODES.get(lang, lang.lower()), bundle)
+        print(f"[INFO] Translated '{keyword}' to {lang}: {len(bundle['days'])} days, "
+              f"{len(bundle['sections'])} sections, {len(bundle['missing'])} missing")
+        bundles[lang] = bundle
+    return bundles
+
+def start_background(keyword, data, langs=DEFAULT_LANGS):
+    """
+    Runs pretranslate in a background thread so saving a report doesn't wait for it.
+    A keyword already being translated is not started twice. Returns the thread (or None).
+    """
+    with _lock:
+        running = _jobs.get(keyword)
+        if running is not None and running.is_alive():
+            return None
+        # The session's provider choice (llm_provider.configure) applies to the job too
+        thread = threading.Thread(target=llm_provider.in_session(_run_job), args=(keyword, data, langs), daemon=True)
+        _jobs[keyword] = thread
+    thread.start()
+    return thread
+
+def _run_job(keyword, data, langs):
+    try:
+        pretranslate(keyword, data, langs)
+    except Exception as e:
+        print(f"[ERROR] Background translation failed for '{keyword}': {e}")
+
+def is_running(keyword):
+    with _lock:
+        thread = _jobs.get(keyword)
+    return thread is not None and thread.is_alive()
+
+def load_translation(keyword, report, lang='English'):
+    """The stored bundle for a report, or None if there is none or it belongs to an older version of the report."""
+    bundle = storage.load_translation(keyword, LANG_CODES.get(lang, lang.lower()))
+    if not bundle or bundle.get("source_hash") != source_hash(report):
+        return None
+    return bundle
+
+def translated_report(report, bundle):
+    """
+    The report with every stored translation applied.
+    Untranslated days and sections stay in the source language.
+    """
+    result = dict(report)
+    result.update(bundle.get("sections", {}))
+    days = bundle.get("days", {})
+    result['daily_trends'] = [days.get(day.get('date'), day) if isinstance(day, dict) else day
+                              for day in report.get('daily_trends', [])]
+    return result
+
+if __name__ == "__main__":
+    # Background job: python -m modules.report_translator [keyword ...] (default: every stored keyword)
+    import sys
+    for kw in sys.argv[1:] or storage.get_keyword_list():
+        pretranslate(kw, storage.load_report(kw))
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Defaults, overridable in .env
+DEFAULT_CACHE_DIR = os.path.join(".cache", "llm")
+DEFAULT_MAX_MB = 200
+DEFAULT_TTL_SECONDS = 0  # 0 = entries never expire
+# After eviction the cache is trimmed to this share of the limit
+EVICT_TARGET = 0.9
+
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+_state = {"bypass": False, "size": None}
+_lock = threading.Lock()
+
+def cache_dir():
+    return os.getenv("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+def _max_bytes():
+    return int(float(os.getenv("LLM_CACHE_MAX_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+
+def _ttl():
+    return int(os.getenv("LLM_CACHE_TTL") or DEFAULT_TTL_SECONDS)
+
+def set_bypass(bypass):
+    """Forces fresh calls (reads are skipped, fresh responses are still stored)."""
+    _state["bypass"] = bool(bypass)
+
+def is_bypassed():
+    return _state["bypass"] or os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+
+def make_key(provider, model, config, prefix, suffix):
+    """Content address of a request: sha256 over provider, model, generation config and full prompt."""
+    payload = json.dumps([provider, model, config or {}, prefix, suffix], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _path(key):
+    # Two-level fan-out keeps directories small
+    return os.path.join(cache_dir(), key[:2], f"{key}.json")
+
+def get(key):
+    """Returns the cached response text or None. A hit refreshes the entry's LRU position."""
+    if is_bypassed():
+        return None
+    path = _path(key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    ttl = _ttl()
+    if ttl and time.time() - entry.get("created", 0) > ttl:
+        _remove(path)
+        with _lock:
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+        return None
+
+    try:
+        # mtime doubles as the last-access time for LRU eviction
+        os.utime(path, None)
+    except OSError:
+        pass
+    with _lock:
+        _stats["hits"] += 1
+    return entry.get("text")
+
+def put(key, text, provider=None, model=None):
+    """Stores a response (atomic replace) and evicts least recently used entries over the size limit."""
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.time(), "provider": provider, "model": model, "text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+    except OSError as e:
+        print(f"Warning: Could not write LLM cache entry: {e}")
+        return False
+
+    with _lock:
+        _stats["writes"] += 1
+        if _state["size"] is not None:
+            _state["size"] += size
+        over_limit = _state["size"] is None or _state["size"] > _max_bytes()
+    if over_limit:
+        evict()
+    return True
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+def _entries():
+    """[(mtime, size, path)] for every cache file."""
+    entries = []
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return entries
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for item in os.scandir(shard.path):
+            if item.name.endswith(".json"):
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+    return entries
+
+def evict(max_bytes=None):
+    """Removes least recently used entries until the cache is below EVICT_TARGET of the limit."""
+    max_bytes = max_bytes or _max_bytes()
+    entries = _entries()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            if total <= max_bytes * EVICT_TARGET:
+                break
+            if _remove(path):
+                total -= size
+                removed += 1
+    with _lock:
+        _state["size"] = total
+        _stats["evictions"] += removed
+    return removed
+
+def clear():
+    """Deletes every cache entry. Returns the number of removed entries."""
+    removed = sum(1 for _, _, path in _entries() if _remove(path))
+    with _lock:
+        _state["size"] = 0
+    return removed
+
+def get_cache_stats():
+    """Hit/miss counters of this process plus the on-disk entry count and size."""
+    entries = _entries()
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["entries"] = len(entries)
+    stats["size_mb"] = round(sum(size for _, size, _ in entries) / (1024 * 1024), 2)
+    stats["bypass"] = is_bypassed()
+    return stats
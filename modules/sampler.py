@@ -0,0 +1,122 @@
+SENTIMENT_LABELS = ["Positive", "Negative", "Neutral"]
+
+def _largest_remainder(sizes, total, minimum=0):
+    """
+    Splits `total` slots over groups proportionally to `sizes` (largest remainder method).
+    Each non-empty group gets at least `minimum` slots while the total allows it,
+    and no group gets more slots than it has items.
+    """
+    keys = [k for k, size in sizes.items() if size > 0]
+    quotas = {k: 0 for k in sizes}
+    if not keys or total <= 0:
+        return quotas
+
+    if minimum and total >= minimum * len(keys):
+        for k in keys:
+            quotas[k] = min(minimum, sizes[k])
+    remaining = total - sum(quotas.values())
+
+    capacity = {k: sizes[k] - quotas[k] for k in keys}
+    while remaining > 0 and any(capacity[k] > 0 for k in keys):
+        open_keys = [k for k in keys if capacity[k] > 0]
+        pool = sum(capacity[k] for k in open_keys)
+        shares = {k: remaining * capacity[k] / pool for k in open_keys}
+        assigned = 0
+        for k in open_keys:
+            extra = min(int(shares[k]), capacity[k])
+            quotas[k] += extra
+            capacity[k] -= extra
+            assigned += extra
+        remaining -= assigned
+        # Hand out the leftover slots by largest fractional remainder
+        for k in sorted(open_keys, key=lambda k: shares[k] - int(shares[k]), reverse=True):
+            if remaining <= 0:
+                break
+            if capacity[k] > 0:
+                quotas[k] += 1
+                capacity[k] -= 1
+                remaining -= 1
+    return quotas
+
+def _round_robin_by_press(items, quota):
+    """Picks `quota` items cycling over press outlets (largest outlets first)."""
+    by_press = {}
+    for idx, art in items:
+        by_press.setdefault(art.get('press') or 'Unknown', []).append((idx, art))
+    queues = sorted(by_press.values(), key=len, reverse=True)
+
+    picked = []
+    position = 0
+    while len(picked) < quota:
+        progressed = False
+        for queue in queues:
+            if position < len(queue):
+                picked.append(queue[position])
+                progressed = True
+                if len(picked) >= quota:
+                    break
+        if not progressed:
+            break
+        position += 1
+    return picked
+
+def daily_counts(articles):
+    """
+    Returns exact per-day counts for the full article list:
+    {date: {"total": n, "Positive": p, "Negative": g, "Neutral": u}}
+    """
+    counts = {}
+    for art in articles:
+        date = str(art.get('date') or 'Unknown')
+        day = counts.setdefault(date, {"total": 0, "Positive": 0, "Negative": 0, "Neutral": 0})
+        day["total"] += 1
+        sentiment = art.get('sentiment')
+        if sentiment in SENTIMENT_LABELS:
+            day[sentiment] += 1
+    return dict(sorted(counts.items()))
+
+def format_daily_counts(counts):
+    """Formats daily_counts() output as prompt metadata, one line per day."""
+    lines = []
+    for date, day in counts.items():
+        lines.append(f"{date}: total={day['total']} (Positive {day['Positive']}, Negative {day['Negative']}, Neutral {day['Neutral']})")
+    return "\n".join(lines)
+
+def stratified_sample(articles, max_articles):
+    """
+    Chooses a representative subset of at most `max_articles` articles.
+
+    Strata, in order:
+    1. Date - proportional to each day's volume, at least one article per day
+    2. Sentiment - proportional inside the day
+    3. Press - round-robin across outlets inside each sentiment group
+
+    The result keeps the original article order. Use daily_counts() on the
+    full list to give the model the exact volumes the sample stands for.
+    """
+    if max_articles is None or len(articles) <= max_articles:
+        return list(articles)
+
+    by_date = {}
+    for idx, art in enumerate(articles):
+        by_date.setdefault(str(art.get('date') or 'Unknown'), []).append((idx, art))
+
+    date_quotas = _largest_remainder({d: len(items) for d, items in by_date.items()}, max_articles, minimum=1)
+
+    picked = []
+    for date, items in by_date.items():
+        quota = date_quotas[date]
+        if quota <= 0:
+            continue
+
+        by_sentiment = {}
+        for idx, art in items:
+            label = art.get('sentiment') if art.get('sentiment') in SENTIMENT_LABELS else 'Unknown'
+            by_sentiment.setdefault(label, []).append((idx, art))
+
+        sentiment_quotas = _largest_remainder({k: len(v) for k, v in by_sentiment.items()}, quota, minimum=1)
+        for label, group in by_sentiment.items():
+            picked.extend(_round_robin_by_press(group, sentiment_quotas[label]))
+
+    picked.sort(key=lambda pair: pair[0])
+    return [art for _, art in picked]
@@ -0,0 +1,205 @@
+import math
+import time
+from modules import prompt_encoder, json_repair
+
+VALID_LABELS = ("Positive", "Negative", "Neutral")
+
+LABEL_ALIASES = {
+    "positive": "Positive", "negative": "Negative", "neutral": "Neutral",
+    "긍정": "Positive", "부정": "Negative", "중립": "Neutral",
+    "pos": "Positive", "neg": "Negative", "neu": "Neutral"
+}
+
+RESPONSE_FORMAT = """Output format: a JSON object mapping each title number to its label, for every title.
+Example: {"1": "Positive", "2": "Negative", "3": "Neutral"}
+Labels must be exactly "Positive", "Negative" or "Neutral". Output only the JSON, no other text."""
+
+# Label used when a single title still fails after all retries
+FALLBACK_LABEL = "Neutral"
+
+# Adaptive batch sizing
+DEFAULT_INPUT_TOKEN_BUDGET = 6000
+DEFAULT_OUTPUT_TOKEN_BUDGET = 2048
+OUTPUT_TOKENS_PER_TITLE = 8     # e.g. '"12": "Positive", '
+TOKENS_PER_TITLE_OVERHEAD = 3   # numbering and newline
+GROWTH_FACTOR = 1.25
+SHRINK_FACTOR = 0.5
+MIN_BATCH_SIZE = 5
+
+# Last batch size that worked well, per provider that answered (kept for the process lifetime)
+_learned_batch_sizes = {}
+
+def normalize_label(value):
+    """Maps a model label (English/Korean, any case) to Positive/Negative/Neutral, or None."""
+    if not isinstance(value, str):
+        return None
+    return LABEL_ALIASES.get(value.strip().lower()) or LABEL_ALIASES.get(value.strip())
+
+def build_batch_prompt(instructions, titles):
+    """
+    Returns (prefix, suffix): the static instruction block + response format,
+    identical for every batch so providers can cache it, and the numbered
+    titles (1-based).
+    """
+    numbered = "\n".join(f"{i}. {title}" for i, title in enumerate(titles, 1))
+    return f"{instructions}\n\n{RESPONSE_FORMAT}\n\n", f"Titles:\n{numbered}\n"
+
+def parse_indexed_response(text, count):
+    """
+    Parses an indexed response into {position: label} for positions 1..count.
+    Accepts {"1": "Positive"}, [{"id": 1, "label": "Positive"}] and, only when
+    the length matches exactly, a plain ["Positive", ...] array.
+    Raises ValueError when nothing usable can be parsed.
+    """
+    data = json_repair.loads(text)
+    parsed = {}
+
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list) and data and all(isinstance(x, dict) for x in data):
+        items = [(x.get("id", x.get("index")), x.get("label", x.get("sentiment"))) for x in data]
+    elif isinstance(data, list) and len(data) == count:
+        # Unindexed array is only trusted when it is perfectly aligned
+        items = [(i, label) for i, label in enumerate(data, 1)]
+    else:
+        raise ValueError(f"Unusable sentiment response ({type(data).__name__}, {len(data) if hasattr(data, '__len__') else '-'} items)")
+
+    for key, value in items:
+        try:
+            position = int(str(key).strip().rstrip("."))
+        except (TypeError, ValueError):
+            continue
+        label = normalize_label(value)
+        if 1 <= position <= count and label:
+            parsed[position] = label
+    return parsed
+
+def _next_batch(titles, start, size, input_budget, output_budget, base_tokens):
+    """
+    Returns the end index of the next batch: at most `size` titles, and no more
+    than fit the input/output token budgets (always at least one title).
+    """
+    max_by_output = max(1, output_budget // OUTPUT_TOKENS_PER_TITLE)
+    limit = min(size, max_by_output)
+    tokens = base_tokens
+    end = start
+    while end < len(titles) and end - start < limit:
+        cost = prompt_encoder.estimate_tokens(titles[end]) + TOKENS_PER_TITLE_OVERHEAD
+        if end > start and tokens + cost > input_budget:
+            break
+        tokens += cost
+        end += 1
+    return end
+
+def classify_titles(titles, request_fn, instructions, batch_size=25, max_batch_size=None, max_retries=2, delay=1,
+                    provider=None, input_token_budget=DEFAULT_INPUT_TOKEN_BUDGET, output_token_budget=DEFAULT_OUTPUT_TOKEN_BUDGET):
+    """
+    Labels every title with Positive/Negative/Neutral using
+    `request_fn(prefix, suffix) -> text` (see build_batch_prompt), or
+    `-> (text, provider)` naming the provider that actually answered.
+
+    - Every title in a request is numbered and the response must be indexed
+    - Titles missing from a response are re-requested on their own
+    - A response with nothing usable in it is split in half, recursively,
+      down to single titles (retried up to `max_retries` times)
+    - A request that fails outright (provider, auth, quota or network error,
+      after request_fn's own failover) stops the run: smaller batches would
+      fail the same way. The error is raised as RuntimeError.
+
+    Batch size is adaptive: it starts at `batch_size` (or the size last learned
+    for `provider`, the provider expected to answer), grows while batches come
+    back perfectly aligned, halves after mismatches, and is always capped so
+    that a request fits `input_token_budget` and `output_token_budget`.
+    Sizes are learned per provider that answered: when failover hands a batch
+    to another provider, that provider's learned size is used from then on.
+
+    Returns (labels, stats) where stats has requests, retries, bisects,
+    failed_requests, unresolved (titles that fell back to FALLBACK_LABEL),
+    batch_sizes and titles_per_second.
+    """
+    labels = [None] * len(titles)
+    stats = {"titles": len(titles), "requests": 0, "retries": 0, "bisects": 0, "failed_requests": 0, "unresolved": 0,
+             "batch_sizes": [], "titles_per_second": 0.0}
+    max_batch_size = max_batch_size or batch_size * 4
+    size = _learned_batch_sizes.get(provider, batch_size) if provider else batch_size
+    answered = {"provider": provider}
+    prefix, _ = build_batch_prompt(instructions, [])
+    base_tokens = prompt_encoder.estimate_tokens(prefix)
+
+    def run(indices, attempt=0):
+        stats["requests"] += 1
+        try:
+            text = request_fn(*build_batch_prompt(instructions, [titles[i] for i in indices]))
+            if isinstance(text, tuple):
+                text, answered["provider"] = text
+        except Exception as e:
+            stats["failed_requests"] += 1
+            raise RuntimeError(f"Sentiment request for {len(indices)} titles failed: {e}") from e
+        try:
+            parsed = parse_indexed_response(text, len(indices))
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Sentiment response for {len(indices)} titles is unusable: {e}")
+            stats["failed_requests"] += 1
+            parsed = {}
+
+        for position, label in parsed.items():
+            labels[indices[position - 1]] = label
+        missing = [indices[k] for k in range(len(indices)) if (k + 1) not in parsed]
+        if not missing:
+            return
+
+        if len(missing) < len(indices):
+            # Partial answer: re-request only the misaligned/missing titles
+            print(f"Warning: {len(missing)}/{len(indices)} sentiment labels missing, re-requesting them.")
+            stats["retries"] += 1
+            run(missing)
+        elif len(indices) > 1:
+            # Nothing usable: bisect the batch
+            stats["bisects"] += 1
+            half = len(indices) // 2
+            run(indices[:half])
+            run(indices[half:])
+        elif attempt < max_retries:
+            stats["retries"] += 1
+            run(indices, attempt + 1)
+        else:
+            stats["unresolved"] += 1
+            labels[indices[0]] = FALLBACK_LABEL
+
+    run_started = time.time()
+    start = 0
+    while start < len(titles):
+        end = _next_batch(titles, start, size, input_token_budget, output_token_budget, base_tokens)
+        requests_before = stats["requests"]
+        batch_started = time.time()
+
+        run(list(range(start, end)))
+
+        elapsed = max(time.time() - batch_started, 1e-6)
+        if answered["provider"] != provider:
+            # Another provider answered: continue from what was learned for it
+            provider = answered["provider"]
+            size = _learned_batch_sizes.get(provider, size)
+        clean = stats["requests"] - requests_before == 1
+        if clean:
+            size = min(max_batch_size, max(size + 1, int(math.ceil(size * GROWTH_FACTOR))))
+        else:
+            size = max(MIN_BATCH_SIZE, int(size * SHRINK_FACTOR))
+        stats["batch_sizes"].append(end - start)
+        print(f"[INFO] Sentiment batch {len(stats['batch_sizes'])}: {end - start} titles in {elapsed:.1f}s "
+              f"({(end - start) / elapsed:.1f} titles/s, {'aligned' if clean else 'needed retries'}), next size {size}")
+
+        start = end
+        # Small delay to avoid rate limiting
+        if delay and start < len(titles):
+            time.sleep(delay)
+
+    if provider:
+        _learned_batch_sizes[provider] = size
+
+    total_elapsed = max(time.time() - run_started, 1e-6)
+    stats["titles_per_second"] = round(len(titles) / total_elapsed, 2)
+    print(f"[INFO] Sentiment: {stats['titles']} titles, {stats['requests']} requests, "
+          f"{stats['retries']} retries, {stats['bisects']} bisects, {stats['unresolved']} unresolved, "
+          f"{stats['titles_per_second']} titles/s")
+    return labels, stats
@@ -0,0 +1,385 @@
+import os
+import json
+import sqlite3
+import threading
+import pandas as pd
+from contextlib import closing
+from modules import github_storage, report_schema
+
+# Single database file next to the JSON reports (overridable in .env)
+DEFAULT_DB_PATH = os.path.join("data", "news_analysis.db")
+
+# Article fields with their own column; anything else is kept in `extra`
+ARTICLE_COLUMNS = ["title", "link", "press", "date", "sentiment"]
+# Top-level report fields with their own column / table
+KEYWORD_FIELDS = ["keyword", "period", "summary_stats", "report", "articles", "updated_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keywords (
+    keyword TEXT PRIMARY KEY,
+    period TEXT,
+    summary_stats TEXT,
+    updated_at TEXT,
+    article_count INTEGER NOT NULL DEFAULT 0,
+    extra TEXT,
+    report_hash TEXT,
+    articles_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS reports (
+    keyword TEXT PRIMARY KEY REFERENCES keywords(keyword) ON DELETE CASCADE,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    keyword TEXT NOT NULL REFERENCES keywords(keyword) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT,
+    link TEXT,
+    press TEXT,
+    date TEXT,
+    sentiment TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_keyword_date ON articles (keyword, date);
+CREATE INDEX IF NOT EXISTS idx_articles_keyword_sentiment ON articles (keyword, sentiment);
+CREATE TABLE IF NOT EXISTS translations (
+    keyword TEXT NOT NULL REFERENCES keywords(keyword) ON DELETE CASCADE,
+    lang TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (keyword, lang)
+);
+"""
+
+_lock = threading.Lock()
+_initialized = set()
+
+def db_path():
+    return os.getenv("SQLITE_DB_PATH") or DEFAULT_DB_PATH
+
+def _connect():
+    path = db_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if path not in _initialized:
+        with _lock:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            _upgrade_schema(conn)
+            _initialized.add(path)
+    return conn
+
+def _upgrade_schema(conn):
+    """Adds columns introduced after a database was created."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(keywords)")}
+    for column in ["report_hash", "articles_hash"]:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE keywords ADD COLUMN {column} TEXT")
+    conn.commit()
+
+def _article_row(keyword, position, article):
+    extra = {k: v for k, v in article.items() if k not in ARTICLE_COLUMNS}
+    return [keyword, position] + [article.get(col) for col in ARTICLE_COLUMNS] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+def _article_dict(row):
+    article = {col: row[col] for col in ARTICLE_COLUMNS if col in row.keys() and row[col] is not None}
+    if "extra" in row.keys() and row["extra"]:
+        article.update(json.loads(row["extra"]))
+    return article
+
+def save_report(keyword, data):
+    """
+    Saves the report data (replacing the previous version) in one transaction.
+    Articles become rows of the articles table.
+    Like the JSON backend, every save increments "version" (kept in `extra`);
+    a `data` version that no longer matches the stored one is rejected (returns False).
+    A report given as a JSON string is stored as an object (schema version 2).
+    """
+    if "report" in data:
+        data["report"] = report_schema.decode_report(data["report"])
+    data["schema_version"] = report_schema.SCHEMA_VERSION
+    articles = data.get("articles", []) or []
+    extra = {k: v for k, v in data.items() if k not in KEYWORD_FIELDS}
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                # Write lock from the version check on, so two saves cannot both pass it
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT extra FROM keywords WHERE keyword = ?", (keyword,)).fetchone()
+                current = json.loads(row["extra"]).get("version", 0) if row is not None and row["extra"] else 0
+                if row is not None and data.get("version") is not None and data["version"] != current:
+                    print(f"[ERROR] '{keyword}' was saved by someone else in the meantime "
+                          f"(version {current}, expected {data['version']}); reload and try again.")
+                    return False
+                extra["version"] = current + 1
+                conn.execute("DELETE FROM articles WHERE keyword = ?", (keyword,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO keywords (keyword, period, summary_stats, updated_at, article_count, extra, report_hash, articles_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (keyword, data.get("period"), json.dumps(data.get("summary_stats", {}), ensure_ascii=False),
+                     data.get("updated_at"), len(articles), json.dumps(extra, ensure_ascii=False),
+                     github_storage.content_hash(data.get("report", {})), github_storage.content_hash(articles))
+                )
+                # Stored once as JSON text (older rows hold a JSON-encoded string)
+                conn.execute("INSERT OR REPLACE INTO reports (keyword, report) VALUES (?, ?)",
+                             (keyword, json.dumps(data.get("report", {}), ensure_ascii=False)))
+                conn.executemany(
+                    f"INSERT INTO articles (keyword, position, {', '.join(ARTICLE_COLUMNS)}, extra) VALUES ({', '.join('?' * (len(ARTICLE_COLUMNS) + 3))})",
+                    [_article_row(keyword, i, article) for i, article in enumerate(articles)]
+                )
+        data["version"] = extra["version"]
+        print(f"[SUCCESS] Saved '{keyword}' to {db_path()}.")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save to SQLite: {e}")
+        return False
+
+def load_meta(keyword):
+    """keyword, period, summary_stats, updated_at and article_count without reading the report or articles."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT * FROM keywords WHERE keyword = ?", (keyword,)).fetchone()
+    except Exception as e:
+        print(f"[ERROR] Failed to load metadata of '{keyword}': {e}")
+        return None
+    if row is None:
+        return None
+    meta = {
+        "keyword": row["keyword"],
+        "period": row["period"],
+        "summary_stats": json.loads(row["summary_stats"]) if row["summary_stats"] else {},
+        "updated_at": row["updated_at"],
+        "article_count": row["article_count"]
+    }
+    if row["extra"]:
+        meta.update(json.loads(row["extra"]))
+    meta["schema_version"] = report_schema.SCHEMA_VERSION
+    return meta
+
+def stored_schema_version(keyword):
+    """Schema version of the stored row (1 if it predates versioning), or None."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT extra FROM keywords WHERE keyword = ?", (keyword,)).fetchone()
+    except Exception as e:
+        print(f"[ERROR] Failed to load metadata of '{keyword}': {e}")
+        return None
+    if row is None:
+        return None
+    return json.loads(row["extra"] or "{}").get("schema_version", 1)
+
+def load_report_document(keyword):
+    """The report object (older rows with a JSON-string report are parsed), or None."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT report FROM reports WHERE keyword = ?", (keyword,)).fetchone()
+    except Exception as e:
+        print(f"[ERROR] Failed to load report of '{keyword}': {e}")
+        return None
+    return report_schema.decode_report(json.loads(row["report"])) if row and row["report"] else None
+
+def get_articles(keyword, date=None, sentiment=None, columns=None):
+    """
+    Articles of a keyword in their original order, optionally only one date and/or sentiment.
+    `columns` limits the returned fields (e.g. ["date"] for the volume chart).
+    Uses the (keyword, date) / (keyword, sentiment) indexes.
+    """
+    selected = [col for col in (columns or ARTICLE_COLUMNS) if col in ARTICLE_COLUMNS]
+    fields = ", ".join(selected + ([] if columns else ["extra"]))
+    query = f"SELECT {fields} FROM articles WHERE keyword = ?"
+    params = [keyword]
+    if date is not None:
+        query += " AND date = ?"
+        params.append(date)
+    if sentiment is not None:
+        query += " AND sentiment = ?"
+        params.append(sentiment)
+    query += " ORDER BY position"
+    try:
+        with closing(_connect()) as conn:
+            return [_article_dict(row) for row in conn.execute(query, params)]
+    except Exception as e:
+        print(f"[ERROR] Failed to query articles of '{keyword}': {e}")
+        return []
+
+def load_articles(keyword, columns=None):
+    """The article list of a keyword (None for an unknown keyword)."""
+    if load_meta(keyword) is None:
+        return None
+    return get_articles(keyword, columns=columns)
+
+def load_articles_frame(keyword, columns=None):
+    """Articles as a DataFrame, reading only the requested `columns` (None for an unknown keyword)."""
+    if load_meta(keyword) is None:
+        return None
+    return pd.DataFrame(get_articles(keyword, columns=columns), columns=columns)
+
+def get_daily_counts(keyword):
+    """{date: article count} of a keyword."""
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute("SELECT date, COUNT(*) AS n FROM articles WHERE keyword = ? GROUP BY date ORDER BY date", (keyword,))
+            return {row["date"]: row["n"] for row in rows}
+    except Exception as e:
+        print(f"[ERROR] Failed to count articles of '{keyword}': {e}")
+        return {}
+
+def get_sentiment_counts(keyword, date=None):
+    """{sentiment: article count} of a keyword (optionally one date)."""
+    query = "SELECT sentiment, COUNT(*) AS n FROM articles WHERE keyword = ?"
+    params = [keyword]
+    if date is not None:
+        query += " AND date = ?"
+        params.append(date)
+    try:
+        with closing(_connect()) as conn:
+            return {row["sentiment"]: row["n"] for row in conn.execute(query + " GROUP BY sentiment", params)}
+    except Exception as e:
+        print(f"[ERROR] Failed to count sentiments of '{keyword}': {e}")
+        return {}
+
+def load_report(keyword, include_articles=True):
+    """
+    Loads report data in the same shape as the JSON files.
+    With include_articles=False the articles table is not read (only "article_count" is set).
+    """
+    meta = load_meta(keyword)
+    if meta is None:
+        print(f"[INFO] Keyword not found in SQLite: {keyword}")
+        return None
+    article_count = meta.pop("article_count")
+    data = {
+        "keyword": meta.pop("keyword"),
+        "period": meta.pop("period"),
+        "summary_stats": meta.pop("summary_stats"),
+        "report": load_report_document(keyword) or {},
+        "articles": get_articles(keyword) if include_articles else None,
+        "updated_at": meta.pop("updated_at")
+    }
+    if not include_articles:
+        data.pop("articles")
+        data["article_count"] = article_count
+    data.update(meta)
+    return data
+
+def get_keyword_overview():
+    """Metadata and content hashes of every keyword (the keywords table is the index), sorted by keyword."""
+    try:
+        with closing(_connect()) as conn:
+            rows = conn.execute("SELECT keyword, period, updated_at, article_count, summary_stats, extra, report_hash, articles_hash "
+                                "FROM keywords ORDER BY keyword").fetchall()
+    except Exception as e:
+        print(f"[ERROR] Failed to list keywords: {e}")
+        return []
+    overview = []
+    for row in rows:
+        entry = dict(row)
+        entry["summary_stats"] = json.loads(row["summary_stats"]) if row["summary_stats"] else {}
+        entry["version"] = json.loads(entry.pop("extra") or "{}").get("version")
+        overview.append(entry)
+    return overview
+
+def get_keyword_list():
+    """
+    Returns a sorted list of keywords available in the database.
+    """
+    try:
+        with closing(_connect()) as conn:
+            keywords = [row["keyword"] for row in conn.execute("SELECT keyword FROM keywords ORDER BY keyword")]
+        print(f"[INFO] Found {len(keywords)} keywords in SQLite storage")
+        return keywords
+    except Exception as e:
+        print(f"[ERROR] Failed to list keywords: {e}")
+        return []
+
+def delete_report(keyword):
+    """
+    Deletes a keyword with its report, articles and translations.
+    """
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                deleted = conn.execute("DELETE FROM keywords WHERE keyword = ?", (keyword,)).rowcount
+    except Exception as e:
+        print(f"[ERROR] Failed to delete '{keyword}': {e}")
+        return False
+    if deleted:
+        print(f"[SUCCESS] Deleted '{keyword}' from SQLite")
+        return True
+    print(f"[WARNING] Keyword not found: {keyword}")
+    return False
+
+def save_translation(keyword, lang, data):
+    """
+    Saves a pre-translated report for a stored keyword.
+    """
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO translations (keyword, lang, data) VALUES (?, ?, ?)",
+                             (keyword, lang, json.dumps(data, ensure_ascii=False)))
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to save translation: {e}")
+        return False
+
+def load_translation(keyword, lang):
+    """
+    Loads a pre-translated report. Returns None if there is none.
+    """
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT data FROM translations WHERE keyword = ? AND lang = ?", (keyword, lang)).fetchone()
+    except Exception as e:
+        print(f"[ERROR] Failed to load translation: {e}")
+        return None
+    return json.loads(row["data"]) if row else None
+
+def delete_translations(keyword):
+    try:
+        with closing(_connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM translations WHERE keyword = ?", (keyword,))
+    except Exception as e:
+        print(f"[ERROR] Failed to delete translations of '{keyword}': {e}")
+
+def migrate_json(data_dir="data"):
+    """
+    Imports every keyword (and its stored translations) of the JSON backend,
+    read through github_storage so every layout it stores (single file, split
+    parts, article log, compressed documents) is assembled first.
+    `data_dir` must be the JSON backend's data/ directory of the current
+    directory. Existing keywords are replaced. Returns the number of imported keywords.
+    """
+    imported = 0
+    if not os.path.isdir(data_dir):
+        print(f"[INFO] Nothing to migrate: {data_dir} does not exist")
+        return imported
+    if os.path.abspath(data_dir) != os.path.abspath("data"):
+        print(f"[ERROR] {data_dir} is not the JSON storage of this directory (data/); run the migration from its parent directory")
+        return imported
+    for keyword in github_storage.get_keyword_list():
+        data = github_storage.load_report(keyword)
+        if data is None:
+            print(f"[ERROR] Skipping '{keyword}': it could not be loaded")
+            continue
+        # An import replaces the stored keyword whatever its version
+        data.pop("version", None)
+        if not save_report(keyword, data):
+            continue
+        imported += 1
+        for lang in github_storage.list_translations(keyword):
+            translation = github_storage.load_translation(keyword, lang)
+            if translation is not None:
+                save_translation(keyword, lang, translation)
+    print(f"[SUCCESS] Migrated {imported} keywords to {db_path()}")
+    return imported
+
+if __name__ == "__main__":
+    # python -m modules.sqlite_storage migrate [data_dir]
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        migrate_json(sys.argv[2] if len(sys.argv) > 2 else "data")
+    else:
+        print("Usage: python -m modules.sqlite_storage migrate [data_dir]")
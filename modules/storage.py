@@ -0,0 +1,198 @@
+import os
+import sys
+from dotenv import load_dotenv
+from modules import github_storage, sqlite_storage, git_storage, report_schema
+
+load_dotenv(override=True)
+
+# STORAGE_BACKEND in .env: "json" (one file per keyword, default), "sqlite",
+# or "git" (the JSON files, shared through a git repository; see git_storage)
+BACKENDS = {"json": github_storage, "sqlite": sqlite_storage, "git": git_storage}
+DEFAULT_BACKEND = "json"
+
+def get_backend():
+    """The storage module selected by STORAGE_BACKEND."""
+    name = (os.getenv("STORAGE_BACKEND") or DEFAULT_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        print(f"[WARNING] Unknown STORAGE_BACKEND '{name}', using {DEFAULT_BACKEND}")
+        name = DEFAULT_BACKEND
+    return BACKENDS[name]
+
+def save_report(keyword, data):
+    return get_backend().save_report(keyword, data)
+
+def load_report(keyword, include_articles=True):
+    return get_backend().load_report(keyword, include_articles=include_articles)
+
+def get_keyword_list():
+    return get_backend().get_keyword_list()
+
+def delete_report(keyword):
+    return get_backend().delete_report(keyword)
+
+def get_keyword_overview():
+    """Per-keyword metadata (period, updated_at, article_count, summary_stats, content hashes) from the index."""
+    return get_backend().get_keyword_overview()
+
+def save_translation(keyword, lang, data):
+    return get_backend().save_translation(keyword, lang, data)
+
+def load_translation(keyword, lang):
+    return get_backend().load_translation(keyword, lang)
+
+def get_articles(keyword, date=None, sentiment=None, columns=None):
+    """
+    Articles of a keyword, optionally only one date and/or sentiment.
+    The SQLite backend reads just the matching rows; the JSON backend filters the loaded file.
+    """
+    backend = get_backend()
+    if hasattr(backend, "get_articles"):
+        return backend.get_articles(keyword, date=date, sentiment=sentiment, columns=columns)
+    data = backend.load_report(keyword) or {}
+    articles = [a for a in data.get("articles", [])
+                if (date is None or a.get("date") == date) and (sentiment is None or a.get("sentiment") == sentiment)]
+    if columns:
+        articles = [{col: a.get(col) for col in columns} for a in articles]
+    return articles
+
+def get_daily_counts(keyword):
+    """{date: article count} of a keyword."""
+    backend = get_backend()
+    if hasattr(backend, "get_daily_counts"):
+        return backend.get_daily_counts(keyword)
+    counts = {}
+    for article in get_articles(keyword, columns=["date"]):
+        counts[article["date"]] = counts.get(article["date"], 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: str(item[0])))
+
+def lookup_sentiments(articles):
+    """
+    Sentiment already stored for each article under any keyword (None where
+    unknown), so a new analysis only scores articles it has not seen.
+    """
+    backend = get_backend()
+    if hasattr(backend, "lookup_sentiments"):
+        return backend.lookup_sentiments(articles)
+    return [None] * len(articles)
+
+def load_articles_frame(keyword, columns=None):
+    """
+    Articles of a keyword as a DataFrame, reading only `columns` (e.g. ["date"]
+    for the volume chart). Returns None if the keyword has no articles.
+    """
+    return get_backend().load_articles_frame(keyword, columns)
+
+class StoredKeyword:
+    """
+    Lazy view of one stored keyword. The metadata record, the report and the
+    articles are each loaded on first access and then kept, so a page only
+    reads the parts it uses, at most once.
+    Dict-style access (data['keyword'], data.get('report')) works as with load_report().
+    """
+
+    def __init__(self, keyword, backend=None):
+        self.keyword = keyword
+        self.backend = backend or get_backend()
+        self._parts = {}
+        self._frames = {}
+
+    def _part(self, name, loader):
+        if name not in self._parts:
+            self._parts[name] = loader(self.keyword)
+        return self._parts[name]
+
+    @property
+    def meta(self):
+        """keyword, period, summary_stats, updated_at, article_count, ... (None if not stored)."""
+        return self._part("meta", self.backend.load_meta)
+
+    @property
+    def report(self):
+        """The report object (older JSON-string reports are parsed on load)."""
+        return self._part("report", self.backend.load_report_document)
+
+    @property
+    def articles(self):
+        """The article list."""
+        return self._part("articles", self.backend.load_articles)
+
+    def articles_frame(self, columns=None):
+        """Articles as a DataFrame, only `columns` if given (projected from the full frame once that is loaded)."""
+        if None in self._frames:
+            frame = self._frames[None]
+            return frame[[col for col in columns if col in frame.columns]] if columns and frame is not None else frame
+        key = tuple(columns) if columns else None
+        if key not in self._frames:
+            self._frames[key] = self.backend.load_articles_frame(self.keyword, list(columns) if columns else None)
+        return self._frames[key]
+
+    def exists(self):
+        return self.meta is not None
+
+    def __bool__(self):
+        return self.exists()
+
+    def get(self, key, default=None):
+        if key == "report":
+            value = self.report
+        elif key == "articles":
+            value = self.articles
+        else:
+            value = (self.meta or {}).get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def to_dict(self):
+        """The full data in the load_report() shape (loads every part)."""
+        data = {}
+        for key, value in (self.meta or {}).items():
+            if key == "article_count":
+                data["report"] = self.report if self.report is not None else {}
+                data["articles"] = self.articles or []
+            else:
+                data[key] = value
+        data.setdefault("report", self.report if self.report is not None else {})
+        data.setdefault("articles", self.articles or [])
+        return data
+
+def open_keyword(keyword):
+    """Lazy handle on a stored keyword (see StoredKeyword)."""
+    return StoredKeyword(keyword)
+
+def upgrade_reports(force=False):
+    """
+    Rewrites every stored keyword in the current schema (report_schema.SCHEMA_VERSION).
+    Reads already upgrade older records in memory; this makes it permanent.
+    Keywords that are up to date are skipped unless force=True.
+    Returns (upgraded, skipped, failed) counts.
+    """
+    backend = get_backend()
+    upgraded = skipped = failed = 0
+    for keyword in backend.get_keyword_list():
+        version = backend.stored_schema_version(keyword)
+        if not force and version is not None and version >= report_schema.SCHEMA_VERSION:
+            skipped += 1
+            continue
+        data = backend.load_report(keyword)
+        if data is not None and backend.save_report(keyword, data):
+            upgraded += 1
+        else:
+            failed += 1
+    print(f"[SUCCESS] Upgraded {upgraded} keywords to schema version {report_schema.SCHEMA_VERSION} "
+          f"({skipped} up to date, {failed} failed)")
+    return upgraded, skipped, failed
+
+if __name__ == "__main__":
+    # Bulk migration: python -m modules.storage upgrade [--force]
+    if len(sys.argv) < 2 or sys.argv[1] != "upgrade":
+        print("Usage: python -m modules.storage upgrade [--force]")
+        sys.exit(1)
+    upgrade_reports(force="--force" in sys.argv[2:])
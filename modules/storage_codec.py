@@ -0,0 +1,133 @@
+import os
+import gzip
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard json module
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: falls back to gzip
+    zstandard = None
+
+# Stored documents are detected by their first bytes, never by file name
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Codec -> file name suffix appended to the ".json" path
+EXTENSIONS = {"zstd": ".zst", "gzip": ".gz", "json": ""}
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+# Integer dict keys and numpy values are written like json.dumps would
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+def default_codec():
+    """STORAGE_CODEC from .env (zstd, gzip or json); zstd if installed, else gzip."""
+    codec = (os.getenv("STORAGE_CODEC") or "").strip().lower()
+    if codec == "zstd" and zstandard is None:
+        print("[WARNING] STORAGE_CODEC=zstd but zstandard is not installed, using gzip")
+        return "gzip"
+    if codec in EXTENSIONS:
+        return codec
+    return "zstd" if zstandard is not None else "gzip"
+
+def dumps(value, indent=False):
+    """JSON bytes (UTF-8, non-ASCII kept), via orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            pass  # Types orjson does not know; the json module below handles them with str()
+    if indent:
+        return json.dumps(value, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def detect(data):
+    """The codec of stored bytes, from the magic number (anything else is plain JSON)."""
+    if data[:4] == ZSTD_MAGIC:
+        return "zstd"
+    if data[:2] == GZIP_MAGIC:
+        return "gzip"
+    return "json"
+
+def encode(value, codec=None):
+    """Serializes and compresses a JSON value. Plain JSON stays indented (readable)."""
+    codec = codec or default_codec()
+    if codec == "json":
+        return dumps(value, indent=True)
+    raw = dumps(value)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+def decode(data):
+    """Decodes bytes written by encode() in any codec, or a legacy JSON file."""
+    codec = detect(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd-compressed data but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "gzip":
+        data = gzip.decompress(data)
+    return loads(data)
+
+def file_path(path, codec=None):
+    """File name for a ".json" path in a codec, e.g. data/reports/x.json.zst."""
+    return path + EXTENSIONS[codec or default_codec()]
+
+def candidates(path):
+    """Every file name a document may be stored under, newest formats first."""
+    return [path + EXTENSIONS["zstd"], path + EXTENSIONS["gzip"], path]
+
+def find(path):
+    """The existing file of a document in any codec, or None."""
+    for candidate in candidates(path):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def read(path):
+    """Reads a document stored under `path` in any codec. Raises FileNotFoundError."""
+    found = find(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    with open(found, 'rb') as f:
+        return decode(f.read())
+
+def write(path, value, codec=None):
+    """
+    Writes a document in `codec` and removes copies in other codecs
+    (so a legacy .json is replaced by its compressed version). Returns the file name.
+    The file is written to a temp file and renamed over the target, so readers
+    see the old or the new document, never a partial one.
+    """
+    codec = codec or default_codec()
+    target = file_path(path, codec)
+    content = encode(value, codec)
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    for candidate in candidates(path):
+        if candidate != target and os.path.exists(candidate):
+            os.remove(candidate)
+    return target
+
+def remove(path):
+    """Removes a document in every codec."""
+    for candidate in candidates(path):
+        if os.path.exists(candidate):
+            os.remove(candidate)
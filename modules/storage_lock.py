@@ -0,0 +1,51 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only coordinate threads of this process
+    fcntl = None
+
+# Advisory lock files shared by every process using the same data/ directory
+LOCK_DIR = os.path.join("data", ".locks")
+
+_thread_locks = {}
+_guard = threading.Lock()
+_held = threading.local()
+
+def _thread_lock(name):
+    with _guard:
+        return _thread_locks.setdefault(name, threading.Lock())
+
+@contextmanager
+def file_lock(name):
+    """
+    Exclusive lock on `name` (a keyword, or ".manifest") across threads and
+    processes: a per-name thread lock plus flock() on data/.locks/{name}.lock.
+    Re-entrant within a thread, so save_report can call helpers that lock too.
+    Different names never wait for each other.
+    """
+    held = _held.__dict__.setdefault("names", {})
+    if name in held:
+        held[name] += 1
+        try:
+            yield
+        finally:
+            held[name] -= 1
+        return
+
+    with _thread_lock(name):
+        handle = None
+        if fcntl is not None:
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            handle = open(os.path.join(LOCK_DIR, f"{name}.lock"), 'a')
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        held[name] = 1
+        try:
+            yield
+        finally:
+            del held[name]
+            if handle is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
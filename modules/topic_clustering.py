@@ -0,0 +1,140 @@
+import math
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.cluster import MiniBatchKMeans
+from modules import keyword_index
+
+def _choose_cluster_count(n_titles, max_clusters):
+    """Rule-of-thumb k = sqrt(n/2), bounded by max_clusters."""
+    if n_titles < 4:
+        return 1
+    return max(1, min(max_clusters, int(round(math.sqrt(n_titles / 2)))))
+
+def cluster_titles(titles, max_clusters=6, representatives=3, exclude=None, random_state=0):
+    """
+    Clusters one day's headlines with TF-IDF (Korean-aware tokens) + MiniBatchKMeans.
+    Every title is assigned to exactly one cluster, so counts sum to len(titles).
+
+    Returns clusters sorted by size:
+        [{"id": 1, "count", "percent", "indices", "titles", "terms"}]
+    - indices: positions of the member titles in `titles`
+    - titles: representative headlines (closest to the centroid)
+    - terms: top weighted terms of the centroid
+    exclude: terms to ignore when vectorizing (e.g. the search keyword)
+    """
+    n = len(titles)
+    if n == 0:
+        return []
+
+    vocabulary = set()
+    for title in titles:
+        vocabulary.update(keyword_index.raw_tokens(title))
+
+    excluded = tuple(tok for term in exclude or [] for tok in keyword_index.raw_tokens(term))
+
+    def analyzer(title):
+        tokens = keyword_index.tokenize(title, vocabulary)
+        return [t for t in tokens if not t.startswith(excluded)] if excluded else tokens
+
+    vectorizer = TfidfVectorizer(analyzer=analyzer, sublinear_tf=True)
+    try:
+        matrix = vectorizer.fit_transform(titles)
+    except ValueError:
+        # No usable tokens at all (e.g. titles are only numbers/symbols)
+        matrix = None
+
+    k = _choose_cluster_count(n, max_clusters)
+    if matrix is None or matrix.shape[1] == 0:
+        k = 1
+
+    if k == 1:
+        labels = np.zeros(n, dtype=int)
+        centroids = np.asarray(matrix.mean(axis=0)) if matrix is not None else None
+    else:
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=256)
+        labels = model.fit_predict(matrix)
+        centroids = model.cluster_centers_
+
+    feature_names = vectorizer.get_feature_names_out() if matrix is not None else []
+
+    clusters = []
+    for label in np.unique(labels):
+        members = np.where(labels == label)[0]
+        rep_titles, terms = [], []
+        if centroids is not None:
+            centroid = np.asarray(centroids[label if k > 1 else 0]).ravel()
+            scores = matrix[members] @ centroid
+            order = members[np.argsort(-np.asarray(scores).ravel(), kind='stable')]
+            # Skip syndicated duplicates so representatives show different headlines
+            for i in order:
+                if titles[i] not in rep_titles:
+                    rep_titles.append(titles[i])
+                if len(rep_titles) >= representatives:
+                    break
+            terms = [feature_names[j] for j in np.argsort(-centroid)[:3] if centroid[j] > 0]
+        else:
+            rep_titles = [titles[i] for i in members[:representatives]]
+        clusters.append({
+            "count": int(len(members)),
+            "percent": round(len(members) / n * 100, 1),
+            "indices": members.tolist(),
+            "titles": rep_titles,
+            "terms": terms
+        })
+
+    clusters.sort(key=lambda c: c["count"], reverse=True)
+    for i, cluster in enumerate(clusters, 1):
+        cluster["id"] = i
+    return clusters
+
+def cluster_articles_by_day(articles, max_clusters=6, exclude=None):
+    """Runs cluster_titles() for every date. Returns {date: clusters}."""
+    by_day = {}
+    for art in articles:
+        by_day.setdefault(str(art.get('date') or 'Unknown'), []).append(art.get('title') or "")
+    return {date: cluster_titles(titles, max_clusters, exclude=exclude) for date, titles in sorted(by_day.items())}
+
+def format_clusters_for_prompt(day_clusters):
+    """Prompt section listing each day's clusters with their representative headlines."""
+    lines = []
+    for date, clusters in day_clusters.items():
+        lines.append(f"## {date}")
+        for c in clusters:
+            lines.append(f"C{c['id']} ({c['count']} articles; terms: {', '.join(c['terms']) or '-'})")
+            for title in c["titles"]:
+                lines.append(f"  - {title}")
+    return "\n".join(lines)
+
+def apply_topic_clusters(report, day_clusters):
+    """
+    Builds daily_trends[].sub_topics (in place) from the local clusters.
+    Counts and percents are exact; the model's name/description/examples
+    are matched by cluster id, with the cluster's top terms as fallback name.
+    """
+    for day in report.get("daily_trends", []) or []:
+        clusters = day_clusters.get(day.get("date"))
+        if not clusters:
+            continue
+
+        named = {}
+        for topic in day.get("sub_topics", []) or []:
+            if not isinstance(topic, dict):
+                continue
+            try:
+                cid = int(str(topic.get("cluster", "")).lstrip("Cc"))
+            except ValueError:
+                continue
+            named.setdefault(cid, topic)
+
+        sub_topics = []
+        for c in clusters:
+            topic = named.get(c["id"], {})
+            sub_topics.append({
+                "name": topic.get("name") or " / ".join(c["terms"][:2]) or "기타",
+                "count": c["count"],
+                "percent": c["percent"],
+                "description": topic.get("description", ""),
+                "examples": topic.get("examples") or ", ".join(c["titles"][:2])
+            })
+        day["sub_topics"] = sub_topics
+    return report
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from modules import llm_provider, json_repair
+
+# Persistent source -> target store, shared by every report (overridable in .env)
+DEFAULT_MEMORY_PATH = os.path.join("data", "translation_memory.db")
+# Unseen segments are packed into requests of at most this many characters / segments
+BATCH_MAX_CHARS = 4000
+BATCH_MAX_SEGMENTS = 60
+MAX_WORKERS = 4
+
+# Reports are written in Korean: only strings with Hangul need translating
+# (dates, numbers, sentiment labels and English names pass through unchanged)
+_HANGUL = re.compile(r'[\u1100-\u11ff\u3131-\u318e\uac00-\ud7a3]')
+# Values of these keys are identifiers, never translated
+SKIP_KEYS = {"date"}
+
+_stats = {"segments": 0, "memory_hits": 0, "translated": 0, "requests": 0, "failed": 0}
+_lock = threading.Lock()
+
+def memory_path():
+    return os.getenv("TRANSLATION_MEMORY_PATH") or DEFAULT_MEMORY_PATH
+
+def _connect():
+    path = memory_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS segments (
+            source TEXT NOT NULL,
+            lang TEXT NOT NULL,
+            target TEXT NOT NULL,
+            created REAL NOT NULL,
+            PRIMARY KEY (source, lang)
+        )
+    """)
+    return conn
+
+def needs_translation(text):
+    return isinstance(text, str) and _HANGUL.search(text) is not None
+
+def extract_segments(data):
+    """Every translatable string value in a report structure (keys are never translated)."""
+    segments = []
+
+    def walk(value, key=None):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                walk(v, k)
+        elif isinstance(value, list):
+            for v in value:
+                walk(v, key)
+        elif key not in SKIP_KEYS and needs_translation(value):
+            segments.append(value)
+
+    walk(data)
+    return segments
+
+def apply_translations(data, translations):
+    """Rebuilds the structure with every string replaced by its translation (if there is one)."""
+    if isinstance(data, dict):
+        return {k: v if k in SKIP_KEYS else apply_translations(v, translations) for k, v in data.items()}
+    if isinstance(data, list):
+        return [apply_translations(v, translations) for v in data]
+    if isinstance(data, str):
+        return translations.get(data, data)
+    return data
+
+def lookup(segments, target_lang):
+    """{source: target} for the segments already in the memory."""
+    found = {}
+    unique = list(dict.fromkeys(segments))
+    if not unique:
+        return found
+    try:
+        with closing(_connect()) as conn:
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT source, target FROM segments WHERE lang = ? AND source IN ({placeholders})",
+                                    [target_lang] + chunk)
+                found.update(rows.fetchall())
+    except sqlite3.Error as e:
+        print(f"Warning: Translation memory lookup failed: {e}")
+    return found
+
+def store(translations, target_lang):
+    """Adds {source: target} pairs to the memory."""
+    if not translations:
+        return
+    now = time.time()
+    try:
+        with _lock, closing(_connect()) as conn:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO segments (source, lang, target, created) VALUES (?, ?, ?, ?)",
+                                 [(source, target_lang, target, now) for source, target in translations.items()])
+    except sqlite3.Error as e:
+        print(f"Warning: Could not write translation memory: {e}")
+
+def pack_batches(segments, max_chars=None, max_segments=None):
+    """Groups segments into batches below the character / segment limits (a longer segment goes alone)."""
+    max_chars = max_chars or BATCH_MAX_CHARS
+    max_segments = max_segments or BATCH_MAX_SEGMENTS
+    batches = []
+    batch, size = [], 0
+    for segment in segments:
+        if batch and (size + len(segment) > max_chars or len(batch) >= max_segments):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(segment)
+        size += len(segment)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _batch_instructions(target_lang):
+    """Static translator instructions (cacheable prefix) for a batch of numbered segments."""
+    return f"""
+    You are a professional translator for Korean media analysis reports.
+    Translate every value of the following JSON object into {target_lang}.
+    Keep the numeric keys unchanged and return exactly one translation per key.
+    Keep names of people, programs and brands consistent (romanize Korean names).
+    Translate each value on its own; do not merge or split values.
+
+    Output Format: JSON object {{"1": "translation", "2": "translation", ...}}
+    """
+
+def _translate_batch(batch, target_lang):
+    """Translates one batch; returns {source: target} for the segments the response covered."""
+    payload = {str(i): segment for i, segment in enumerate(batch, 1)}
+    data = f"""
+    Segments to translate:
+    {json.dumps(payload, ensure_ascii=False)}
+    """
+    with _lock:
+        _stats["requests"] += 1
+    try:
+        text = llm_provider.generate(_batch_instructions(target_lang), data, task="translation", json_mode=True, temperature=0.3)
+        result = json_repair.loads(text)
+    except Exception as e:
+        print(f"Translation batch error: {e}")
+        result = {}
+    if not isinstance(result, dict):
+        result = {}
+    translations = {}
+    for key, segment in payload.items():
+        target = result.get(key)
+        if isinstance(target, str) and target.strip():
+            translations[segment] = target
+    return translations
+
+def translate_segments(segments, target_lang='English', max_workers=MAX_WORKERS):
+    """
+    Translates strings through the memory: known segments are looked up, only
+    unseen ones are sent to the LLM in packed batches (in parallel) and stored.
+    Returns {source: target}; segments whose batch failed are missing.
+    """
+    unique = [s for s in dict.fromkeys(segments) if needs_translation(s)]
+    translations = lookup(unique, target_lang)
+    unseen = [s for s in unique if s not in translations]
+
+    if unseen:
+        batches = pack_batches(unseen)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(llm_provider.in_session(lambda batch: _translate_batch(batch, target_lang)), batches))
+        fresh = {}
+        for result in results:
+            fresh.update(result)
+        store(fresh, target_lang)
+        translations.update(fresh)
+
+    with _lock:
+        _stats["segments"] += len(unique)
+        _stats["memory_hits"] += len(unique) - len(unseen)
+        _stats["translated"] += sum(1 for s in unseen if s in translations)
+        _stats["failed"] += sum(1 for s in unseen if s not in translations)
+    return translations
+
+def translate_structure(data, target_lang='English'):
+    """
+    Translates every string in a JSON-like structure and rebuilds it.
+    Raises RuntimeError if some segments could not be translated (those already
+    translated are kept in the memory, so a retry only sends the rest).
+    """
+    segments = extract_segments(data)
+    translations = translate_segments(segments, target_lang)
+    missing = [s for s in dict.fromkeys(segments) if s not in translations]
+    if missing:
+        raise RuntimeError(f"{len(missing)} segments could not be translated")
+    return apply_translations(data, translations)
+
+def get_stats():
+    """Counters of this process plus the number of stored segments."""
+    with _lock:
+        stats = dict(_stats)
+    try:
+        with closing(_connect()) as conn:
+            stats["stored"] = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+    except sqlite3.Error:
+        stats["stored"] = None
+    stats["hit_ratio"] = round(stats["memory_hits"] / stats["segments"], 3) if stats["segments"] else 0.0
+    return stats
+
+def reset_stats():
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
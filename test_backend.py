@@ -44,3 +44,666 @@ except Exception as e:
     print(f"   [CRITICAL FAIL] Exception during execution: {e}")
     import traceback
     traceback.print_exc()
+
+print("\n3. Testing prompt prefix caching (offline, FakeProvider)...")
+from modules import sentiment_engine, prompt_cache
+
+def fake_responder(prefix, suffix):
+    # Label every numbered title in the variable part
+    count = sum(1 for line in suffix.splitlines() if line[:1].isdigit())
+    return json.dumps({str(i): "Neutral" for i in range(1, count + 1)})
+
+prompt_cache.reset_cache_stats()
+fake = prompt_cache.FakeProvider(fake_responder)
+titles = [f"Test headline {i} about AI" for i in range(30)]
+labels, stats = sentiment_engine.classify_titles(titles, fake.generate, gemini_analyzer.SENTIMENT_INSTRUCTIONS, batch_size=10, delay=0)
+
+prefixes = {prefix for prefix, _ in fake.calls}
+cache_stats = prompt_cache.get_cache_stats()["fake"]
+if labels == ["Neutral"] * 30 and len(prefixes) == 1 and all(suffix not in prefix for prefix, suffix in fake.calls):
+    print(f"   [PASS] {len(fake.calls)} requests shared one static prefix.")
+else:
+    print(f"   [FAIL] Prefix/suffix split is not stable ({len(prefixes)} distinct prefixes).")
+if len(fake.calls) > 1 and cache_stats["cached_tokens"] > 0:
+    print(f"   [PASS] Cached prefix tokens: {cache_stats['cached_tokens']}/{cache_stats['prompt_tokens']} (hit ratio {cache_stats['hit_ratio']}).")
+else:
+    print(f"   [FAIL] No cache hits recorded: {cache_stats}")
+
+# Unusable answers are bisected; a failed request stops the run instead
+garbage = prompt_cache.FakeProvider(lambda prefix, suffix: "no json here")
+labels, stats = sentiment_engine.classify_titles(titles[:4], garbage.generate, gemini_analyzer.SENTIMENT_INSTRUCTIONS, batch_size=4, max_retries=0, delay=0)
+print(f"   [{'PASS' if stats['bisects'] == 3 and labels == [sentiment_engine.FALLBACK_LABEL] * 4 else 'FAIL'}] Unusable answers bisected down to single titles ({stats['requests']} requests).")
+def outage_responder(prefix, suffix):
+    raise ConnectionError("network down")
+
+outage = prompt_cache.FakeProvider(outage_responder)
+try:
+    sentiment_engine.classify_titles(titles, outage.generate, gemini_analyzer.SENTIMENT_INSTRUCTIONS, batch_size=10, delay=0)
+    raised = False
+except RuntimeError:
+    raised = True
+print(f"   [{'PASS' if raised and len(outage.calls) == 1 else 'FAIL'}] Provider outage raised after {len(outage.calls)} request(s), no bisecting.")
+
+print("\n4. Testing provider failover and hedging (offline, FakeProvider)...")
+import time
+import tempfile
+import threading
+from modules import llm_provider, response_cache
+
+# Offline sections use a throwaway response cache so every run exercises the providers
+os.environ["LLM_CACHE_DIR"] = tempfile.mkdtemp(prefix="llm_cache_test_")
+
+def failing_responder(prefix, suffix):
+    raise RuntimeError("simulated outage")
+
+def slow_responder(prefix, suffix):
+    time.sleep(2)
+    return "slow"
+
+llm_provider.register_provider("fake_down", prompt_cache.FakeProvider(failing_responder, name="fake_down"))
+llm_provider.register_provider("fake_slow", prompt_cache.FakeProvider(slow_responder, name="fake_slow"))
+llm_provider.register_provider("fake_fast", prompt_cache.FakeProvider(lambda prefix, suffix: "fast", name="fake_fast"))
+
+text = llm_provider.generate("prefix", "suffix", providers=["fake_down", "fake_fast"])
+print(f"   [{'PASS' if text == 'fast' else 'FAIL'}] Failover to the secondary provider: {text}")
+
+# Batch sizes are learned for the provider that answered, not the one asked first
+llm_provider.register_provider("fake_labeler", prompt_cache.FakeProvider(fake_responder, name="fake_labeler"))
+failover_request = lambda prefix, suffix: llm_provider.generate(prefix, suffix, providers=["fake_down", "fake_labeler"], json_mode=True, cache=False, return_provider=True)
+sentiment_engine.classify_titles(titles, failover_request, gemini_analyzer.SENTIMENT_INSTRUCTIONS, batch_size=10, delay=0, provider="fake_down")
+learned = sentiment_engine._learned_batch_sizes
+print(f"   [{'PASS' if 'fake_labeler' in learned and 'fake_down' not in learned else 'FAIL'}] Learned batch size stored for the answering provider: {learned}")
+llm_provider.unregister_provider("fake_labeler")
+
+llm_provider.HEDGE_DEFAULT_DELAY = 0.2
+started = time.time()
+text = llm_provider.generate("prefix", "hedged suffix", providers=["fake_slow", "fake_fast"], hedge=True)
+elapsed = time.time() - started
+print(f"   [{'PASS' if text == 'fast' and elapsed < 1.5 else 'FAIL'}] Hedged request answered by the faster provider in {elapsed:.2f}s: {text}")
+
+# A fast primary failure followed by a failing secondary reports both errors
+llm_provider.register_provider("fake_down2", prompt_cache.FakeProvider(lambda prefix, suffix: "", name="fake_down2"))
+try:
+    llm_provider.generate("prefix", "both down", providers=["fake_down", "fake_down2"], hedge=True)
+    message = ""
+except RuntimeError as e:
+    message = str(e)
+print(f"   [{'PASS' if 'fake_down: simulated outage' in message and 'fake_down2: fake_down2 returned an empty response' in message else 'FAIL'}] Each provider's error reported: {message}")
+llm_provider.unregister_provider("fake_down2")
+
+# configure() only applies to the session (thread) that calls it
+seen = {}
+def session(name):
+    llm_provider.configure(primary=name)
+    time.sleep(0.1)
+    seen[name] = llm_provider.provider_order()[0]
+sessions = [threading.Thread(target=session, args=(name,)) for name in ("fake_fast", "fake_slow")]
+for thread in sessions:
+    thread.start()
+for thread in sessions:
+    thread.join()
+print(f"   [{'PASS' if seen == {'fake_fast': 'fake_fast', 'fake_slow': 'fake_slow'} and (llm_provider.provider_order() or [None])[0] not in seen else 'FAIL'}] Provider choice kept per session: {seen}")
+
+print("\n5. Testing the LLM response cache (offline, FakeProvider)...")
+counter = prompt_cache.FakeProvider(lambda prefix, suffix: f"answer to {suffix}", name="fake_counter")
+llm_provider.register_provider("fake_counter", counter)
+
+first = llm_provider.generate("prefix", "question", providers=["fake_counter"])
+second = llm_provider.generate("prefix", "question", providers=["fake_counter"])
+other = llm_provider.generate("prefix", "other question", providers=["fake_counter"])
+print(f"   [{'PASS' if first == second and len(counter.calls) == 2 else 'FAIL'}] Identical request served from cache ({len(counter.calls)} provider calls for 3 requests).")
+
+response_cache.set_bypass(True)
+llm_provider.generate("prefix", "question", providers=["fake_counter"])
+response_cache.set_bypass(False)
+print(f"   [{'PASS' if len(counter.calls) == 3 else 'FAIL'}] Bypass forces a fresh call.")
+
+evicted = response_cache.evict(max_bytes=1)
+print(f"   [{'PASS' if evicted > 0 and response_cache.get_cache_stats()['entries'] == 0 else 'FAIL'}] LRU eviction removed {evicted} entries.")
+print(f"   Cache stats: {response_cache.get_cache_stats()}")
+
+for name in ["fake_down", "fake_slow", "fake_fast", "fake_counter"]:
+    llm_provider.unregister_provider(name)
+
+print("\n6. Testing streamed report generation with a cut-off stream (offline, FakeProvider)...")
+stream_articles = [
+    {"title": f"AI headline {i} on day {d}", "press": f"Press {i % 3}", "date": f"2025-01-0{d}", "sentiment": "Neutral"}
+    for d in range(1, 5) for i in range(5)
+]
+stream_dates = sorted({a["date"] for a in stream_articles})
+
+def day_entry(date):
+    return {"date": date, "one_line_summary": f"Summary {date}", "narrative_summary": "...", "sub_topics": []}
+
+def report_responder(prefix, suffix):
+    if "급증" in prefix:
+        return "{}"
+    if "CONTINUATION" in suffix:
+        reporter.fail_after = None
+        wanted = [d for d in stream_dates if d in suffix.split("CONTINUATION")[1]]
+        return json.dumps({"daily_trends": [day_entry(d) for d in wanted], "conclusion": "Conclusion"})
+    return json.dumps({
+        "executive_summary": {"tone_analysis": "Tone", "key_takeaways": ["A"]},
+        "daily_trends": [day_entry(d) for d in stream_dates],
+        "keyword_analysis": {}, "detailed_topic_analysis": {}, "time_series_flow": {},
+        "conclusion": "Conclusion"
+    })
+
+reporter = prompt_cache.FakeProvider(report_responder, name="fake_report", chunk_size=16)
+full_report = report_responder("", "")
+# Cut the stream in the middle of the third daily_trends entry
+reporter.fail_after = full_report.index(stream_dates[2]) + 5
+llm_provider.register_provider("fake_report", reporter)
+llm_provider.configure(primary="fake_report")
+
+progress = []
+report = json.loads(gemini_analyzer.generate_issue_report("AI", stream_articles, "Neutral: 20",
+                                                          on_progress=lambda kind, key, value: progress.append((kind, key))))
+report_dates = [day["date"] for day in report.get("daily_trends", [])]
+continuation = [suffix for _, suffix in reporter.calls if "CONTINUATION" in suffix]
+print(f"   [{'PASS' if ('item', 'daily_trends') in progress and any(kind == 'retry' for kind, _ in progress) else 'FAIL'}] Progress events: {progress}")
+print(f"   [{'PASS' if report_dates == stream_dates and report.get('conclusion') else 'FAIL'}] Salvaged report has every date: {report_dates}")
+print(f"   [{'PASS' if len(continuation) == 1 and stream_dates[0] not in continuation[0].split('CONTINUATION')[1] else 'FAIL'}] Only the missing parts were regenerated.")
+
+llm_provider.configure()
+llm_provider.unregister_provider("fake_report")
+
+print("\n7. Testing batch pre-translation through the translation memory (offline, FakeProvider)...")
+from modules import report_translator, translation_memory, github_storage
+
+ko_report = {
+    "executive_summary": {"tone_analysis": "대체로 긍정적", "key_takeaways": ["요리 경연 화제성 확대"]},
+    "daily_trends": [
+        {"date": d, "volume": 5, "one_line_summary": f"{d} 주요 이슈 요약", "sub_topics": [{"name": "팀전 결과", "count": 3}]}
+        for d in stream_dates
+    ],
+    "conclusion": "결론"
+}
+failing_segment = f"{stream_dates[1]} 주요 이슈 요약"
+
+def translate_responder(prefix, suffix):
+    segments = json.loads(suffix.split("Segments to translate:", 1)[1])
+    # The response leaves out one segment, as LLMs sometimes do
+    return json.dumps({key: f"EN {text}" for key, text in segments.items() if text != failing_segment}, ensure_ascii=False)
+
+translator = prompt_cache.FakeProvider(translate_responder, name="fake_translator")
+llm_provider.register_provider("fake_translator", translator)
+# No failover to real providers: the dropped segment must stay untranslated
+os.environ["LLM_PROVIDERS"] = "fake_translator"
+translation_memory.BATCH_MAX_SEGMENTS = 3
+
+# Storage writes (reports, translations, memory) go to a throwaway data/ directory
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="storage_test_"))
+try:
+    stored_data = {"keyword": "AI", "report": json.dumps(ko_report, ensure_ascii=False)}
+    github_storage.save_report("AI", stored_data)
+    report_translator.start_background("AI", stored_data).join()
+    stats = translation_memory.get_stats()
+    unique = len(set(translation_memory.extract_segments(ko_report)))
+    sent = sum(len(json.loads(suffix.split("Segments to translate:", 1)[1])) for _, suffix in translator.calls)
+    print(f"   [{'PASS' if stats['segments'] == unique == sent == 8 else 'FAIL'}] Repeated strings sent once: {unique} unique segments, {sent} sent in {len(translator.calls)} batches.")
+
+    bundle = report_translator.load_translation("AI", ko_report)
+    print(f"   [{'PASS' if bundle and bundle['missing'] == [stream_dates[1]] else 'FAIL'}] Day with an untranslated segment left for on-demand: {bundle and bundle['missing']}")
+    calls = len(translator.calls)
+    english = report_translator.translated_report(ko_report, bundle)
+    day = english['daily_trends'][0]
+    ok = english['conclusion'] == 'EN 결론' and day['date'] == stream_dates[0] and day['sub_topics'][0] == {"name": "EN 팀전 결과", "count": 3}
+    print(f"   [{'PASS' if ok and len(translator.calls) == calls else 'FAIL'}] Stored translation applied without LLM calls, structure and numbers kept.")
+
+    failing_segment = None
+    retried = gemini_analyzer.translate_daily_report(ko_report['daily_trends'][1])
+    print(f"   [{'PASS' if retried['one_line_summary'].startswith('EN ') and len(translator.calls) == calls + 1 else 'FAIL'}] Retry sends only the missing segment ({len(translator.calls) - calls} request).")
+
+    calls = len(translator.calls)
+    translated = gemini_analyzer.translate_global_report(dict(ko_report, keyword_analysis={"context": "팀전 결과"}))
+    print(f"   [{'PASS' if translated['keyword_analysis']['context'] == 'EN 팀전 결과' and len(translator.calls) == calls else 'FAIL'}] Another report with known strings needs {len(translator.calls) - calls} LLM calls.")
+    print(f"   Translation memory: {translation_memory.get_stats()}")
+
+    changed = dict(ko_report, conclusion="변경된 결론")
+    print(f"   [{'PASS' if report_translator.load_translation('AI', changed) is None else 'FAIL'}] Translation of an older report version is ignored.")
+    github_storage.delete_report("AI")
+    print(f"   [{'PASS' if github_storage.load_translation('AI', 'en') is None else 'FAIL'}] Translations deleted with the report.")
+finally:
+    os.chdir(original_cwd)
+    os.environ.pop("LLM_PROVIDERS")
+    llm_provider.unregister_provider("fake_translator")
+
+print("\n8. Testing the SQLite storage backend (offline)...")
+import shutil
+from modules import sqlite_storage, storage, report_schema, storage_codec
+
+with open(os.path.join("data", "흑백요리사2.json"), "r", encoding="utf-8") as f:
+    sample = json.load(f)
+sample_keyword = sample["keyword"]
+day = sample["articles"][0]["date"]
+
+os.environ["SQLITE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sqlite_test_"), "news_analysis.db")
+os.environ["STORAGE_BACKEND"] = "sqlite"
+try:
+    # Import from a copy: the legacy single-file record plus a keyword saved in
+    # the current split layout (compressed parts, manifest) with a translation
+    original_cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="migrate_test_"))
+    try:
+        os.makedirs("data")
+        shutil.copy(os.path.join(original_cwd, "data", f"{sample_keyword}.json"), "data")
+        split = dict(sample, keyword="split", articles=[dict(a) for a in sample["articles"][:50]], report=json.loads(sample["report"]))
+        github_storage.save_report("split", split)
+        github_storage.save_translation("split", "en", {"source_hash": "x", "days": {}})
+        imported = sqlite_storage.migrate_json("data")
+    finally:
+        os.chdir(original_cwd)
+    split_loaded = sqlite_storage.load_report("split")
+    ok = imported == 2 and split_loaded["articles"] == split["articles"] and split_loaded["report"] == split["report"]
+    print(f"   [{'PASS' if ok and sqlite_storage.load_translation('split', 'en') == {'source_hash': 'x', 'days': {}} else 'FAIL'}] Split-layout keyword migrated with its parts and translation ({imported} keywords, no manifest).")
+    loaded = storage.load_report(sample_keyword)
+    unversioned = {k: v for k, v in loaded.items() if k != "version"}
+    print(f"   [{'PASS' if imported >= 1 and unversioned == report_schema.upgrade(sample) and loaded['version'] == 1 else 'FAIL'}] Migrated JSON round-trips unchanged ({imported} keywords, version {loaded['version']}).")
+    print(f"   [{'PASS' if sample_keyword in storage.get_keyword_list() else 'FAIL'}] Keyword listed from the database.")
+
+    expected = [a for a in sample["articles"] if a["date"] == day]
+    day_articles = storage.get_articles(sample_keyword, date=day)
+    print(f"   [{'PASS' if day_articles == expected else 'FAIL'}] Articles on {day}: {len(day_articles)} rows read.")
+    negative = storage.get_articles(sample_keyword, sentiment="Negative", columns=["date"])
+    ok = len(negative) == sum(1 for a in sample["articles"] if a["sentiment"] == "Negative") and all(list(a) == ["date"] for a in negative)
+    print(f"   [{'PASS' if ok else 'FAIL'}] Sentiment filter with column projection: {len(negative)} rows.")
+    counts = storage.get_daily_counts(sample_keyword)
+    print(f"   [{'PASS' if sum(counts.values()) == len(sample['articles']) else 'FAIL'}] Daily counts: {len(counts)} days.")
+
+    started = time.perf_counter()
+    sqlite_storage.get_articles(sample_keyword, date=day)
+    query_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    full = github_storage.load_report(sample_keyword)
+    [a for a in full["articles"] if a["date"] == day]
+    file_ms = (time.perf_counter() - started) * 1000
+    print(f"   One day of articles: SQLite {query_ms:.1f} ms vs full JSON load {file_ms:.1f} ms")
+
+    storage.save_translation(sample_keyword, "en", {"days": {}})
+    deleted = storage.delete_report(sample_keyword)
+    print(f"   [{'PASS' if deleted and storage.load_report(sample_keyword) is None and storage.load_translation(sample_keyword, 'en') is None else 'FAIL'}] Delete removes report, articles and translations.")
+finally:
+    os.environ.pop("STORAGE_BACKEND")
+    os.environ.pop("SQLITE_DB_PATH")
+
+print("\n9. Testing columnar article storage (offline, pyarrow)...")
+from modules import columnar_storage
+import pandas as pd
+
+if not columnar_storage.is_available():
+    print("   [SKIP] pyarrow is not installed; articles stay in the report JSON.")
+else:
+    original_cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix="columnar_test_"))
+    # Full article rows in the keyword file (the shared article store is tested in 15.)
+    os.environ["ARTICLE_STORE"] = "0"
+    try:
+        github_storage.save_report(sample_keyword, sample)
+        with open(f"data/{sample_keyword}.json", "r", encoding="utf-8") as f:
+            on_disk = json.load(f)
+        print(f"   [{'PASS' if 'articles' not in on_disk and on_disk.get('article_count') == len(sample['articles']) else 'FAIL'}] Report JSON keeps only the article count.")
+
+        loaded = github_storage.load_report(sample_keyword)
+        print(f"   [{'PASS' if loaded == sample and list(loaded) == list(sample) else 'FAIL'}] load_report returns the original data and layout.")
+        meta = github_storage.load_report(sample_keyword, include_articles=False)
+        print(f"   [{'PASS' if 'articles' not in meta and meta['article_count'] == len(sample['articles']) else 'FAIL'}] Articles skipped when not needed.")
+
+        table = columnar_storage.load_table(sample_keyword)
+        encoded = [name for name in columnar_storage.DICTIONARY_COLUMNS if str(table.schema.field(name).type).startswith("dictionary")]
+        print(f"   [{'PASS' if encoded == columnar_storage.DICTIONARY_COLUMNS else 'FAIL'}] Dictionary-encoded columns: {encoded}")
+        dates = storage.load_articles_frame(sample_keyword, columns=["date"])
+        print(f"   [{'PASS' if list(dates.columns) == ['date'] and len(dates) == len(sample['articles']) else 'FAIL'}] Column projection reads only 'date' ({len(dates)} rows).")
+
+        repeat = 50
+        started = time.perf_counter()
+        for _ in range(repeat):
+            with open(os.path.join(original_cwd, "data", f"{sample_keyword}.json"), "r", encoding="utf-8") as f:
+                pd.DataFrame(json.load(f)["articles"])
+        json_ms = (time.perf_counter() - started) * 1000 / repeat
+        started = time.perf_counter()
+        for _ in range(repeat):
+            columnar_storage.load_articles_frame(sample_keyword)
+        arrow_ms = (time.perf_counter() - started) * 1000 / repeat
+        size_json = len(json.dumps(sample["articles"], indent=2, ensure_ascii=False).encode("utf-8"))
+        size_arrow = os.path.getsize(columnar_storage.articles_path(sample_keyword))
+        print(f"   Articles DataFrame: JSON {json_ms:.1f} ms vs memory-mapped Arrow {arrow_ms:.1f} ms; "
+              f"{size_json / 1024:.0f} KB vs {size_arrow / 1024:.0f} KB on disk")
+
+        github_storage.delete_report(sample_keyword)
+        print(f"   [{'PASS' if not columnar_storage.has_articles(sample_keyword) else 'FAIL'}] Article file deleted with the report.")
+    finally:
+        os.environ.pop("ARTICLE_STORE", None)
+        os.chdir(original_cwd)
+
+print("\n10. Testing the split storage layout and lazy loading (offline)...")
+from modules import article_store, storage_lock
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="split_test_"))
+reads = []
+real_read_json = github_storage._read_json
+github_storage._read_json = lambda path: reads.append(path) or real_read_json(path)
+try:
+    # A legacy single-file report is read as before, parsing the file once
+    os.makedirs("data", exist_ok=True)
+    with open(f"data/{sample_keyword}.json", "w", encoding="utf-8") as f:
+        json.dump(sample, f, ensure_ascii=False, indent=2)
+    legacy = storage.open_keyword(sample_keyword)
+    ok = legacy["period"] == sample["period"] and legacy.report == sample["report"] and legacy.articles == sample["articles"]
+    print(f"   [{'PASS' if ok and len(reads) == 1 else 'FAIL'}] Legacy file: meta, report and articles from {len(reads)} parse.")
+
+    migrated = legacy.to_dict()
+    storage.save_report(sample_keyword, migrated)
+    parts = sorted(os.path.relpath(os.path.join(root, name), "data") for root, _, names in os.walk("data")
+                   for name in names if not name.startswith(".") and not root.startswith(storage_lock.LOCK_DIR) and os.path.join(root, name) != article_store.store_path())
+    print(f"   [{'PASS' if len(parts) == 3 else 'FAIL'}] Saved as separate parts: {parts}")
+
+    reads.clear()
+    handle = storage.open_keyword(sample_keyword)
+    header = (handle["keyword"], handle.get("period"), handle.get("article_count"))
+    print(f"   [{'PASS' if header[2] == len(sample['articles']) and reads == [f'data/{sample_keyword}.json'] else 'FAIL'}] Metadata page read only the metadata record: {reads}")
+    handle.report
+    handle.report
+    print(f"   [{'PASS' if len(reads) == 2 and 'articles' not in handle._parts else 'FAIL'}] Report loaded once, articles untouched.")
+    dates = handle.articles_frame(columns=["date"])
+    print(f"   [{'PASS' if dates is not None and list(dates.columns) == ['date'] else 'FAIL'}] Article dates loaded on demand ({len(dates)} rows).")
+    print(f"   [{'PASS' if handle.to_dict() == migrated and storage.load_report(sample_keyword) == migrated else 'FAIL'}] Assembled data equals the original.")
+    storage.delete_report(sample_keyword)
+    leftovers = [name for root, _, names in os.walk("data") for name in names
+                 if not name.startswith(".") and not root.startswith(storage_lock.LOCK_DIR) and os.path.join(root, name) != article_store.store_path()]
+    print(f"   [{'PASS' if not leftovers else 'FAIL'}] Delete removes every part: {leftovers}")
+finally:
+    github_storage._read_json = real_read_json
+    os.chdir(original_cwd)
+
+print("\n11. Testing the keyword manifest index (offline)...")
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="manifest_test_"))
+try:
+    # Existing data without a manifest: built once by scanning
+    os.makedirs("data", exist_ok=True)
+    with open(f"data/{sample_keyword}.json", "w", encoding="utf-8") as f:
+        json.dump(sample, f, ensure_ascii=False)
+    print(f"   [{'PASS' if github_storage.get_keyword_list() == [sample_keyword] and os.path.exists(github_storage.MANIFEST_PATH) else 'FAIL'}] Manifest built from existing files.")
+
+    other = dict(sample, keyword="AI", period="2025-01-01 ~ 2025-01-02", articles=sample["articles"][:10])
+    github_storage.save_report("AI", other)
+    reads.clear()
+    github_storage._read_json = lambda path: reads.append(path) or real_read_json(path)
+    overview = storage.get_keyword_overview()
+    github_storage._read_json = real_read_json
+    entry = overview[0]
+    ok = [e["keyword"] for e in overview] == ["AI", sample_keyword] and entry["article_count"] == 10 and entry["period"] == other["period"]
+    print(f"   [{'PASS' if ok and reads == [github_storage.MANIFEST_PATH] else 'FAIL'}] Overview of {len(overview)} keywords from one file read: {reads}")
+    print(f"   [{'PASS' if entry['articles_hash'] == github_storage.content_hash(other['articles']) and entry['report_hash'] == overview[1]['report_hash'] else 'FAIL'}] Content hashes recorded (same report, same hash).")
+
+    github_storage.delete_report("AI")
+    print(f"   [{'PASS' if storage.get_keyword_list() == [sample_keyword] else 'FAIL'}] Delete removes the keyword from the manifest.")
+
+    os.environ["SQLITE_DB_PATH"] = os.path.join(os.getcwd(), "news_analysis.db")
+    sqlite_storage.save_report("AI", other)
+    sql_entry = sqlite_storage.get_keyword_overview()[0]
+    print(f"   [{'PASS' if sql_entry['articles_hash'] == entry['articles_hash'] and sql_entry['article_count'] == 10 else 'FAIL'}] SQLite keyword table serves the same overview.")
+finally:
+    github_storage._read_json = real_read_json
+    os.environ.pop("SQLITE_DB_PATH", None)
+    os.chdir(original_cwd)
+
+print("\n12. Testing the git storage backend against a local bare repository (offline)...")
+import subprocess
+from modules import git_storage
+
+if shutil.which("git") is None:
+    print("   [SKIP] git is not installed.")
+else:
+    original_cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix="git_storage_test_")
+    remote = os.path.join(root, "remote.git")
+    subprocess.run(["git", "init", "-q", "--bare", remote], check=True)
+    remote_log = lambda *args: subprocess.run(["git", "--git-dir", remote, *args], capture_output=True, text=True).stdout.split()
+    os.environ.update({"GIT_STORAGE_REMOTE": remote, "GIT_STORAGE_BRANCH": "main", "STORAGE_BACKEND": "git",
+                       "GIT_STORAGE_COMMIT_DELAY": "3600", "GIT_STORAGE_PULL_INTERVAL": "3600"})
+    os.makedirs(os.path.join(root, "a"))
+    os.chdir(os.path.join(root, "a"))
+    try:
+        other = dict(sample, keyword="AI", articles=sample["articles"][:10])
+        storage.save_report("AI", other)
+        storage.save_report(sample_keyword, sample)
+        print(f"   [{'PASS' if not remote_log('ls-remote', remote) else 'FAIL'}] Saves only write the local mirror (no commit or push on the request path).")
+        git_storage.flush()
+        commits = remote_log("rev-list", "main")
+        print(f"   [{'PASS' if len(commits) == 1 else 'FAIL'}] Two keyword saves pushed as {len(commits)} commit.")
+
+        # A second instance (own process and clone) saves a keyword and pushes it
+        script = ("import sys; sys.path.insert(0, sys.argv[1]); from modules import git_storage; "
+                  "git_storage.save_report('B', {'keyword': 'B', 'period': 'p', 'report': '{}', 'articles': []}); "
+                  "git_storage.flush()")
+        os.makedirs(os.path.join(root, "b"))
+        subprocess.run([sys.executable, "-c", script, original_cwd], cwd=os.path.join(root, "b"), capture_output=True, check=True)
+
+        # Meanwhile this instance has an unpushed save: the pull merges both
+        storage.save_report("C", dict(other, keyword="C"))
+        print(f"   [{'PASS' if 'B' not in storage.get_keyword_list() else 'FAIL'}] Reads come from the mirror until the next pull.")
+        changed = git_storage.pull()
+        keywords = storage.get_keyword_list()
+        print(f"   [{'PASS' if changed and keywords == ['AI', 'B', 'C', sample_keyword] else 'FAIL'}] Pull merged the other instance's keyword: {keywords}")
+        print(f"   [{'PASS' if not git_storage.pull() else 'FAIL'}] Unchanged remote is not fetched again.")
+        git_storage.flush()
+
+        # Both instances change "AI": the other one pushes first, this one appends a log segment
+        script = ("import sys; sys.path.insert(0, sys.argv[1]); from modules import git_storage; "
+                  "data = git_storage.load_report('AI'); data['articles'] = data['articles'][2:]; "
+                  "git_storage.save_report('AI', data); git_storage.flush()")
+        subprocess.run([sys.executable, "-c", script, original_cwd], cwd=os.path.join(root, "b"), capture_output=True, check=True)
+        storage.save_report("AI", dict(other, articles=sample["articles"][:12]))
+        storage.save_report("C", dict(other, keyword="C", articles=sample["articles"][:11]))
+        git_storage.pull()
+        ai_articles = storage.load_report("AI")["articles"]
+        print(f"   [{'PASS' if git_storage.conflicts() == ['AI'] and ai_articles == sample['articles'][2:10] else 'FAIL'}] "
+              f"Keyword changed on both sides reported as a conflict, repository version kept whole ({len(ai_articles)} articles).")
+        print(f"   [{'PASS' if storage.load_report('C')['articles'] == sample['articles'][:11] else 'FAIL'}] Keyword changed only here kept with its own log.")
+        git_storage.flush()
+        print(f"   [{'PASS' if remote_log('rev-parse', 'main') == [git_storage._rev('HEAD')] else 'FAIL'}] Merged state pushed ({len(remote_log('rev-list', 'main'))} commits on the remote).")
+        print(f"   [{'PASS' if storage.load_report(sample_keyword) == sample else 'FAIL'}] Report round-trips through the mirror.")
+    finally:
+        for name in ("GIT_STORAGE_REMOTE", "GIT_STORAGE_BRANCH", "STORAGE_BACKEND", "GIT_STORAGE_COMMIT_DELAY", "GIT_STORAGE_PULL_INTERVAL"):
+            os.environ.pop(name, None)
+        os.chdir(original_cwd)
+
+print("\n13. Testing the append-only article log and compaction (offline)...")
+from modules import article_log
+
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="article_log_test_"))
+os.environ["ARTICLE_STORE"] = "0"
+try:
+    base = sample["articles"][100:]
+    github_storage.save_report(sample_keyword, dict(sample, articles=base))
+    base_files = [os.path.join(dirpath, name) for dirpath, _, names in os.walk("data/articles") for name in names]
+    base_mtimes = {path: os.stat(path).st_mtime_ns for path in base_files}
+
+    # A refresh: 100 newer articles in front (latest first), one article re-scored
+    refreshed = [dict(a) for a in sample["articles"]]
+    refreshed[500]["sentiment"] = "Neutral" if refreshed[500].get("sentiment") != "Neutral" else "Positive"
+    written = article_log.save(sample_keyword, refreshed)
+    untouched = all(os.stat(path).st_mtime_ns == mtime for path, mtime in base_mtimes.items())
+    print(f"   [{'PASS' if written == 101 and untouched and article_log.segments(sample_keyword) == [1] else 'FAIL'}] Refresh appended one segment of {written} rows, base file untouched.")
+    print(f"   [{'PASS' if article_log.save(sample_keyword, refreshed) == 0 else 'FAIL'}] Unchanged article list writes nothing.")
+
+    ok = github_storage.load_articles(sample_keyword) == refreshed
+    frame = github_storage.load_articles_frame(sample_keyword, ["date", "sentiment"])
+    print(f"   [{'PASS' if ok and len(frame) == len(refreshed) and list(frame.columns) == ['date', 'sentiment'] else 'FAIL'}] Readers see the merged list in order.")
+
+    # A crashed segment write leaves only a temp file, which readers ignore
+    with open(os.path.join(article_log.log_dir(sample_keyword), "000002.json.zst.123.tmp"), "wb") as f:
+        f.write(b"partial")
+    print(f"   [{'PASS' if github_storage.load_articles(sample_keyword) == refreshed else 'FAIL'}] Partial segment write ignored.")
+
+    print(f"   [{'PASS' if article_log.compact(sample_keyword) and not article_log.has_pending(sample_keyword) else 'FAIL'}] Compaction folded the segments into the base.")
+    print(f"   [{'PASS' if article_log.load(sample_keyword) == refreshed and article_log.segments(sample_keyword) == [] else 'FAIL'}] Same articles after compaction, segments removed.")
+
+    # Segments beyond ARTICLE_LOG_MAX_SEGMENTS trigger a background compaction
+    os.environ["ARTICLE_LOG_MAX_SEGMENTS"] = "2"
+    article_log.save(sample_keyword, refreshed[1:])
+    article_log.save(sample_keyword, refreshed[2:])
+    for _ in range(50):
+        if not article_log.has_pending(sample_keyword):
+            break
+        time.sleep(0.1)
+    print(f"   [{'PASS' if not article_log.has_pending(sample_keyword) and article_log.load(sample_keyword) == refreshed[2:] else 'FAIL'}] Background compaction after {article_log.max_segments()} segments.")
+
+    # A save that repeats rows keeps them until the next compaction
+    article_log.save(sample_keyword, refreshed[2:] + refreshed[2:4])
+    repeated = len(article_log.load(sample_keyword)) == len(refreshed)
+    article_log.compact(sample_keyword)
+    print(f"   [{'PASS' if repeated and article_log.load(sample_keyword) == refreshed[2:] else 'FAIL'}] Compaction dropped repeated rows.")
+finally:
+    os.environ.pop("ARTICLE_LOG_MAX_SEGMENTS", None)
+    os.environ.pop("ARTICLE_STORE", None)
+    os.chdir(original_cwd)
+
+print("\n14. Testing atomic, lock-coordinated writes and version checks (offline)...")
+import threading
+import subprocess
+
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="concurrency_test_"))
+try:
+    small = dict(sample, articles=sample["articles"][:50])
+    small.pop("version", None)
+    github_storage.save_report("AI", dict(small, keyword="AI"))
+
+    # Eight sessions load the same version and save at once: exactly one wins
+    barrier = threading.Barrier(8)
+    results = []
+    def session(i):
+        data = github_storage.load_report("AI")
+        data["updated_at"] = f"session {i}"
+        barrier.wait()
+        results.append(github_storage.save_report("AI", data))
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stored = github_storage.load_report("AI")
+    print(f"   [{'PASS' if results.count(True) == 1 and stored['version'] == 2 else 'FAIL'}] Same-version saves: {results.count(True)} saved, {results.count(False)} rejected (version {stored['version']}).")
+    tmp_files = [name for _, _, names in os.walk("data") for name in names if name.endswith(".tmp")]
+    print(f"   [{'PASS' if not tmp_files and stored['articles'] == small['articles'] else 'FAIL'}] Stored data intact, no temp files left.")
+
+    # Different keywords in parallel: no lost keyword in the shared manifest
+    threads = [threading.Thread(target=github_storage.save_report, args=(f"K{i}", dict(small, keyword=f"K{i}"))) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    keywords = github_storage.get_keyword_list()
+    print(f"   [{'PASS' if keywords == ['AI'] + [f'K{i}' for i in range(8)] else 'FAIL'}] Parallel saves of 8 keywords all in the manifest.")
+
+    if storage_lock.fcntl is not None:
+        # Another process holds the lock of "AI": "AI" waits, "K0" does not
+        holder = subprocess.Popen([sys.executable, "-c",
+                                   "import sys, time; sys.path.insert(0, sys.argv[1]); from modules import storage_lock\n"
+                                   "with storage_lock.file_lock('AI'):\n    print('locked', flush=True); time.sleep(1)", original_cwd],
+                                  stdout=subprocess.PIPE, text=True)
+        holder.stdout.readline()
+        started = time.time()
+        with storage_lock.file_lock("K0"):
+            other_wait = time.time() - started
+        started = time.time()
+        with storage_lock.file_lock("AI"):
+            same_wait = time.time() - started
+        holder.wait()
+        print(f"   [{'PASS' if same_wait > 0.5 and other_wait < 0.2 else 'FAIL'}] Cross-process lock: same keyword waited {same_wait:.2f}s, other keyword {other_wait:.2f}s.")
+finally:
+    os.chdir(original_cwd)
+
+print("\n15. Testing the shared article store across keywords (offline)...")
+
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="article_store_test_"))
+os.environ["ARTICLE_STORE"] = "1"
+try:
+    first = dict(sample, keyword="A", articles=[dict(a) for a in sample["articles"][:600]])
+    second = dict(sample, keyword="B", articles=[dict(a) for a in sample["articles"][300:]])
+    github_storage.save_report("A", first)
+    github_storage.save_report("B", second)
+    print(f"   [{'PASS' if article_store.count() == len(sample['articles']) else 'FAIL'}] {article_store.count()} unique articles stored for 600 + 512 keyword articles.")
+    ok = github_storage.load_report("A") == first and github_storage.load_report("B") == second
+    frame = github_storage.load_articles_frame("B", ["date", "sentiment"])
+    same_values = frame["date"].tolist() == [a["date"] for a in second["articles"]] and frame["sentiment"].tolist() == [a.get("sentiment") for a in second["articles"]]
+    print(f"   [{'PASS' if ok and list(frame.columns) == ['date', 'sentiment'] and same_values else 'FAIL'}] Both keywords load their articles from the references.")
+    ref_columns = columnar_storage.load_table("B").column_names if columnar_storage.is_available() else [article_store.REF_KEY]
+    print(f"   [{'PASS' if not set(ref_columns) & set(article_store.SHARED_FIELDS) else 'FAIL'}] Reference file has no empty shared columns: {ref_columns}")
+
+    link = "https://www.example.com/news/article/123/?utm_source=naver&influxDiv=NAVER#top"
+    same = article_store.article_id({"link": link}) == article_store.article_id({"link": "http://example.com/news/article/123"})
+    print(f"   [{'PASS' if same else 'FAIL'}] Canonical URL ignores scheme, www, tracking parameters and fragment.")
+
+    # B re-labels an article both keywords share: A sees the same label
+    shared = second["articles"][0]
+    shared["sentiment"] = "Negative" if shared.get("sentiment") != "Negative" else "Positive"
+    github_storage.save_report("B", second)
+    label = github_storage.load_articles("A")[300]["sentiment"]
+    print(f"   [{'PASS' if label == shared['sentiment'] else 'FAIL'}] One label per article across keywords ({label}).")
+
+    fresh = [{"title": "new", "link": "https://example.com/new", "press": "p", "date": "2026-01-01"}] + sample["articles"][:2]
+    known = storage.lookup_sentiments(fresh)
+    print(f"   [{'PASS' if known[0] is None and known[1:] == [a['sentiment'] for a in sample['articles'][:2]] else 'FAIL'}] Known articles are not scored again: {known}")
+
+    size_refs = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk("data/articles") for name in names)
+    size_store = os.path.getsize(article_store.store_path())
+    os.environ["ARTICLE_STORE"] = "0"
+    github_storage.save_report("A", first)
+    github_storage.save_report("B", second)
+    size_full = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk("data/articles") for name in names)
+    os.environ["ARTICLE_STORE"] = "1"
+    print(f"   [{'PASS' if size_refs + size_store < size_full else 'FAIL'}] Disk: keyword references {size_refs / 1024:.0f} KB + store {size_store / 1024:.0f} KB vs full rows per keyword {size_full / 1024:.0f} KB")
+
+    github_storage.save_report("A", first)
+    github_storage.delete_report("B")
+    remaining = article_store.count()
+    print(f"   [{'PASS' if remaining == 600 and github_storage.prune_article_store() == 0 and github_storage.load_report('A') == first else 'FAIL'}] Deleting B pruned the articles only B referred to ({remaining} left).")
+finally:
+    os.environ.pop("ARTICLE_STORE", None)
+    os.chdir(original_cwd)
+
+print("\n16. Testing the versioned schema with native report objects (offline)...")
+
+original_cwd = os.getcwd()
+legacy_file = os.path.join(original_cwd, "data", f"{sample_keyword}.json")
+with open(legacy_file, "r", encoding="utf-8") as f:
+    raw = json.load(f)
+os.chdir(tempfile.mkdtemp(prefix="schema_test_"))
+try:
+    os.makedirs("data", exist_ok=True)
+    shutil.copy(legacy_file, "data")
+    loaded = storage.load_report(sample_keyword)
+    ok = isinstance(loaded["report"], dict) and loaded["report"] == json.loads(raw["report"]) and loaded["schema_version"] == report_schema.SCHEMA_VERSION
+    print(f"   [{'PASS' if ok and github_storage.stored_schema_version(sample_keyword) == 1 else 'FAIL'}] Version 1 file read with the report upgraded to an object (file untouched).")
+
+    upgraded, skipped, failed = storage.upgrade_reports()
+    on_disk = storage_codec.read(f"data/reports/{sample_keyword}.json")
+    print(f"   [{'PASS' if upgraded == 1 and isinstance(on_disk, dict) and github_storage.stored_schema_version(sample_keyword) == 2 else 'FAIL'}] Bulk upgrade rewrote the record as version 2.")
+    print(f"   [{'PASS' if storage.upgrade_reports() == (0, 1, 0) and storage.load_report(sample_keyword)['report'] == loaded['report'] else 'FAIL'}] Second upgrade run skips it, report unchanged.")
+
+    # A legacy report that is not JSON keeps its full text through the upgrade
+    broken = "Analysis failed: " + "x" * 500
+    with open(f"data/{sample_keyword}_broken.json", "w", encoding="utf-8") as f:
+        json.dump(dict(raw, keyword=f"{sample_keyword}_broken", report=broken), f, ensure_ascii=False)
+    github_storage.rebuild_manifest()
+    storage.upgrade_reports()
+    kept = storage.load_report(f"{sample_keyword}_broken", include_articles=False)["report"].get("raw_response")
+    print(f"   [{'PASS' if kept == broken else 'FAIL'}] Unparsable legacy report kept in full after the upgrade.")
+
+    repeat = 50
+    for label, value in [("JSON string (v1)", raw["report"]), ("object (v2)", json.loads(raw["report"]))]:
+        blob = storage_codec.encode(value)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            report_schema.decode_report(storage_codec.decode(blob))
+        print(f"   Report as {label}: {len(storage_codec.dumps(value)) / 1024:.0f} KB plain, {len(blob) / 1024:.1f} KB {storage_codec.default_codec()}, "
+              f"load {(time.perf_counter() - started) * 1000 / repeat:.2f} ms")
+finally:
+    os.chdir(original_cwd)
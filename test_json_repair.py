@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import time
+import random
+# Add current directory to path so we can import modules
+sys.path.append(os.getcwd())
+
+from modules import json_repair
+
+# Sample report: the stored report of the bundled dataset, pretty-printed like an LLM answer
+with open(os.path.join("data", "흑백요리사2.json"), "r", encoding="utf-8") as f:
+    stored = json.load(f)
+report = json.loads(stored["report"]) if isinstance(stored["report"], str) else stored["report"]
+report_text = json.dumps(report, ensure_ascii=False, indent=4)
+
+def check(name, ok, detail=""):
+    print(f"   [{'PASS' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+    return ok
+
+print("1. Testing known LLM response defects...")
+cases = [
+    ("code fence", '```json\n{"a": 1}\n```', {"a": 1}),
+    ("prose around JSON", 'Here is the report:\n{"a": [1, 2]}\nHope this helps!', {"a": [1, 2]}),
+    ("trailing commas", '{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ("schema comment", '{\n  "keywords": [\n    // ... Top 10\n    {"rank": 1}\n  ]\n}', {"keywords": [{"rank": 1}]}),
+    ("block comment", '{"a": 1, /* note */ "b": 2}', {"a": 1, "b": 2}),
+    ("unescaped quotes", '{"title": "백종원 "논란" 해명", "n": 1}', {"title": '백종원 "논란" 해명', "n": 1}),
+    ("unescaped quote before comma", '{"title": "He said "yes", then left", "n": 1}', {"title": 'He said "yes", then left', "n": 1}),
+    ("single quotes and bare key", "{'a': 'b', c: True}", {"a": "b", "c": True}),
+    ("missing comma", '{"a": 1 "b": 2}', {"a": 1, "b": 2}),
+    ("truncated string", '{"a": 1, "b": "cut of', {"a": 1}),
+    ("truncated nested object", '{"a": 1, "b": {"c": [1, 2', {"a": 1}),
+    ("truncated array keeps partial items (keep_partial)", '[{"d": 1}, {"d": 2, "e": "cut', [{"d": 1}, {"d": 2}]),
+]
+for name, text, expected in cases:
+    try:
+        result = json_repair.loads(text, keep_partial=isinstance(expected, list))
+    except ValueError as e:
+        result = f"ValueError: {e}"
+    check(name, result == expected, "" if result == expected else f"got {result!r}")
+
+print("\n2. Testing truncation at every position of a real report (sampled)...")
+failures = 0
+step = 37
+for cut in range(report_text.index('{') + 1, len(report_text), step):
+    try:
+        result = json_repair.loads(report_text[:cut])
+    except ValueError:
+        # Only acceptable before the first member is complete
+        result = {}
+    # Every recovered section must be exactly the original section
+    if not isinstance(result, dict) or any(result[k] != report.get(k) for k in result):
+        failures += 1
+check(f"{len(report_text) // step} truncation points", failures == 0, f"{failures} corrupted results")
+
+print("\n3. Fuzzing with random corruptions (seeded)...")
+rng = random.Random(42)
+unexpected, parsed = 0, 0
+iterations = 1000
+noise = ['"', ',', ':', '{', '}', '[', ']', '\\', '//', '\n']
+for _ in range(iterations):
+    text = report_text
+    for _ in range(rng.randint(1, 5)):
+        pos = rng.randrange(len(text))
+        action = rng.random()
+        if action < 0.4:
+            text = text[:pos] + text[pos + 1:]
+        elif action < 0.8:
+            text = text[:pos] + rng.choice(noise) + text[pos:]
+        else:
+            text = text[:pos]
+    try:
+        result = json_repair.loads(text)
+        parsed += isinstance(result, (dict, list))
+    except ValueError:
+        pass
+    except Exception as e:
+        unexpected += 1
+        print(f"   Unexpected {type(e).__name__}: {e}")
+check(f"{iterations} corrupted inputs", unexpected == 0, f"{parsed} parsed, {unexpected} unexpected exceptions")
+
+print("\n4. Testing linear running time...")
+broken = report_text.replace('}', ',}')  # trailing commas force the repair path
+timings = []
+for factor in [1, 2, 4, 8]:
+    text = '{"items": [' + ",".join([broken] * factor) + ']}'
+    started = time.perf_counter()
+    json_repair.loads(text)
+    timings.append((factor, len(text), time.perf_counter() - started))
+for factor, size, seconds in timings:
+    print(f"   x{factor}: {size / 1024:.0f} KB in {seconds * 1000:.1f} ms")
+ratio = timings[-1][2] / max(timings[0][2], 1e-9)
+check("8x input takes well under 64x time", ratio < 16, f"ratio {ratio:.1f}")
+
+print("\n5. Benchmark (MB/s)...")
+def throughput(fn, text, repeat=20):
+    fn(text)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return len(text.encode("utf-8")) * repeat / (time.perf_counter() - started) / (1024 * 1024)
+
+print(f"   json.loads (valid):            {throughput(json.loads, report_text):8.1f} MB/s")
+print(f"   json_repair.loads (valid):     {throughput(json_repair.loads, report_text):8.1f} MB/s")
+print(f"   json_repair.loads (repair):    {throughput(json_repair.loads, broken):8.1f} MB/s")
+print(f"   json_repair.loads (truncated): {throughput(json_repair.loads, report_text[:len(report_text) // 2]):8.1f} MB/s")
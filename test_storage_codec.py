@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+import gzip
+import time
+import tempfile
+# Add current directory to path so we can import modules
+sys.path.append(os.getcwd())
+
+from modules import storage_codec, github_storage, report_schema
+
+def check(name, ok, detail=""):
+    print(f"   [{'PASS' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+    return ok
+
+# Corpus: every stored report in data/ (legacy single files and split parts)
+corpus = {}
+for root, _, files in os.walk("data"):
+    for file in files:
+        if ".json" in file and not file.startswith("."):
+            path = os.path.join(root, file)
+            corpus[path] = storage_codec.read(path.split(".json")[0] + ".json")
+sample = next(iter(corpus.values()))
+
+print(f"Codecs available: orjson={'yes' if storage_codec.orjson else 'no'}, zstandard={'yes' if storage_codec.zstandard else 'no'}, default={storage_codec.default_codec()}")
+
+print("\n1. Testing round trips and magic byte detection...")
+codecs = ["json", "gzip"] + (["zstd"] if storage_codec.zstandard else [])
+for codec in codecs:
+    encoded = storage_codec.encode(sample, codec)
+    check(f"{codec}: detected as {storage_codec.detect(encoded)}", storage_codec.detect(encoded) == codec and storage_codec.decode(encoded) == sample)
+legacy = json.dumps(sample, indent=2, ensure_ascii=False).encode("utf-8")
+check("legacy json.dumps(indent=2) file decodes", storage_codec.decode(legacy) == sample)
+check("integer keys written like json.dumps", storage_codec.decode(storage_codec.encode({1: "a"}, codecs[-1])) == {"1": "a"})
+
+print("\n2. Testing transparent migration of a legacy file...")
+original_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix="codec_test_"))
+try:
+    os.makedirs("data", exist_ok=True)
+    with open(f"data/{sample['keyword']}.json", "w", encoding="utf-8") as f:
+        f.write(legacy.decode("utf-8"))
+    loaded = github_storage.load_report(sample["keyword"])
+    check("legacy file read (report upgraded to an object)", loaded == report_schema.upgrade(sample))
+    github_storage.save_report(sample["keyword"], loaded)
+    report_file = storage_codec.find(f"data/reports/{sample['keyword']}.json")
+    check(f"rewritten on save as {report_file}", report_file is not None and report_file.endswith(storage_codec.EXTENSIONS[storage_codec.default_codec()]))
+    check("same data after migration", github_storage.load_report(sample["keyword"]) == loaded)
+    os.environ["STORAGE_CODEC"] = "gzip"
+    github_storage.save_report(sample["keyword"], loaded)
+    report_files = sorted(os.listdir("data/reports"))
+    check(f"codec switch leaves one copy: {report_files}", len(report_files) == 1 and report_files[0].endswith(".gz"))
+finally:
+    os.environ.pop("STORAGE_CODEC", None)
+    os.chdir(original_cwd)
+
+print("\n3. Benchmark on the data/ corpus...")
+def bench(encode, decode, repeat=10):
+    size, enc_time, dec_time = 0, 0.0, 0.0
+    for value in corpus.values():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            blob = encode(value)
+        enc_time += time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(repeat):
+            decode(blob)
+        dec_time += time.perf_counter() - started
+        size += len(blob)
+    return size, enc_time * 1000 / repeat, dec_time * 1000 / repeat
+
+variants = [
+    ("json indent=2 (legacy)", lambda v: json.dumps(v, indent=2, ensure_ascii=False).encode("utf-8"), json.loads),
+    ("json compact", lambda v: json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), json.loads),
+    ("json compact + gzip", lambda v: gzip.compress(json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+     lambda b: json.loads(gzip.decompress(b))),
+]
+for codec in codecs:
+    variants.append((f"storage_codec {codec}", lambda v, c=codec: storage_codec.encode(v, c), storage_codec.decode))
+
+baseline = None
+print(f"   {'format':<26}{'size KB':>10}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+for name, encode, decode in variants:
+    size, enc_ms, dec_ms = bench(encode, decode)
+    baseline = baseline or size
+    print(f"   {name:<26}{size / 1024:>10.0f}{baseline / size:>8.1f}{enc_ms:>12.1f}{dec_ms:>12.1f}")